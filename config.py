@@ -9,6 +9,9 @@ load_dotenv(override=True)
 class Config:
     """Application configuration from environment variables."""
 
+    # Minimum level of log records printed by the app (DEBUG, INFO, WARNING, ...)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
     # LINE Bot credentials
     LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN", "")
     LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET", "")
@@ -18,6 +21,88 @@ class Config:
     GOOGLE_SERVICE_ACCOUNT_FILE = os.getenv(
         "GOOGLE_SERVICE_ACCOUNT_FILE", "service_account.json"
     )
+    # How long the in-process Users index is trusted before re-reading the sheet
+    USERS_CACHE_TTL_SECONDS = int(os.getenv("USERS_CACHE_TTL_SECONDS", "60"))
+
+    # Storage backend: "sheets" (Google Sheets) or "sqlite" (local file)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sheets").lower()
+    LOCAL_DATA_DIR = os.getenv("LOCAL_DATA_DIR", "data")
+    SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", os.path.join(LOCAL_DATA_DIR, "opes.db"))
+    # Local SQLite file for the shared key-value caches
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(LOCAL_DATA_DIR, "cache.db"))
+    # Private Cloud Storage bucket for caches that every instance must share
+    # and that must survive restarts ("gcs" backend). When it is set, those
+    # caches default to gcs; otherwise to the local sqlite file.
+    CACHE_GCS_BUCKET = os.getenv("CACHE_GCS_BUCKET", "")
+    SHARED_CACHE_BACKEND = "gcs" if CACHE_GCS_BUCKET else "sqlite"
+    # Local daily candle store for technical analysis (empty disables it)
+    OHLCV_DB_PATH = os.getenv("OHLCV_DB_PATH", os.path.join(LOCAL_DATA_DIR, "ohlcv.db"))
+    OHLCV_REFRESH_SECONDS = float(os.getenv("OHLCV_REFRESH_SECONDS", "900"))
+    # Digest narrative cache (gcs, sqlite, memory or none); entries expire at
+    # ICT midnight, and only gcs keeps them across instances and restarts. Metrics are rounded to this many significant digits when
+    # fingerprinting, so tiny price moves reuse the same narrative.
+    NARRATIVE_CACHE_BACKEND = os.getenv("NARRATIVE_CACHE_BACKEND", SHARED_CACHE_BACKEND)
+    NARRATIVE_CACHE_SIG_DIGITS = int(os.getenv("NARRATIVE_CACHE_SIG_DIGITS", "4"))
+    # Tickers narrated per Gemini call (1 = one call per ticker), and how long
+    # a scheduled run waits to fill a batch before sending it partially full
+    DIGEST_NARRATIVE_BATCH_SIZE = int(os.getenv("DIGEST_NARRATIVE_BATCH_SIZE", "5"))
+    DIGEST_NARRATIVE_BATCH_WAIT_SECONDS = float(os.getenv("DIGEST_NARRATIVE_BATCH_WAIT_SECONDS", "2"))
+    # Scheduled digest fan-out: parallel asset analyses and pushes, and the
+    # run deadline (kept under the 120 s request timeout). Per-user delivery
+    # checkpoints (gcs, sqlite, memory or none) make re-triggered runs resume
+    # and never send the same hour's digest twice; only gcs holds across
+    # instances and restarts.
+    DIGEST_ASSET_WORKERS = int(os.getenv("DIGEST_ASSET_WORKERS", "4"))
+    DIGEST_DELIVERY_WORKERS = int(os.getenv("DIGEST_DELIVERY_WORKERS", "8"))
+    DIGEST_RUN_DEADLINE_SECONDS = float(os.getenv("DIGEST_RUN_DEADLINE_SECONDS", "100"))
+    DIGEST_CHECKPOINT_BACKEND = os.getenv("DIGEST_CHECKPOINT_BACKEND", SHARED_CACHE_BACKEND)
+    DIGEST_CLAIM_TTL_SECONDS = float(os.getenv("DIGEST_CLAIM_TTL_SECONDS", "300"))
+
+    # LINE webhook: events are acknowledged at once and processed on a worker
+    # pool (in order per user). Requests that would push the backlog past
+    # WEBHOOK_MAX_PENDING get a 503 so LINE redelivers them later. Set
+    # WEBHOOK_ASYNC=false to process inline (e.g. on Cloud Functions).
+    WEBHOOK_ASYNC = os.getenv("WEBHOOK_ASYNC", "true").lower() == "true"
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+    WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", "500"))
+    # Redelivered events (same webhookEventId) are skipped: ids are kept for
+    # WEBHOOK_DEDUP_TTL_SECONDS in gcs (shared by all instances), sqlite
+    # (CACHE_DB_PATH), memory (bounded to WEBHOOK_DEDUP_MAX_ENTRIES) or none.
+    # sqlite and memory are per instance.
+    WEBHOOK_DEDUP_BACKEND = os.getenv("WEBHOOK_DEDUP_BACKEND", SHARED_CACHE_BACKEND)
+    WEBHOOK_DEDUP_TTL_SECONDS = float(os.getenv("WEBHOOK_DEDUP_TTL_SECONDS", "86400"))
+    WEBHOOK_DEDUP_MAX_ENTRIES = int(os.getenv("WEBHOOK_DEDUP_MAX_ENTRIES", "10000"))
+
+    # Screenshots are trimmed, scaled to OCR_IMAGE_MAX_SIDE px on the long
+    # side and re-encoded as JPEG before OCR (0 sends the original image)
+    OCR_IMAGE_MAX_SIDE = int(os.getenv("OCR_IMAGE_MAX_SIDE", "1536"))
+    OCR_IMAGE_JPEG_QUALITY = int(os.getenv("OCR_IMAGE_JPEG_QUALITY", "80"))
+
+    # Screenshot parse cache: resent screenshots reuse the earlier parse and
+    # repeats of recorded trades are flagged as likely duplicates. Backend:
+    # sqlite (CACHE_DB_PATH), memory or none. PARSE_CACHE_PERCEPTUAL also
+    # flags re-encoded copies of recorded screenshots (within
+    # PARSE_CACHE_PHASH_MAX_DISTANCE of 256 perceptual-hash bits); off by
+    # default because the same app screen with different digits can match
+    PARSE_CACHE_BACKEND = os.getenv("PARSE_CACHE_BACKEND", "sqlite")
+    PARSE_CACHE_TTL_SECONDS = float(os.getenv("PARSE_CACHE_TTL_SECONDS", "604800"))
+    PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "10000"))
+    PARSE_CACHE_PERCEPTUAL = os.getenv("PARSE_CACHE_PERCEPTUAL", "false").lower() == "true"
+    PARSE_CACHE_PHASH_MAX_DISTANCE = int(os.getenv("PARSE_CACHE_PHASH_MAX_DISTANCE", "4"))
+
+    # Threads for the concurrent stages of screenshot processing (download
+    # and OCR, FX prefetch, profile lookup and user ensure)
+    IMAGE_STAGE_WORKERS = int(os.getenv("IMAGE_STAGE_WORKERS", "16"))
+
+    # Portfolio valuations (holdings at market prices) are reused for this
+    # long, so status/report/plan/rebalance back to back fetch prices once
+    VALUATION_CACHE_TTL_SECONDS = float(os.getenv("VALUATION_CACHE_TTL_SECONDS", "60"))
+
+    # Dependency health probes: "help" and /health/deep read cached results,
+    # and a read finding them older than HEALTH_PROBE_INTERVAL_SECONDS starts
+    # one background refresh (nothing is probed while nobody asks)
+    HEALTH_PROBE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "300"))
+    HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "10"))
 
     # Gemini API
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -26,11 +111,37 @@ class Config:
     GEMINI_OCR_MODEL = os.getenv("GEMINI_OCR_MODEL", "gemini-3-flash-preview")
     GEMINI_RESEARCH_MODEL = os.getenv("GEMINI_RESEARCH_MODEL", "gemini-3-flash-preview")
 
+    # Screenshot parsing: thinking token budget (-1 lets the model decide,
+    # 0 disables thinking where the model allows) and the output cap, which
+    # covers thinking plus the JSON answer
+    GEMINI_OCR_THINKING_BUDGET = int(os.getenv("GEMINI_OCR_THINKING_BUDGET", "1024"))
+    GEMINI_OCR_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_OCR_MAX_OUTPUT_TOKENS", "2048"))
+
     # LIFF
     LIFF_URL = os.getenv("LIFF_URL", "https://liff.line.me/YOUR_LIFF_ID")
 
     # Price API
     TIINGO_API_KEY = os.getenv("TIINGO_API_KEY", "")
+    # Concurrent quote fetching: pool size, per-call deadline, per-provider limits
+    PRICE_FETCH_MAX_WORKERS = int(os.getenv("PRICE_FETCH_MAX_WORKERS", "8"))
+    PRICE_FETCH_DEADLINE_SECONDS = float(os.getenv("PRICE_FETCH_DEADLINE_SECONDS", "20"))
+    TIINGO_MAX_CONCURRENCY = int(os.getenv("TIINGO_MAX_CONCURRENCY", "4"))
+    YFINANCE_MAX_CONCURRENCY = int(os.getenv("YFINANCE_MAX_CONCURRENCY", "2"))
+    # Per-ticker quote cache: fresh TTL per asset class, then served stale
+    # (with a background refresh) until PRICE_STALE_MAX_SECONDS
+    PRICE_TTL_CRYPTO_SECONDS = float(os.getenv("PRICE_TTL_CRYPTO_SECONDS", "15"))
+    PRICE_TTL_STOCK_SECONDS = float(os.getenv("PRICE_TTL_STOCK_SECONDS", "60"))
+    PRICE_TTL_GOLD_SECONDS = float(os.getenv("PRICE_TTL_GOLD_SECONDS", "300"))
+    PRICE_STALE_MAX_SECONDS = float(os.getenv("PRICE_STALE_MAX_SECONDS", "900"))
+    # Second-tier quote cache shared across instances: sheets (Asset_Reference
+    # rows, located through a cached index), gcs (CACHE_GCS_BUCKET), sqlite
+    # (CACHE_DB_PATH, one host only) or none. Defaults to the storage backend.
+    QUOTE_CACHE_BACKEND = os.getenv("QUOTE_CACHE_BACKEND", STORAGE_BACKEND).lower()
+    # Volume profile (VRVP): bars, price bins and volume distribution mode
+    # (uniform or proportional)
+    VP_LOOKBACK_BARS = int(os.getenv("VP_LOOKBACK_BARS", "60"))
+    VP_NUM_BINS = int(os.getenv("VP_NUM_BINS", "50"))
+    VP_DISTRIBUTION = os.getenv("VP_DISTRIBUTION", "uniform").lower()
 
     @classmethod
     def validate(cls) -> list[str]:
@@ -40,7 +151,7 @@ class Config:
             missing.append("LINE_CHANNEL_ACCESS_TOKEN")
         if not cls.LINE_CHANNEL_SECRET:
             missing.append("LINE_CHANNEL_SECRET")
-        if not cls.GOOGLE_SHEETS_ID:
+        if cls.STORAGE_BACKEND == "sheets" and not cls.GOOGLE_SHEETS_ID:
             missing.append("GOOGLE_SHEETS_ID")
         if not cls.GEMINI_API_KEY:
             missing.append("GEMINI_API_KEY")
@@ -8,6 +8,7 @@ PROJECT_ID="opes-ai-482213"
 REGION="asia-southeast1"
 SERVICE_NAME="opes-ai"
 BUCKET_NAME="opes-ai-liff"
+CACHE_BUCKET_NAME="opes-ai-cache"
 
 echo "🚀 Deploying Family Wealth AI to GCP..."
 
@@ -20,14 +21,29 @@ fi
 # Set project
 gcloud config set project $PROJECT_ID
 
+# Create the private cache bucket if not exists: digest checkpoints,
+# narratives and webhook event ids shared by all instances. Entries are deleted after 7 days.
+if ! gsutil ls -b gs://$CACHE_BUCKET_NAME > /dev/null 2>&1; then
+    echo "📁 Creating cache bucket..."
+    gsutil mb -l $REGION -b on gs://$CACHE_BUCKET_NAME
+    LIFECYCLE=$(mktemp)
+    echo '{"rule": [{"action": {"type": "Delete"}, "condition": {"age": 7}}]}' > $LIFECYCLE
+    gsutil lifecycle set $LIFECYCLE gs://$CACHE_BUCKET_NAME
+    rm $LIFECYCLE
+fi
+
 # Deploy to Cloud Run
+# CPU stays allocated after responses: webhook events are processed in the
+# background once LINE has been acknowledged
 echo "📦 Building and deploying to Cloud Run..."
 gcloud run deploy $SERVICE_NAME \
     --source . \
     --region $REGION \
     --allow-unauthenticated \
     --memory 512Mi \
-    --timeout 120
+    --timeout 120 \
+    --no-cpu-throttling \
+    --update-env-vars CACHE_GCS_BUCKET=$CACHE_BUCKET_NAME
 
 # Get Cloud Run URL
 CLOUD_RUN_URL=$(gcloud run services describe $SERVICE_NAME --region $REGION --format='value(status.url)')
@@ -1,6 +1,17 @@
 """Handlers module for LINE webhook events."""
 
-from .message_handler import MessageHandler
-from .image_handler import ImageHandler
+import importlib
 
-__all__ = ["MessageHandler", "ImageHandler"]
+# Imported on first access, like the services package
+_EXPORTS = {
+    "MessageHandler": ".message_handler",
+    "ImageHandler": ".image_handler",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
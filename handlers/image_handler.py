@@ -1,19 +1,56 @@
 """Image handler for processing transaction screenshots."""
 
-from services.gemini_service import gemini_service
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from config import Config
+from services.registry import registry
 from services.sheets_service import sheets_service
 from services.line_service import line_service
-from services.price_service import price_service
+from services.parse_cache import parse_cache
 from models.transaction import Transaction
 from utils.flex_messages import FlexMessages
+from utils.image_preprocess import preprocess_image
+from utils.stage_graph import StageGraph
+
+# Gemini and price lookups load google-genai and pandas; defer them until
+# the first screenshot arrives
+gemini_service = registry.lazy("gemini_service")
+price_service = registry.lazy("price_service")
+valuation_engine = registry.lazy("valuation_engine")
 
 
 class ImageHandler:
     """Handler for processing image messages."""
 
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Lazy-load the pool that runs the handler stages."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=Config.IMAGE_STAGE_WORKERS,
+                        thread_name_prefix="image-stage",
+                    )
+        return self._executor
+
     def handle(self, event) -> None:
         """Process an image message event.
 
+        The OCR path (download, then preprocess and parse-cache lookup,
+        then Gemini Vision unless the screenshot was seen before) runs
+        concurrently with the stages that do not depend on it: the USD/THB
+        rate prefetch and the LINE profile lookup. The user ensure waits for
+        both the profile and the parse, so no user row is created for a
+        screenshot that fails to download or parse. Only the transaction
+        append waits for all of them.
+
         Args:
             event: LINE MessageEvent with image content
         """
@@ -21,10 +58,63 @@ class ImageHandler:
         message_id = event.message.id
         user_id = event.source.user_id
 
-        # 1. Download image from LINE
         print(f"📥 Downloading image: {message_id}")
-        image_bytes = line_service.get_message_content(message_id)
+        stages = StageGraph(self.executor)
+        stages.add("download", line_service.get_message_content, message_id)
+        stages.add("preprocess", self._preprocess_image, after=["download"])
+        stages.add("cache_lookup", self._lookup_parse, user_id, after=["download"])
+        stages.add("ocr", self._parse_image, user_id, after=["preprocess", "cache_lookup"])
+        stages.add("fx_rate", price_service.get_usd_thb_rate)
+        stages.add("profile", line_service.get_profile, user_id)
+        stages.add("ensure_user", self._ensure_user, user_id, after=["profile", "ocr"])
+
+        try:
+            self._record_transaction(stages, reply_token, user_id)
+        finally:
+            print(f"⏱️ Image stages: {stages.format_timings()}")
+
+    @staticmethod
+    def _preprocess_image(image_bytes: Optional[bytes]) -> Optional[tuple[bytes, str]]:
+        """Shrink the downloaded image for OCR (skipped if the download failed)."""
+        if not image_bytes:
+            return None
+        processed, mime_type = preprocess_image(image_bytes)
+        print(f"✅ Downloaded image: {len(image_bytes)} bytes → {len(processed)} bytes ({mime_type})")
+        return processed, mime_type
+
+    @staticmethod
+    def _lookup_parse(user_id: str, image_bytes: Optional[bytes]) -> Optional[dict]:
+        """Look the original image bytes up in the parse cache."""
         if not image_bytes:
+            return None
+        return parse_cache.lookup(user_id, image_bytes)
+
+    def _parse_image(
+        self, user_id: str, image: Optional[tuple[bytes, str]], lookup: Optional[dict]
+    ) -> Optional[dict]:
+        """Parse the preprocessed image with Gemini Vision, reusing a cached parse."""
+        if image is None:
+            return None
+        if lookup["entry"] is not None:
+            print("♻️ Screenshot seen before, reusing its parse")
+            return lookup["entry"]["parsed"]
+        print("🤖 Sending to Gemini Vision...")
+        parsed = gemini_service.parse_transaction_image(*image)
+        if parsed:
+            parse_cache.store_parse(user_id, lookup, parsed)
+        return parsed
+
+    @staticmethod
+    def _ensure_user(user_id: str, profile: Optional[dict], parsed: Optional[dict]) -> None:
+        """Create the user row, once there is a parsed transaction to record."""
+        if not parsed:
+            return
+        display_name = profile.get("display_name", "User") if profile else "User"
+        sheets_service.get_or_create_user(user_id, display_name)
+
+    def _record_transaction(self, stages: StageGraph, reply_token: str, user_id: str) -> None:
+        # 1. Download image from LINE
+        if not stages.result("download"):
             print("❌ Failed to download image")
             self._reply_error(
                 reply_token,
@@ -33,11 +123,8 @@ class ImageHandler:
             )
             return
 
-        print(f"✅ Downloaded image: {len(image_bytes)} bytes")
-
         # 2. Parse image with Gemini Vision
-        print("🤖 Sending to Gemini Vision...")
-        parsed = gemini_service.parse_transaction_image(image_bytes)
+        parsed = stages.result("ocr")
         print(f"📋 Parsed result: {parsed}")
         if not parsed:
             self._reply_error(
@@ -50,19 +137,19 @@ class ImageHandler:
         # Log asset normalization
         asset_raw = parsed.get("asset_raw", parsed.get("asset", ""))
         asset_normalized = parsed.get("asset_normalized", asset_raw)
-        asset_type = parsed.get("asset_type", "UNKNOWN")
+        asset_type = parsed.get("asset_type") or "UNKNOWN"
         print(f"📊 Asset: {asset_raw} → {asset_normalized} ({asset_type})")
         
         # Use normalized asset for storage (for price lookups)
         parsed["asset"] = asset_normalized
 
-        # 3. Convert currency to THB if needed
-        currency = parsed.get("currency", "THB").upper()
+        # 3. Convert currency to THB if needed (the rate was prefetched)
+        currency = (parsed.get("currency") or "THB").upper()
         total_original = float(parsed.get("total", 0) or 0)
         usd_thb_rate = None
         
         if currency in ("USD", "USDT"):
-            usd_thb_rate = price_service.get_usd_thb_rate()
+            usd_thb_rate = stages.result("fx_rate")
             total_thb = total_original * usd_thb_rate
             print(f"💱 Converted {total_original} {currency} → {total_thb:.2f} THB (rate: {usd_thb_rate:.2f})")
         else:
@@ -74,20 +161,46 @@ class ImageHandler:
         parsed["original_total"] = total_original
 
         # 4. Ensure user exists
-        profile = line_service.get_profile(user_id)
-        display_name = profile.get("display_name", "User") if profile else "User"
-        sheets_service.get_or_create_user(user_id, display_name)
+        stages.result("ensure_user")
 
-        # 5. Create transaction and save to sheets
+        # 5. Hold likely duplicates (resent screenshot or same trade) for confirmation
         transaction = Transaction.from_parsed_image(parsed, user_id)
+        lookup = stages.result("cache_lookup")
+        pending = {"transaction": transaction.to_dict(), "currency": currency, "usd_thb_rate": usd_thb_rate}
+        duplicate_of = parse_cache.find_duplicate(user_id, lookup, pending["transaction"])
+        if duplicate_of:
+            print(f"⚠️ Likely duplicate of {duplicate_of}, waiting for confirmation")
+            parse_cache.hold_pending(user_id, lookup["key"], pending)
+            line_service.reply_flex(
+                reply_token,
+                "พบรายการที่อาจบันทึกซ้ำ",
+                FlexMessages.duplicate_transaction(pending["transaction"], duplicate_of, lookup["key"]),
+            )
+            return
+
+        # 6. Save to sheets and reply with confirmation
+        self._save_transaction(reply_token, user_id, lookup["key"], pending)
+
+    def record_pending(self, reply_token: str, user_id: str, key: str) -> None:
+        """Record a transaction held as a likely duplicate, once the user confirms it."""
+        pending = parse_cache.pop_pending(user_id, key)
+        if pending is None:
+            line_service.reply_text(reply_token, "⌛ รายการนี้หมดอายุหรือถูกบันทึกแล้ว กรุณาส่งรูปใหม่อีกครั้ง")
+            return
+        self._save_transaction(reply_token, user_id, key, pending)
+
+    def _save_transaction(self, reply_token: str, user_id: str, key: str, pending: dict) -> None:
+        transaction = Transaction.from_dict(pending["transaction"])
         tx_id = sheets_service.append_transaction(transaction.to_dict())
         transaction.tx_id = tx_id
+        valuation_engine.invalidate(user_id)
+        parse_cache.record_transaction(user_id, {"key": key}, transaction.to_dict())
 
-        # 6. Reply with confirmation
+        # Reply with confirmation
         tx_data = transaction.to_dict()
-        tx_data["original_currency"] = currency  # Include for display
-        if usd_thb_rate:
-            tx_data["usd_thb_rate"] = usd_thb_rate
+        tx_data["original_currency"] = pending["currency"]  # Include for display
+        if pending["usd_thb_rate"]:
+            tx_data["usd_thb_rate"] = pending["usd_thb_rate"]
         flex_content = FlexMessages.transaction_confirmation(tx_data)
         line_service.reply_flex(
             reply_token,
@@ -59,130 +59,52 @@ class MessageHandler:
         return any(kw in text for kw in keywords)
 
     def _reply_help(self, reply_token: str, user_id: str) -> None:
-        """Reply with service status (health check)."""
-        from utils.test_runner import run_all_tests
-        from services.line_service import line_service as ls
-        
-        # Send initial message
-        line_service.reply_text(reply_token, "🔍 กำลังตรวจสอบสถานะระบบ...")
-        
-        # Run tests
-        try:
-            result = run_all_tests()
-            
-            # Send status Flex Message
-            status_flex = FlexMessages.service_status(
-                services=result.services,
-                total_tests=result.total_tests,
-                passed=result.passed,
-                failed=result.failed,
-                timestamp=result.timestamp
-            )
-            
-            # Push message to user (since reply already sent)
-            ls.push_flex(user_id, "สถานะระบบ", status_flex)
-            
-        except Exception as e:
-            # Fallback to error message
-            error_msg = f"❌ ไม่สามารถตรวจสอบสถานะระบบได้\n\nError: {str(e)}"
-            ls.push_text(user_id, error_msg)
+        """Reply with service status from the cached background health probes."""
+        from services.health_service import health_service
 
+        summary = health_service.get_summary()
+        status_flex = FlexMessages.service_status(
+            results=summary["probes"],
+            timestamp=summary["checked_at"],
+        )
+        line_service.reply_flex(reply_token, "สถานะระบบ", status_flex)
 
     def _reply_status(self, reply_token: str, user_id: str) -> None:
         """Reply with portfolio status using visual Flex Messages with P/L."""
-        from services.price_service import price_service, PriceError
+        from services.valuation_service import valuation_engine
         
-        holdings = sheets_service.get_holdings_value(user_id)
+        # Raises PriceError (for GCP Error Reporting) if any price is missing
+        snapshot = valuation_engine.get_snapshot(user_id, require_prices=True)
 
-        if not holdings:
+        if snapshot.is_empty:
             line_service.reply_text(
                 reply_token,
                 "📊 ยังไม่มีข้อมูลการลงทุน\n\nส่งรูปหน้าจอการซื้อขายมาเพื่อเริ่มบันทึกได้เลย 📸",
             )
             return
 
-        try:
-            # Get real-time prices and exchange rate
-            tickers = list(holdings.keys())
-            current_prices = price_service.get_prices_thb(tickers)
-            usd_thb_rate = price_service.get_usd_thb_rate()
-            
-            # Check for missing prices - ERROR instead of fallback
-            missing_tickers = [t for t in tickers if t not in current_prices]
-            if missing_tickers:
-                raise PriceError(f"ไม่สามารถดึงราคา: {', '.join(missing_tickers)}")
-            
-            # Calculate values with market prices
-            holdings_data = []
-            total_cost = 0
-            total_current = 0
-            type_values = {"GOLD": 0, "STOCK": 0, "CRYPTO": 0}
-            
-            for ticker, data in holdings.items():
-                cost_basis = data["total_thb"]
-                qty = data["quantity"]
-                asset_type = data.get("asset_type") or FlexMessages.get_asset_type(ticker)
-                
-                current_value = qty * current_prices[ticker]
-                
-                pl_amount = current_value - cost_basis
-                pl_percent = (pl_amount / cost_basis * 100) if cost_basis > 0 else 0
-                
-                total_cost += cost_basis
-                total_current += current_value
-                type_values[asset_type] += current_value
-                
-                holdings_data.append({
-                    "ticker": ticker,
-                    "quantity": qty,
-                    "value": current_value,
-                    "cost": cost_basis,
-                    "pl_amount": pl_amount,
-                    "pl_percent": pl_percent,
-                    "asset_type": asset_type,
-                })
-            
-            # Calculate total P/L
-            total_pl = total_current - total_cost
-            total_pl_percent = (total_pl / total_cost * 100) if total_cost > 0 else 0
-            
-            # Calculate percentages based on current market value
-            type_ratios = {}
-            for asset_type, value in type_values.items():
-                if value > 0:
-                    type_ratios[asset_type] = (value / total_current) * 100
-            
-            for h in holdings_data:
-                h["percentage"] = (h["value"] / total_current) * 100 if total_current > 0 else 0
-            
-            # Sort by value descending
-            holdings_data.sort(key=lambda x: x["value"], reverse=True)
-            
-            # Send two Flex Messages as carousel with P/L
-            carousel = {
-                "type": "carousel",
-                "contents": [
-                    FlexMessages.portfolio_overview(
-                        total_current, 
-                        type_ratios, 
-                        total_pl=total_pl,
-                        total_pl_percent=total_pl_percent,
-                        usd_thb_rate=usd_thb_rate
-                    ),
-                    FlexMessages.ticker_breakdown(holdings_data),
-                ],
-            }
-            
-            line_service.reply_flex(reply_token, "สถานะพอร์ตลงทุน", carousel)
-            
-        except PriceError as e:
-            # Throw exception for GCP Error Reporting
-            raise e
+        # Send two Flex Messages as carousel with P/L
+        carousel = {
+            "type": "carousel",
+            "contents": [
+                FlexMessages.portfolio_overview(
+                    snapshot.total_value, 
+                    snapshot.type_ratios, 
+                    total_pl=snapshot.total_pl,
+                    total_pl_percent=snapshot.total_pl_percent,
+                    usd_thb_rate=snapshot.usd_thb_rate
+                ),
+                FlexMessages.ticker_breakdown(snapshot.holdings_by("value")),
+            ],
+        }
+        
+        line_service.reply_flex(reply_token, "สถานะพอร์ตลงทุน", carousel)
 
     def _reply_dca(self, reply_token: str, user_id: str) -> None:
         """Reply with Smart DCA plan using rebalance-by-buying logic."""
         from utils.dca_calculator import calculate_dca_rebalance, format_dca_message
-        from services.price_service import price_service, PriceError
+        from services.price_service import price_service
+        from services.valuation_service import valuation_engine
         
         user = sheets_service.get_user(user_id)
         
@@ -203,41 +125,24 @@ class MessageHandler:
             )
             return
 
-        try:
-            # Get current holdings with quantities
-            holdings = sheets_service.get_holdings_value(user_id)
-            
-            # Get real-time prices and calculate market values
-            tickers = list(holdings.keys())
-            current_prices = price_service.get_prices_thb(tickers)
-            
-            # Check for missing prices - ERROR instead of fallback
-            missing_tickers = [t for t in tickers if t not in current_prices]
-            if missing_tickers:
-                raise PriceError(f"ไม่สามารถดึงราคา: {', '.join(missing_tickers)}")
-            
-            current_values = {}
-            for asset, data in holdings.items():
-                qty = data["quantity"]
-                current_values[asset] = qty * current_prices[asset]
-            
-            # Calculate Smart DCA with market values
-            result = calculate_dca_rebalance(
-                monthly_budget=budget,
-                target_allocation=allocation,
-                current_holdings=current_values,
-            )
-            
-            # Get USD/THB rate for display
+        # Raises PriceError (for GCP Error Reporting) if any price is missing
+        snapshot = valuation_engine.get_snapshot(user_id, require_prices=True)
+        
+        # Calculate Smart DCA with market values
+        result = calculate_dca_rebalance(
+            monthly_budget=budget,
+            target_allocation=allocation,
+            current_holdings=snapshot.current_values,
+        )
+        
+        # Empty portfolios are valued without a rate; buy amounts still show USD
+        usd_thb_rate = snapshot.usd_thb_rate
+        if usd_thb_rate is None:
             usd_thb_rate = price_service.get_usd_thb_rate()
-            
-            # Format and send
-            message = format_dca_message(result, usd_thb_rate)
-            line_service.reply_text(reply_token, message)
-            
-        except PriceError as e:
-            # Throw exception for GCP Error Reporting
-            raise e
+
+        # Format and send
+        message = format_dca_message(result, usd_thb_rate)
+        line_service.reply_text(reply_token, message)
 
     def _reply_record_tip(self, reply_token: str) -> None:
         """Reply with tip to send image."""
@@ -248,76 +153,28 @@ class MessageHandler:
 
     def _reply_report(self, reply_token: str, user_id: str) -> None:
         """Reply with portfolio P/L report using real-time prices."""
-        from services.price_service import price_service, PriceError
+        from services.valuation_service import valuation_engine
         
-        holdings = sheets_service.get_holdings_value(user_id)
+        # Raises PriceError (for GCP Error Reporting) if any price is missing
+        snapshot = valuation_engine.get_snapshot(user_id, require_prices=True)
         
-        if not holdings:
+        if snapshot.is_empty:
             line_service.reply_text(
                 reply_token,
                 "📈 ยังไม่มีข้อมูลการลงทุน\n\nส่งรูปหน้าจอการซื้อขายมาเพื่อเริ่มบันทึกได้เลย 📸",
             )
             return
         
-        try:
-            # Get tickers for price lookup and exchange rate
-            tickers = list(holdings.keys())
-            current_prices = price_service.get_prices_thb(tickers)
-            usd_thb_rate = price_service.get_usd_thb_rate()
-            
-            # Check for missing prices - ERROR instead of fallback
-            missing_tickers = [t for t in tickers if t not in current_prices]
-            if missing_tickers:
-                raise PriceError(f"ไม่สามารถดึงราคา: {', '.join(missing_tickers)}")
-            
-            # Calculate P/L for each holding
-            total_cost = 0
-            total_current = 0
-            pl_data = []
-            
-            for ticker, data in holdings.items():
-                cost_basis = data["total_thb"]
-                qty = data["quantity"]
-                asset_type = data.get("asset_type", "STOCK")
-                
-                current_value = qty * current_prices[ticker]
-                
-                pl_amount = current_value - cost_basis
-                pl_percent = (pl_amount / cost_basis * 100) if cost_basis > 0 else 0
-                
-                total_cost += cost_basis
-                total_current += current_value
-                
-                pl_data.append({
-                    "ticker": ticker,
-                    "cost": cost_basis,
-                    "current": current_value,
-                    "pl_amount": pl_amount,
-                    "pl_percent": pl_percent,
-                    "asset_type": asset_type,
-                })
-            
-            # Sort by P/L amount descending
-            pl_data.sort(key=lambda x: x["pl_amount"], reverse=True)
-            
-            # Calculate totals
-            total_pl = total_current - total_cost
-            total_pl_percent = (total_pl / total_cost * 100) if total_cost > 0 else 0
-            
-            # Send P/L Flex Message
-            pl_flex = FlexMessages.report_pl(
-                total_cost=total_cost,
-                total_current=total_current,
-                total_pl=total_pl,
-                total_pl_percent=total_pl_percent,
-                holdings=pl_data,
-                usd_thb_rate=usd_thb_rate,
-            )
-            line_service.reply_flex(reply_token, "รายงานกำไร/ขาดทุน", pl_flex)
-            
-        except PriceError as e:
-            # Throw exception for GCP Error Reporting
-            raise e
+        # Send P/L Flex Message, holdings sorted by P/L amount descending
+        pl_flex = FlexMessages.report_pl(
+            total_cost=snapshot.total_cost,
+            total_current=snapshot.total_value,
+            total_pl=snapshot.total_pl,
+            total_pl_percent=snapshot.total_pl_percent,
+            holdings=snapshot.holdings_by("pl_amount"),
+            usd_thb_rate=snapshot.usd_thb_rate,
+        )
+        line_service.reply_flex(reply_token, "รายงานกำไร/ขาดทุน", pl_flex)
 
     def _reply_settings(self, reply_token: str) -> None:
         """Reply with budget selection."""
@@ -359,7 +216,7 @@ class MessageHandler:
 
     def _reply_rebalance(self, reply_token: str, user_id: str) -> None:
         """Reply with AI-powered rebalance analysis."""
-        from services.price_service import price_service, PriceError
+        from services.valuation_service import valuation_engine
         from utils.rebalance_calculator import calculate_rebalance_actions
         
         user = sheets_service.get_user(user_id)
@@ -373,53 +230,34 @@ class MessageHandler:
         
         allocation = user.get("target_allocation", {})
         
-        try:
-            # Get current holdings
-            holdings = sheets_service.get_holdings_value(user_id)
-            
-            if not holdings:
-                line_service.reply_text(
-                    reply_token,
-                    "📊 ยังไม่มีข้อมูลพอร์ต\n\nส่งรูปหน้าจอการซื้อขายมาเพื่อบันทึกรายการ",
-                )
-                return
-            
-            # Get real-time prices
-            tickers = list(holdings.keys())
-            current_prices = price_service.get_prices_thb(tickers)
-            usd_thb_rate = price_service.get_usd_thb_rate()
-            
-            # Calculate market values
-            current_values = {}
-            quantities = {}
-            for asset, data in holdings.items():
-                qty = data["quantity"]
-                quantities[asset] = qty
-                if asset in current_prices:
-                    current_values[asset] = qty * current_prices[asset]
-            
-            # Calculate rebalance actions
-            result = calculate_rebalance_actions(
-                target_allocation=allocation,
-                current_values=current_values,
-                quantities=quantities,
-                prices=current_prices,
-                usd_thb_rate=usd_thb_rate,
-                threshold=5.0,
+        snapshot = valuation_engine.get_snapshot(user_id)
+        
+        if snapshot.is_empty:
+            line_service.reply_text(
+                reply_token,
+                "📊 ยังไม่มีข้อมูลพอร์ต\n\nส่งรูปหน้าจอการซื้อขายมาเพื่อบันทึกรายการ",
             )
-            
-            # Get AI insight if there are drift issues
-            ai_insight = None
-            if result.get("total_drift_assets", 0) > 0:
-                from services.ai_insight_service import ai_insight_service
-                ai_insight = ai_insight_service.get_rebalance_insight(result)
-            
-            # Format and send rebalance report
-            flex_content = FlexMessages.rebalance_report(result, usd_thb_rate, ai_insight)
-            line_service.reply_flex(reply_token, "Rebalance Report", flex_content)
-            
-        except PriceError as e:
-            raise e
+            return
+        
+        # Calculate rebalance actions
+        result = calculate_rebalance_actions(
+            target_allocation=allocation,
+            current_values=snapshot.current_values,
+            quantities=dict(snapshot.quantities),
+            prices=snapshot.prices,
+            usd_thb_rate=snapshot.usd_thb_rate,
+            threshold=5.0,
+        )
+        
+        # Get AI insight if there are drift issues
+        ai_insight = None
+        if result.get("total_drift_assets", 0) > 0:
+            from services.ai_insight_service import ai_insight_service
+            ai_insight = ai_insight_service.get_rebalance_insight(result)
+        
+        # Format and send rebalance report
+        flex_content = FlexMessages.rebalance_report(result, snapshot.usd_thb_rate, ai_insight)
+        line_service.reply_flex(reply_token, "Rebalance Report", flex_content)
 
     def _reply_digest(self, reply_token: str, user_id: str) -> None:
         """Reply with on-demand technical analysis digest."""
@@ -29,6 +29,10 @@ class PostbackHandler:
             self._handle_budget_selection(user_id, reply_token, data)
         elif action == "skip_onboarding":
             self._skip_onboarding(user_id, reply_token)
+        elif action == "record_duplicate":
+            self._record_duplicate(user_id, reply_token, data)
+        elif action == "discard_duplicate":
+            self._discard_duplicate(user_id, reply_token, data)
         else:
             print(f"⚠️ Unknown postback action: {action}")
 
@@ -74,6 +78,19 @@ class PostbackHandler:
             "✅ ข้ามการตั้งค่าแล้ว ส่งรูปสลิปมาได้เลย! 📸"
         )
 
+    def _record_duplicate(self, user_id: str, reply_token: str, data: str) -> None:
+        """Record a screenshot transaction the user confirmed is not a duplicate."""
+        from handlers.image_handler import image_handler
+
+        image_handler.record_pending(reply_token, user_id, data.split("=", 1)[1])
+
+    def _discard_duplicate(self, user_id: str, reply_token: str, data: str) -> None:
+        """Drop a transaction held as a likely duplicate."""
+        from services.parse_cache import parse_cache
+
+        parse_cache.pop_pending(user_id, data.split("=", 1)[1])
+        line_service.reply_text(reply_token, "👌 ไม่ได้บันทึกรายการซ้ำ")
+
 
 # Singleton instance
 postback_handler = PostbackHandler()
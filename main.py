@@ -3,7 +3,9 @@
 This is the main entry point for the Cloud Function.
 """
 
+import logging
 import os
+from functools import partial
 from flask import Flask, request, abort
 
 from linebot.v3.exceptions import InvalidSignatureError
@@ -17,7 +19,14 @@ from linebot.v3.webhooks import (
 )
 
 from config import Config
+
+# Services log through the logging package; send their records to stderr
+# (collected by Cloud Run) alongside print() output
+logging.basicConfig(level=Config.LOG_LEVEL, format="%(levelname)s %(name)s: %(message)s")
+
 from services.line_service import line_service
+from services.event_queue import webhook_queue
+from services.webhook_dedup import webhook_dedup
 from handlers.message_handler import message_handler
 from handlers.image_handler import image_handler
 from handlers.follow_handler import follow_handler
@@ -38,6 +47,21 @@ def health_check():
     return {"status": "ok", "service": "Family Wealth AI"}
 
 
+@app.route("/health/deep", methods=["GET"])
+def deep_health_check():
+    """Latest cached dependency probe results (never calls upstream)."""
+    from services.health_service import health_service
+
+    summary = health_service.get_summary()
+    probes = {
+        name: {**result, "checked_at": result["checked_at"].isoformat()}
+        for name, result in summary["probes"].items()
+    }
+    checked_at = summary["checked_at"].isoformat() if summary["checked_at"] else None
+    body = {"status": summary["status"], "checked_at": checked_at, "probes": probes}
+    return body, 503 if summary["status"] == "degraded" else 200
+
+
 @app.route("/api/allocation", methods=["POST", "OPTIONS"])
 def save_allocation():
     """API endpoint for LIFF to save user allocation and digest settings."""
@@ -146,51 +170,41 @@ def rebalance_check():
     and send push notifications for those with significant drift.
     """
     from services.sheets_service import sheets_service
-    from services.price_service import price_service
+    from services.valuation_service import valuation_engine
     from services.ai_insight_service import ai_insight_service
     from utils.rebalance_calculator import calculate_rebalance_actions
     from utils.flex_messages import FlexMessages
     
     # Get all users with target allocations
     users = sheets_service.get_all_users_with_allocation()
+    allocations = {
+        user["user_id"]: user["target_allocation"]
+        for user in users
+        if user.get("user_id") and user.get("target_allocation")
+    }
     
     notifications_sent = 0
     errors = []
     
-    for user in users:
+    # Value every portfolio with one batched fetch for the union of all tickers
+    try:
+        snapshots, read_errors = valuation_engine.get_snapshots(list(allocations))
+        errors.extend(f"{user_id}: {error}" for user_id, error in read_errors.items())
+    except Exception as e:
+        errors.append(f"prices: {str(e)}")
+        snapshots = {}
+    
+    for user_id, snapshot in snapshots.items():
+        if snapshot.is_empty:
+            continue
         try:
-            user_id = user.get("user_id")
-            allocation = user.get("target_allocation", {})
-            
-            if not user_id or not allocation:
-                continue
-            
-            # Get holdings
-            holdings = sheets_service.get_holdings_value(user_id)
-            if not holdings:
-                continue
-            
-            # Get prices
-            tickers = list(holdings.keys())
-            current_prices = price_service.get_prices_thb(tickers)
-            usd_thb_rate = price_service.get_usd_thb_rate()
-            
-            # Calculate values
-            current_values = {}
-            quantities = {}
-            for asset, data in holdings.items():
-                qty = data["quantity"]
-                quantities[asset] = qty
-                if asset in current_prices:
-                    current_values[asset] = qty * current_prices[asset]
-            
             # Calculate rebalance actions
             result = calculate_rebalance_actions(
-                target_allocation=allocation,
-                current_values=current_values,
-                quantities=quantities,
-                prices=current_prices,
-                usd_thb_rate=usd_thb_rate,
+                target_allocation=allocations[user_id],
+                current_values=snapshot.current_values,
+                quantities=dict(snapshot.quantities),
+                prices=snapshot.prices,
+                usd_thb_rate=snapshot.usd_thb_rate,
                 threshold=5.0,
             )
             
@@ -200,12 +214,12 @@ def rebalance_check():
                 ai_insight = ai_insight_service.get_rebalance_insight(result)
                 
                 # Send push notification
-                flex_content = FlexMessages.rebalance_report(result, usd_thb_rate, ai_insight)
+                flex_content = FlexMessages.rebalance_report(result, snapshot.usd_thb_rate, ai_insight)
                 line_service.push_flex(user_id, "📊 Quarterly Rebalance Alert", flex_content)
                 notifications_sent += 1
                 
         except Exception as e:
-            errors.append(f"{user.get('user_id', 'unknown')}: {str(e)}")
+            errors.append(f"{user_id}: {str(e)}")
     
     return {
         "status": "ok",
@@ -219,38 +233,43 @@ def rebalance_check():
 def digest_push():
     """Scheduled endpoint for technical analysis digest push.
     
-    Triggered hourly by Cloud Scheduler. Checks each user's
-    preferred schedule and sends digests to matching users.
+    Triggered hourly by Cloud Scheduler. Looks up the users whose
+    schedule bucket is due this hour and sends them their digests.
     """
-    from services.sheets_service import sheets_service
     from services.digest_service import digest_service
     from services.line_service import line_service
     from utils.flex_messages import FlexMessages
     
-    users = sheets_service.get_users_for_digest()
-    sent = 0
-    errors = []
-    
-    for user in users:
-        try:
-            user_id = user.get("user_id")
-            if not user_id:
-                continue
-                
-            if digest_service.should_send_now(user):
-                results = digest_service.generate_digest(user_id)
-                if results:
-                    flex_carousel = FlexMessages.digest_report_carousel(results)
-                    line_service.push_flex(user_id, "📡 รายงานวิเคราะห์เทคนิค", flex_carousel)
-                    sent += 1
-        except Exception as e:
-            errors.append(f"{user.get('user_id', 'unknown')}: {str(e)}")
-            
+    # Only the (hour, frequency, day) buckets due now are read from the schedule index
+    now = digest_service.get_current_time_ict()
+    users = digest_service.get_due_users(now)
+
+    def deliver(user_id, results):
+        flex_carousel = FlexMessages.digest_report_carousel(results)
+        line_service.push_flex(user_id, "📡 รายงานวิเคราะห์เทคนิค", flex_carousel)
+
+    # Assets are analyzed once and pushed in parallel; users still pending at
+    # the deadline are sent by the next trigger of the same hour
+    report = digest_service.run_digest(users, deliver, now=now)
+
     return {
         "status": "ok",
-        "sent": sent,
+        "sent": report["sent"],
         "users_checked": len(users),
-        "errors": errors if errors else None
+        "users_due": report["due"],
+        "already_sent": report["already_sent"],
+        "pending": report["pending"],
+        "errors": report["errors"] if report["errors"] else None
+    }
+
+
+@app.route("/api/webhook-stats", methods=["GET"])
+def webhook_stats():
+    """Webhook event queue depth and de-duplication counters."""
+    return {
+        "status": "ok",
+        "queue": webhook_queue.get_stats(),
+        "dedup": webhook_dedup.get_stats(),
     }
 
 
@@ -265,13 +284,49 @@ def webhook():
 
     # Validate signature
     try:
-        line_service.handler.handle(body, signature)
+        payload = line_service.handler.parse(body, signature)
     except InvalidSignatureError:
         abort(400, "Invalid signature")
 
+    # LINE redelivers slow or failed requests; skip events already accepted
+    events = [event for event in payload.events if webhook_dedup.claim(event)]
+
+    if not Config.WEBHOOK_ASYNC:
+        for i, event in enumerate(events):
+            try:
+                line_service.handler.dispatch(event, payload.destination)
+            except Exception:
+                # The request fails, so let LINE's redelivery of this and
+                # the undispatched events through
+                for unhandled in events[i:]:
+                    webhook_dedup.release(unhandled)
+                raise
+        return "OK"
+
+    # Acknowledge now; workers process each user's events in order
+    jobs = [
+        (_event_order_key(event), partial(line_service.handler.dispatch, event, payload.destination))
+        for event in events
+    ]
+    if not webhook_queue.submit_all(jobs):
+        # Let LINE's redelivery through once there is room again
+        for event in events:
+            webhook_dedup.release(event)
+        abort(503, "Event queue full")
+
     return "OK"
 
 
+def _event_order_key(event) -> str:
+    """Key events whose handling must stay in order: the sending user (or chat)."""
+    source = getattr(event, "source", None)
+    for attr in ("user_id", "group_id", "room_id"):
+        value = getattr(source, attr, None)
+        if value:
+            return value
+    return getattr(event, "webhook_event_id", None) or str(id(event))
+
+
 # Register event handlers
 @line_service.handler.add(MessageEvent, message=TextMessageContent)
 def handle_text_message(event: MessageEvent):
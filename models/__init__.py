@@ -2,5 +2,6 @@
 
 from .user import User
 from .transaction import Transaction
+from .portfolio import AssetValuation, PortfolioSnapshot
 
-__all__ = ["User", "Transaction"]
+__all__ = ["User", "Transaction", "AssetValuation", "PortfolioSnapshot"]
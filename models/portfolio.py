@@ -0,0 +1,103 @@
+"""Portfolio valuation snapshot models for Family Wealth AI."""
+
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+
+@dataclass(frozen=True)
+class AssetValuation:
+    """Market valuation of one holding (all amounts in THB)."""
+
+    ticker: str
+    asset_type: str       # GOLD, STOCK, CRYPTO
+    quantity: float
+    price: float          # Current price per unit
+    value: float          # quantity * price
+    cost: float           # Cost basis
+    pl_amount: float
+    pl_percent: float
+    percentage: float     # Share of the portfolio's market value
+
+    def to_dict(self) -> dict:
+        """Convert to the holding dict the Flex builders expect."""
+        return {
+            "ticker": self.ticker,
+            "asset_type": self.asset_type,
+            "quantity": self.quantity,
+            "price": self.price,
+            "value": self.value,
+            "current": self.value,
+            "cost": self.cost,
+            "pl_amount": self.pl_amount,
+            "pl_percent": self.pl_percent,
+            "percentage": self.percentage,
+        }
+
+
+@dataclass(frozen=True)
+class PortfolioSnapshot:
+    """Immutable valuation of one user's portfolio at a point in time.
+
+    Holdings without a current price are listed in `missing` and left out
+    of every total.
+    """
+
+    user_id: str
+    assets: tuple[AssetValuation, ...]
+    missing: tuple[str, ...]
+    quantities: Mapping[str, float]     # Every holding, priced or not
+    usd_thb_rate: Optional[float]      # None for an empty portfolio
+    valued_at: datetime
+
+    def __post_init__(self):
+        object.__setattr__(self, "quantities", MappingProxyType(dict(self.quantities)))
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.assets and not self.missing
+
+    @property
+    def total_value(self) -> float:
+        return sum(a.value for a in self.assets)
+
+    @property
+    def total_cost(self) -> float:
+        return sum(a.cost for a in self.assets)
+
+    @property
+    def total_pl(self) -> float:
+        return self.total_value - self.total_cost
+
+    @property
+    def total_pl_percent(self) -> float:
+        total_cost = self.total_cost
+        return (self.total_pl / total_cost * 100) if total_cost > 0 else 0
+
+    @property
+    def prices(self) -> dict[str, float]:
+        """Current THB price per priced ticker."""
+        return {a.ticker: a.price for a in self.assets}
+
+    @property
+    def current_values(self) -> dict[str, float]:
+        """Current THB value per priced ticker."""
+        return {a.ticker: a.value for a in self.assets}
+
+    @property
+    def type_ratios(self) -> dict[str, float]:
+        """Share of market value per asset type, in percent."""
+        total_value = self.total_value
+        type_values: dict[str, float] = {}
+        for a in self.assets:
+            type_values[a.asset_type] = type_values.get(a.asset_type, 0) + a.value
+        return {
+            asset_type: value / total_value * 100
+            for asset_type, value in type_values.items()
+            if value > 0
+        }
+
+    def holdings_by(self, key: str) -> list[dict]:
+        """Holding dicts sorted by key (e.g. "value" or "pl_amount"), largest first."""
+        return sorted((a.to_dict() for a in self.assets), key=lambda h: h[key], reverse=True)
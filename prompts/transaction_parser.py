@@ -52,3 +52,34 @@ Keep the base crypto symbol only (without trading pair suffix).
 - If you cannot determine a field with certainty, use null
 - Always return valid JSON only, no other text
 """
+
+# Response schema for PARSE_TRANSACTION_PROMPT (Gemini structured output).
+# Mirrors the fields Transaction.from_parsed_image reads; amounts are in the
+# screenshot's currency and converted to THB afterwards. Every field the
+# prompt allows to be uncertain is nullable, so the model can answer null
+# instead of inventing a value; GeminiService.parse_transaction_response
+# rejects parses whose key fields are null.
+PARSE_TRANSACTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "source_app": {"type": "STRING", "nullable": True, "enum": ["Dime", "Binance", "Bitkub"]},
+        "asset_raw": {"type": "STRING", "nullable": True, "description": "Asset name/symbol exactly as shown"},
+        "asset_type": {"type": "STRING", "nullable": True, "enum": ["STOCK", "GOLD", "CRYPTO"]},
+        "asset_normalized": {"type": "STRING", "nullable": True, "description": "Symbol after the normalization rules"},
+        "side": {"type": "STRING", "nullable": True, "enum": ["BUY", "SELL"]},
+        "amount": {"type": "NUMBER", "nullable": True, "description": "Quantity bought or sold"},
+        "price": {"type": "NUMBER", "nullable": True, "description": "Price per unit"},
+        "currency": {"type": "STRING", "nullable": True, "enum": ["USD", "THB", "USDT"]},
+        "total": {"type": "NUMBER", "nullable": True, "description": "Total value in the original currency"},
+        "date": {"type": "STRING", "nullable": True, "description": "YYYY-MM-DD, null if not visible"},
+        "confidence": {"type": "STRING", "enum": ["high", "medium", "low"]},
+    },
+    "required": [
+        "source_app", "asset_raw", "asset_type", "asset_normalized", "side",
+        "amount", "price", "currency", "total", "confidence",
+    ],
+    "propertyOrdering": [
+        "source_app", "asset_raw", "asset_type", "asset_normalized", "side",
+        "amount", "price", "currency", "total", "date", "confidence",
+    ],
+}
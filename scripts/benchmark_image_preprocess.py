@@ -0,0 +1,200 @@
+"""Benchmark OCR screenshot preprocessing: payload size vs. parse accuracy.
+
+Runs each screenshot through preprocess_image at several resolutions and
+reports the upload size, preprocessing time and, with --ocr, the Gemini
+parse accuracy, latency and image token count per setting.
+
+Samples are read from --samples DIR as <app>_<name>.png|jpg (app is dime,
+binance or bitkub) with an optional <app>_<name>.json sidecar holding the
+expected parse, e.g. {"asset_normalized": "AAPL", "side": "BUY",
+"amount": 1.5, "price": 189.3, "currency": "USD"}. Without --samples,
+synthetic 3x-density screenshots of each app are rendered instead:
+
+    python3 scripts/benchmark_image_preprocess.py
+    python3 scripts/benchmark_image_preprocess.py --samples ~/screenshots --ocr
+    python3 scripts/benchmark_image_preprocess.py --sides 0 1536 1024 768 --quality 70
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from utils.image_preprocess import detect_mime_type, preprocess_image
+
+APPS = ("dime", "binance", "bitkub")
+
+# Synthetic screens: (header colour, text colour, background, expected parse)
+SYNTHETIC_SCREENS = {
+    "dime": ("#1B1B3A", "#111111", "#FFFFFF", {
+        "asset_normalized": "AAPL", "side": "BUY", "amount": 1.5,
+        "price": 189.3, "currency": "USD",
+    }),
+    "binance": ("#181A20", "#EAECEF", "#0B0E11", {
+        "asset_normalized": "BTC", "side": "BUY", "amount": 0.0123,
+        "price": 67250.5, "currency": "USDT",
+    }),
+    "bitkub": ("#00C05A", "#1A1A1A", "#F5F7F6", {
+        "asset_normalized": "ETH", "side": "SELL", "amount": 0.25,
+        "price": 112500, "currency": "THB",
+    }),
+}
+
+# Relative tolerance for numeric fields
+NUMERIC_TOLERANCE = 0.005
+
+
+def render_synthetic(app: str) -> bytes:
+    """Render a 1170x2532 PNG order-confirmation screen with known values."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    header, text, background, expected = SYNTHETIC_SCREENS[app]
+    image = Image.new("RGB", (1170, 2532), background)
+    draw = ImageDraw.Draw(image)
+    title_font = ImageFont.load_default(size=64)
+    font = ImageFont.load_default(size=48)
+
+    draw.rectangle((0, 0, 1170, 260), fill=header)
+    draw.text((60, 150), f"{app.capitalize()} - Order Completed", font=title_font, fill="#FFFFFF")
+
+    total = expected["amount"] * expected["price"]
+    rows = [
+        ("Symbol", expected["asset_normalized"]),
+        ("Side", expected["side"]),
+        ("Quantity", f"{expected['amount']:,}"),
+        ("Price", f"{expected['price']:,} {expected['currency']}"),
+        ("Total", f"{total:,.2f} {expected['currency']}"),
+        ("Fee", f"0.00 {expected['currency']}"),
+        ("Date", "2025-01-15 14:32"),
+    ]
+    for i, (label, value) in enumerate(rows):
+        y = 420 + i * 130
+        draw.text((60, y), label, font=font, fill="#888888")
+        draw.text((1110, y), value, font=font, fill=text, anchor="ra")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def load_samples(directory: str | None) -> list[tuple[str, bytes, dict | None]]:
+    """Load (name, image bytes, expected parse or None) per sample."""
+    if not directory:
+        return [(f"{app}_synthetic", render_synthetic(app), SYNTHETIC_SCREENS[app][3]) for app in APPS]
+
+    samples = []
+    for path in sorted(glob.glob(os.path.join(os.path.expanduser(directory), "*"))):
+        name, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() not in (".png", ".jpg", ".jpeg", ".webp") or name.split("_")[0] not in APPS:
+            continue
+        expected = None
+        sidecar = os.path.splitext(path)[0] + ".json"
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                expected = json.load(f)
+        with open(path, "rb") as f:
+            samples.append((name, f.read(), expected))
+    return samples
+
+
+def field_accuracy(parsed: dict | None, expected: dict) -> float:
+    """Fraction of expected fields the parse got right."""
+    if not parsed:
+        return 0.0
+    correct = 0
+    for key, value in expected.items():
+        actual = parsed.get(key)
+        if isinstance(value, (int, float)):
+            try:
+                correct += abs(float(actual) - value) <= abs(value) * NUMERIC_TOLERANCE
+            except (TypeError, ValueError):
+                pass
+        else:
+            correct += str(actual).upper() == str(value).upper()
+    return correct / len(expected)
+
+
+def count_image_tokens(gemini_service, data: bytes, mime_type: str) -> int:
+    from google.genai import types
+
+    response = gemini_service.client.models.count_tokens(
+        model=gemini_service.ocr_model,
+        contents=[types.Part.from_bytes(data=data, mime_type=mime_type)],
+    )
+    return response.total_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", help="Directory of <app>_<name>.png|jpg screenshots")
+    parser.add_argument(
+        "--sides", type=int, nargs="+", default=[0, 2048, 1536, 1024, 768],
+        help="Longest-side settings to compare (0 = original image)",
+    )
+    parser.add_argument("--quality", type=int, default=Config.OCR_IMAGE_JPEG_QUALITY, help="JPEG quality")
+    parser.add_argument("--ocr", action="store_true", help="Also run Gemini OCR and score accuracy")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        print(f"❌ No dime_/binance_/bitkub_ screenshots found in {args.samples}")
+        sys.exit(1)
+
+    gemini_service = None
+    if args.ocr:
+        if not Config.GEMINI_API_KEY:
+            print("❌ --ocr needs GEMINI_API_KEY")
+            sys.exit(1)
+        from services.gemini_service import gemini_service
+
+    source = args.samples or "synthetic screenshots"
+    print(f"📸 {len(samples)} samples from {source}, JPEG quality {args.quality}\n")
+
+    header = f"{'max side':>8}  {'avg KB':>8}  {'vs orig':>7}  {'prep ms':>7}"
+    if args.ocr:
+        header += f"  {'accuracy':>8}  {'OCR ms':>7}  {'tokens':>6}"
+    print(header)
+
+    for side in args.sides:
+        sizes, ratios, prep_ms, accuracy, ocr_ms, tokens = [], [], [], [], [], []
+        for name, data, expected in samples:
+            started = time.perf_counter()
+            processed, mime_type = preprocess_image(data, max_side=side, quality=args.quality)
+            prep_ms.append((time.perf_counter() - started) * 1000)
+            sizes.append(len(processed) / 1024)
+            ratios.append(len(processed) / len(data))
+
+            if gemini_service is not None:
+                started = time.perf_counter()
+                parsed = gemini_service.parse_transaction_image(processed, mime_type)
+                ocr_ms.append((time.perf_counter() - started) * 1000)
+                tokens.append(count_image_tokens(gemini_service, processed, mime_type))
+                if expected:
+                    accuracy.append(field_accuracy(parsed, expected))
+
+        label = "original" if side == 0 else str(side)
+        row = (
+            f"{label:>8}  {statistics.mean(sizes):>8.1f}  {statistics.mean(ratios):>6.0%}"
+            f"  {statistics.mean(prep_ms):>7.1f}"
+        )
+        if args.ocr:
+            acc = f"{statistics.mean(accuracy):.0%}" if accuracy else "n/a"
+            row += f"  {acc:>8}  {statistics.mean(ocr_ms):>7.0f}  {statistics.mean(tokens):>6.0f}"
+        print(row)
+
+    formats = sorted({detect_mime_type(data) or "unknown" for _, data, _ in samples})
+    print(f"\nInput formats: {', '.join(formats)}")
+    if args.ocr and not any(expected for _, _, expected in samples):
+        print("⚠️  No .json sidecars found: accuracy not scored")
+
+
+if __name__ == "__main__":
+    main()
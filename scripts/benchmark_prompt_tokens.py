@@ -0,0 +1,128 @@
+"""Benchmark digest prompt size: indented full-precision payloads vs compact encoding.
+
+Builds representative indicator payloads (synthetic candles at each asset's
+price level, or live data with --live) and compares the prompt sent to Gemini
+before and after compact payload encoding. Token counts come from the Gemini
+count_tokens endpoint when GEMINI_API_KEY is set:
+
+    python3 scripts/benchmark_prompt_tokens.py
+    python3 scripts/benchmark_prompt_tokens.py --live --tickers BTC GOLD NVDA
+    python3 scripts/benchmark_prompt_tokens.py --offline   # characters only
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from prompts.digest_prompt import (
+    DIGEST_BATCH_ASSET_TEMPLATE,
+    DIGEST_BATCH_PROMPT_TEMPLATE,
+    DIGEST_PROMPT_TEMPLATE,
+)
+from services.digest_service import DigestService
+from services.technical_analysis_service import TechnicalAnalysisService, ta_service
+from benchmark_volume_profile import synthetic_ohlcv
+
+# Rough price level per ticker, used to scale the synthetic candles
+PRICE_LEVELS = {"BTC": 92_000, "ETH": 3_400, "GOLD": 2_350, "NVDA": 125, "DOGE": 0.16}
+
+
+class SyntheticStore:
+    """Stands in for OHLCVStore, serving random-walk candles at a price level."""
+
+    def __init__(self, bars: int = 400):
+        self.bars = bars
+
+    def get_history(self, symbol: str, days: int = 365, min_bars: int = 50):
+        ticker = symbol.split("-")[0].upper()
+        level = PRICE_LEVELS.get(ticker, 100)
+        df = synthetic_ohlcv(self.bars, seed=sum(map(ord, ticker)))
+        # synthetic_ohlcv walks around 100; rescale to the asset's level
+        df[["Open", "High", "Low", "Close"]] *= level / 100
+        return df
+
+
+def build_payloads(tickers: list[str], live: bool) -> dict[str, dict]:
+    service = ta_service if live else TechnicalAnalysisService(ohlcv_store=SyntheticStore())
+    return {ticker: service.compute_indicators(ticker) for ticker in tickers}
+
+
+def legacy_prompt(digest: DigestService, ticker: str, payload: dict) -> str:
+    """The prompt as built before compact encoding: indented, full precision."""
+    fields = digest._prompt_fields(ticker, payload)
+    fields["json_payload"] = json.dumps(payload, indent=2, ensure_ascii=False)
+    return DIGEST_PROMPT_TEMPLATE.format(**fields)
+
+
+def batch_prompt(digest: DigestService, payloads: dict[str, dict]) -> str:
+    sections = [
+        DIGEST_BATCH_ASSET_TEMPLATE.format(ticker=ticker, **digest._prompt_fields(ticker, payload))
+        for ticker, payload in payloads.items()
+    ]
+    return DIGEST_BATCH_PROMPT_TEMPLATE.format(
+        tickers=", ".join(payloads), asset_sections="\n".join(sections)
+    )
+
+
+def token_counter(offline: bool):
+    """Get a prompt -> token count function, or None to compare characters only."""
+    if offline or not Config.GEMINI_API_KEY:
+        return None
+    from services.gemini_service import gemini_service
+
+    def count(prompt: str) -> int:
+        response = gemini_service.client.models.count_tokens(
+            model=gemini_service.research_model, contents=prompt
+        )
+        return response.total_tokens
+
+    return count
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", nargs="+", default=list(PRICE_LEVELS))
+    parser.add_argument("--live", action="store_true", help="Use live market data instead of synthetic candles")
+    parser.add_argument("--offline", action="store_true", help="Skip the Gemini token count API")
+    args = parser.parse_args()
+
+    tickers = [t.upper() for t in args.tickers]
+    digest = DigestService()
+    payloads = build_payloads(tickers, args.live)
+    count = token_counter(args.offline)
+    unit = "tokens" if count else "chars"
+    measure = count or len
+
+    print(f"📏 Digest prompt size ({unit}, {'live' if args.live else 'synthetic'} payloads)\n")
+    if not count:
+        print("ℹ️  GEMINI_API_KEY not set or --offline given: comparing characters only\n")
+    print(f"{'ticker':<8}  {'old':>8}  {'compact':>8}  {'saved':>7}")
+
+    old_total = new_total = 0
+    for ticker, payload in payloads.items():
+        old = measure(legacy_prompt(digest, ticker, payload))
+        new = measure(digest._narrative_prompt(ticker, payload))
+        old_total += old
+        new_total += new
+        print(f"{ticker:<8}  {old:>8}  {new:>8}  {1 - new / old:>6.1%}")
+
+    print(f"{'total':<8}  {old_total:>8}  {new_total:>8}  {1 - new_total / old_total:>6.1%}")
+
+    if len(payloads) > 1:
+        batched = measure(batch_prompt(digest, payloads))
+        print(f"\n📦 Batched compact prompt for {len(payloads)} tickers: {batched} {unit} "
+              f"({1 - batched / old_total:.1%} below {len(payloads)} legacy prompts)")
+
+    all_smaller = new_total < old_total
+    print()
+    print("✅ Compact prompts are smaller" if all_smaller else "❌ Compact prompts are not smaller")
+    return all_smaller
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,164 @@
+"""Regression harness for screenshot parsing: tokens, latency, failures and accuracy.
+
+Parses each sample screenshot with the legacy free-text request (JSON in
+prose, 8000 output tokens, markdown fences stripped) and with JSON schema
+mode at each thinking budget, and reports per mode the parse-failure rate,
+field accuracy, output and thinking tokens, and latency:
+
+    python3 scripts/benchmark_transaction_parse.py --samples ~/screenshots --runs 3
+    python3 scripts/benchmark_transaction_parse.py --budgets 0 512 1024 -1
+    python3 scripts/benchmark_transaction_parse.py --save parse_baseline.json
+    python3 scripts/benchmark_transaction_parse.py --check parse_baseline.json
+
+Samples follow scripts/benchmark_image_preprocess.py (<app>_<name>.png|jpg
+with .json sidecars of expected fields; synthetic screens if --samples is
+omitted). --check exits 1 if a mode's failure rate or accuracy got worse,
+or its median latency or output tokens grew more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.genai import types
+
+from config import Config
+from prompts.transaction_parser import PARSE_TRANSACTION_PROMPT
+from services.gemini_service import GeminiService
+from utils.image_preprocess import preprocess_image
+from benchmark_image_preprocess import field_accuracy, load_samples
+
+# The request as it was before schema mode
+LEGACY_CONFIG = types.GenerateContentConfig(temperature=0.1, max_output_tokens=8000)
+
+
+def run_mode(service: GeminiService, config, samples, runs: int) -> dict:
+    """Parse every sample `runs` times with one generation config."""
+    latencies, output_tokens, thinking_tokens, accuracy = [], [], [], []
+    failures = attempts = 0
+    for _ in range(runs):
+        for name, data, expected in samples:
+            image, mime_type = preprocess_image(data)
+            part = types.Part.from_bytes(data=image, mime_type=mime_type)
+            attempts += 1
+            started = time.perf_counter()
+            try:
+                response = service.client.models.generate_content(
+                    model=service.ocr_model, contents=[PARSE_TRANSACTION_PROMPT, part], config=config
+                )
+            except Exception as e:
+                print(f"   ❌ {name}: {e}")
+                failures += 1
+                if expected:
+                    accuracy.append(0.0)
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+            usage = response.usage_metadata
+            output_tokens.append(usage.candidates_token_count or 0)
+            thinking_tokens.append(usage.thoughts_token_count or 0)
+
+            parsed = service.parse_transaction_response(response)
+            if parsed is None:
+                failures += 1
+            if expected:
+                accuracy.append(field_accuracy(parsed, expected))
+
+    def p95(values):
+        return statistics.quantiles(values, n=20)[-1] if len(values) > 1 else (values[0] if values else 0)
+
+    return {
+        "attempts": attempts,
+        "failure_rate": failures / attempts if attempts else 0,
+        "accuracy": statistics.mean(accuracy) if accuracy else None,
+        "output_tokens": statistics.mean(output_tokens) if output_tokens else 0,
+        "thinking_tokens": statistics.mean(thinking_tokens) if thinking_tokens else 0,
+        "latency_p50_ms": statistics.median(latencies) if latencies else 0,
+        "latency_p95_ms": p95(latencies),
+    }
+
+
+def check_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Compare with a saved run; returns one message per regression."""
+    problems = []
+    for mode, current in results.items():
+        before = baseline.get(mode)
+        if before is None:
+            continue
+        if current["failure_rate"] > before["failure_rate"]:
+            problems.append(f"{mode}: failure rate {before['failure_rate']:.0%} → {current['failure_rate']:.0%}")
+        if current["accuracy"] is not None and before.get("accuracy") is not None \
+                and current["accuracy"] < before["accuracy"]:
+            problems.append(f"{mode}: accuracy {before['accuracy']:.0%} → {current['accuracy']:.0%}")
+        for metric in ("latency_p50_ms", "output_tokens"):
+            if before[metric] and current[metric] > before[metric] * (1 + tolerance):
+                problems.append(f"{mode}: {metric} {before[metric]:.0f} → {current[metric]:.0f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", help="Directory of <app>_<name>.png|jpg screenshots")
+    parser.add_argument("--runs", type=int, default=3, help="Passes over the samples per mode")
+    parser.add_argument(
+        "--budgets", type=int, nargs="+", default=[Config.GEMINI_OCR_THINKING_BUDGET],
+        help="Thinking budgets to try in schema mode (-1 = model decides)",
+    )
+    parser.add_argument("--no-legacy", action="store_true", help="Skip the legacy free-text mode")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--check", help="Fail on regressions against this saved JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed latency/token growth")
+    args = parser.parse_args()
+
+    if not Config.GEMINI_API_KEY:
+        print("❌ GEMINI_API_KEY is required")
+        sys.exit(1)
+
+    samples = load_samples(args.samples)
+    if not samples:
+        print(f"❌ No dime_/binance_/bitkub_ screenshots found in {args.samples}")
+        sys.exit(1)
+
+    service = GeminiService()
+    modes = {} if args.no_legacy else {"legacy": LEGACY_CONFIG}
+    for budget in args.budgets:
+        modes[f"schema:{budget}"] = service.transaction_parse_config(thinking_budget=budget)
+
+    print(f"🧪 {len(samples)} samples x {args.runs} runs on {service.ocr_model}\n")
+    results = {}
+    for mode, config in modes.items():
+        print(f"▶️  {mode}")
+        results[mode] = run_mode(service, config, samples, args.runs)
+
+    print(f"\n{'mode':<14} {'fail':>5} {'accuracy':>8} {'out tok':>7} {'think tok':>9} {'p50 ms':>7} {'p95 ms':>7}")
+    for mode, r in results.items():
+        accuracy = f"{r['accuracy']:.0%}" if r["accuracy"] is not None else "n/a"
+        print(
+            f"{mode:<14} {r['failure_rate']:>5.0%} {accuracy:>8} {r['output_tokens']:>7.0f}"
+            f" {r['thinking_tokens']:>9.0f} {r['latency_p50_ms']:>7.0f} {r['latency_p95_ms']:>7.0f}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+
+    if args.check:
+        with open(args.check) as f:
+            problems = check_regressions(results, json.load(f), args.tolerance)
+        if problems:
+            print("\n⚠️  Regressions:")
+            for problem in problems:
+                print(f"   {problem}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.check}")
+
+
+if __name__ == "__main__":
+    main()
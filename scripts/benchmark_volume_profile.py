@@ -0,0 +1,169 @@
+"""Benchmark the vectorized volume profile against the original per-bar loop.
+
+Checks that both produce identical output, then times them at several
+window sizes:
+
+    python3 scripts/benchmark_volume_profile.py
+    python3 scripts/benchmark_volume_profile.py --bars 60 500 5000 --repeat 20
+"""
+
+import argparse
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.technical_analysis_service import TechnicalAnalysisService
+
+
+def legacy_volume_profile(df: pd.DataFrame, price: float, lookback: int, num_bins: int) -> dict:
+    """The original iterrows implementation, kept as the reference."""
+    vp_df = df.iloc[-lookback:]
+    min_p = float(vp_df["Low"].min())
+    max_p = float(vp_df["High"].max())
+
+    bins = np.zeros(num_bins)
+    bin_edges = np.linspace(min_p, max_p, num_bins + 1)
+    bin_centers = bin_edges[:-1] + (max_p - min_p) / (2 * num_bins)
+    bin_width = (max_p - min_p) / num_bins
+
+    for _, row in vp_df.iterrows():
+        high = row["High"]
+        low = row["Low"]
+        vol = row["Volume"]
+        if pd.isna(high) or pd.isna(low) or pd.isna(vol) or vol <= 0:
+            continue
+
+        if high == low:
+            bin_idx = min(max(0, int((low - min_p) / bin_width)), num_bins - 1)
+            bins[bin_idx] += vol
+        else:
+            overlap_indices = []
+            for i in range(num_bins):
+                if bin_edges[i] <= high and bin_edges[i+1] >= low:
+                    overlap_indices.append(i)
+            if overlap_indices:
+                val_per_bin = vol / len(overlap_indices)
+                for i in overlap_indices:
+                    bins[i] += val_per_bin
+
+    poc_idx = int(np.argmax(bins))
+    hvn_threshold = 0.8 * bins[poc_idx] if bins[poc_idx] > 0 else 0
+    hvn_indices = [i for i, v in enumerate(bins) if v >= hvn_threshold]
+
+    immediate_support_hvn = min_p
+    immediate_resistance_hvn = max_p
+    support_candidates = [bin_centers[i] for i in hvn_indices if bin_centers[i] < price]
+    if support_candidates:
+        immediate_support_hvn = float(support_candidates[-1])
+    resistance_candidates = [bin_centers[i] for i in hvn_indices if bin_centers[i] > price]
+    if resistance_candidates:
+        immediate_resistance_hvn = float(resistance_candidates[0])
+
+    lvn_threshold = 0.2 * bins[poc_idx] if bins[poc_idx] > 0 else 0
+    price_bin_idx = min(max(0, int((price - min_p) / bin_width)), num_bins - 1)
+    start_idx = min(price_bin_idx, poc_idx)
+    end_idx = max(price_bin_idx, poc_idx)
+
+    consecutive_lvn = []
+    max_consecutive_lvn = []
+    for i in range(start_idx, end_idx + 1):
+        if bins[i] <= lvn_threshold:
+            consecutive_lvn.append(i)
+        else:
+            if len(consecutive_lvn) > len(max_consecutive_lvn):
+                max_consecutive_lvn = list(consecutive_lvn)
+            consecutive_lvn = []
+    if len(consecutive_lvn) > len(max_consecutive_lvn):
+        max_consecutive_lvn = list(consecutive_lvn)
+
+    gap_detected = len(max_consecutive_lvn) >= 3
+    return {
+        "point_of_control_price": float(bin_centers[poc_idx]),
+        "immediate_support_hvn": immediate_support_hvn,
+        "immediate_resistance_hvn": immediate_resistance_hvn,
+        "liquidity_gap_below": {
+            "detected": gap_detected,
+            "start_price": float(bin_edges[max_consecutive_lvn[0]]) if gap_detected else 0.0,
+            "end_price": float(bin_edges[max_consecutive_lvn[-1] + 1]) if gap_detected else 0.0,
+        }
+    }
+
+
+def synthetic_ohlcv(bars: int, seed: int = 7) -> pd.DataFrame:
+    """Random-walk daily candles with a few flat and zero-volume bars."""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, bars))
+    high = close + rng.uniform(0.2, 3.0, bars)
+    low = close - rng.uniform(0.2, 3.0, bars)
+    volume = rng.uniform(1_000, 50_000, bars)
+
+    flat = rng.choice(bars, size=max(1, bars // 20), replace=False)
+    high[flat] = low[flat] = close[flat]
+    volume[rng.choice(bars, size=max(1, bars // 50), replace=False)] = 0
+
+    return pd.DataFrame(
+        {"Open": close, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=pd.date_range(end="2026-06-23", periods=bars, freq="D"),
+    )
+
+
+def best_of(fn, repeat: int) -> float:
+    """Fastest wall-clock time of fn over repeat runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bars", type=int, nargs="+", default=[60, 500, 5000])
+    parser.add_argument("--bins", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    service = TechnicalAnalysisService()
+    all_match = True
+
+    print(f"📊 Volume profile benchmark ({args.bins} bins, best of {args.repeat})\n")
+    print(f"{'bars':>6}  {'loop ms':>10}  {'vectorized ms':>14}  {'speedup':>8}  match")
+
+    for bars in args.bars:
+        df = synthetic_ohlcv(bars)
+        price = float(df["Close"].iloc[-1])
+
+        expected = legacy_volume_profile(df, price, bars, args.bins)
+        actual = service._compute_volume_profile(
+            df, price, lookback=bars, num_bins=args.bins, distribution="uniform"
+        )
+        match = expected == actual
+        all_match &= match
+
+        loop_ms = best_of(lambda: legacy_volume_profile(df, price, bars, args.bins), args.repeat)
+        vec_ms = best_of(
+            lambda: service._compute_volume_profile(
+                df, price, lookback=bars, num_bins=args.bins, distribution="uniform"
+            ),
+            args.repeat,
+        )
+        print(f"{bars:>6}  {loop_ms:>10.2f}  {vec_ms:>14.2f}  {loop_ms / vec_ms:>7.1f}x  "
+              f"{'✅' if match else '❌'}")
+
+    print()
+    if all_match:
+        print("✅ Vectorized output identical to the reference loop")
+    else:
+        print("❌ Output mismatch against the reference loop")
+    return all_match
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,85 @@
+"""Migrate data between Google Sheets and the local SQLite storage backend.
+
+    python3 scripts/migrate_storage.py import   # Sheets -> SQLite
+    python3 scripts/migrate_storage.py export   # SQLite -> Sheets
+"""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.sheets_service import SheetsService
+from services.sqlite_storage import SQLiteStorage
+
+
+# SQLite table -> Google Sheets tab
+TABLES = {
+    "users": "Users",
+    "transactions": "Transactions",
+    "holdings": "Holdings",
+    "digest_schedule": "Digest_Schedule",
+}
+
+
+def import_from_sheets(db_path: str) -> bool:
+    """Copy Users and Transactions from Google Sheets into SQLite."""
+    print(f"📥 Importing Google Sheets into {db_path}...\n")
+
+    try:
+        sheets = SheetsService()
+        sqlite = SQLiteStorage(db_path)
+
+        users = sheets.read_table("Users")
+        print(f"   ✓ Read {len(users)} users")
+        transactions = sheets.read_table("Transactions")
+        print(f"   ✓ Read {len(transactions)} transactions")
+
+        sqlite.import_records(users, transactions)
+        result = sqlite.rebuild_holdings(verify_only=True)
+        print(f"   ✓ Rebuilt {result['positions']} holdings from the ledger")
+
+        print("\n✅ Import complete!")
+        return True
+
+    except Exception as e:
+        print(f"\n❌ Import failed: {e}")
+        return False
+
+
+def export_to_sheets(db_path: str) -> bool:
+    """Overwrite the Users, Transactions, Holdings and Digest_Schedule tabs with SQLite data."""
+    print(f"📤 Exporting {db_path} to Google Sheets...\n")
+
+    try:
+        sheets = SheetsService()
+        sqlite = SQLiteStorage(db_path)
+
+        for table, title in TABLES.items():
+            headers, rows = sqlite.export_table(table)
+            sheets.write_table(title, headers, rows)
+            print(f"   ✓ {title}: {len(rows)} rows")
+
+        print("\n✅ Export complete!")
+        print(f"\n📎 Sheet URL: https://docs.google.com/spreadsheets/d/{Config.GOOGLE_SHEETS_ID}")
+        return True
+
+    except Exception as e:
+        print(f"\n❌ Export failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate between Google Sheets and SQLite")
+    parser.add_argument("direction", choices=["import", "export"])
+    parser.add_argument("--db", default=Config.SQLITE_DB_PATH, help="SQLite database path")
+    args = parser.parse_args()
+
+    if args.direction == "import":
+        ok = import_from_sheets(args.db)
+    else:
+        ok = export_to_sheets(args.db)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,86 @@
+"""Profile import-time cost of the app entry point (or any module).
+
+Runs `python -X importtime` in a fresh interpreter and reports the most
+expensive modules, the cost per top-level package, and whether any of the
+heavy dependencies that should load lazily were imported:
+
+    python3 scripts/profile_imports.py
+    python3 scripts/profile_imports.py --module handlers.message_handler --top 30
+    python3 scripts/profile_imports.py --strict   # exit 1 if a heavy module loads
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies that should only load on the code paths that need them
+HEAVY_MODULES = ["pandas", "numpy", "yfinance", "pandas_ta", "google.genai", "PIL"]
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def run_importtime(module: str) -> list[tuple[str, int, int, int]]:
+    """Import module in a subprocess and parse the -X importtime report.
+
+    Returns:
+        (name, self_us, cumulative_us, depth) per imported module
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+        sys.exit(2)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=15, help="Rows per table")
+    parser.add_argument("--strict", action="store_true", help="Fail if a heavy module is imported")
+    args = parser.parse_args()
+
+    rows = run_importtime(args.module)
+    total_us = next((cum for name, _, cum, _ in reversed(rows) if name == args.module), 0)
+
+    print(f"⏱️  import {args.module}: {total_us / 1000:.0f} ms, {len(rows)} modules\n")
+
+    print(f"{'cumulative ms':>13}  {'self ms':>8}  module")
+    for name, self_us, cumulative_us, _ in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>13.1f}  {self_us / 1000:>8.1f}  {name}")
+
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    print(f"\n{'self ms':>8}  package")
+    for package, self_us in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{self_us / 1000:>8.1f}  {package}")
+
+    imported = {name for name, _, _, _ in rows}
+    loaded = [m for m in HEAVY_MODULES if m in imported]
+    print()
+    if loaded:
+        print(f"⚠️  Heavy modules imported at startup: {', '.join(loaded)}")
+    else:
+        print(f"✅ None of {', '.join(HEAVY_MODULES)} imported at startup")
+    return not (args.strict and loaded)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,35 @@
+"""Build (or rebuild) the digest schedule index from the Users table."""
+
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sheets_service import sheets_service
+
+
+def rebuild_digest_schedule() -> bool:
+    """Bucket every digest-enabled user by (hour, frequency, day).
+
+    On Google Sheets this creates the Digest_Schedule tab on first run; until
+    then the hourly digest job falls back to scanning all users.
+
+    Returns:
+        True if the index was rebuilt successfully
+    """
+    print("🔧 Rebuilding digest schedule index from Users...\n")
+
+    try:
+        count = sheets_service.rebuild_digest_schedule()
+    except Exception as e:
+        print(f"\n❌ Rebuild failed: {e}")
+        return False
+
+    print(f"📋 Users scheduled: {count}")
+    print("\n✅ Digest schedule rebuilt!")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if rebuild_digest_schedule() else 1)
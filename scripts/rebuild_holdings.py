@@ -0,0 +1,56 @@
+"""Rebuild or verify the materialized Holdings sheet from the Transactions ledger."""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sheets_service import SheetsService
+
+
+def rebuild_holdings(verify_only: bool = False) -> bool:
+    """Replay all transactions and rebuild (or just verify) Holdings.
+
+    Returns:
+        True if Holdings is consistent (verify) or was rebuilt successfully
+    """
+    mode = "Verifying" if verify_only else "Rebuilding"
+    print(f"🔧 {mode} Holdings from Transactions...\n")
+
+    try:
+        service = SheetsService()
+        result = service.rebuild_holdings(verify_only=verify_only)
+    except Exception as e:
+        print(f"\n❌ {mode} failed: {e}")
+        return False
+
+    mismatches = result["mismatches"]
+    print(f"📋 Positions in ledger: {result['positions']}")
+
+    if mismatches:
+        print(f"⚠️  {len(mismatches)} position(s) differ from the ledger:")
+        for m in mismatches:
+            print(f"   - {m['user_id']} {m['asset']}: expected {m['expected']}, found {m['materialized']}")
+    else:
+        print("✓ Holdings matches the ledger")
+
+    if verify_only:
+        return not mismatches
+
+    print("\n✅ Holdings rebuilt!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Only compare Holdings against the ledger, do not write",
+    )
+    args = parser.parse_args()
+
+    ok = rebuild_holdings(verify_only=args.verify)
+    sys.exit(0 if ok else 1)
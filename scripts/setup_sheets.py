@@ -36,11 +36,20 @@ SHEETS_CONFIG = {
         "source_app",
         "created_at",
     ],
+    "Holdings": [              # Materialized per-user positions, updated on each transaction
+        "user_id",
+        "asset",
+        "asset_type",
+        "quantity",
+        "total_thb",       # Net THB cost basis
+        "updated_at",
+    ],
     "Asset_Reference": [
         "asset_symbol",
         "asset_name",
         "current_price_thb",
         "last_updated",
+        "price_usd",
     ],
     "Watchlist_Alerts": [
         "asset_symbol",
@@ -1,7 +1,22 @@
 """Services module for Family Wealth AI."""
 
-from .sheets_service import SheetsService
-from .gemini_service import GeminiService
-from .line_service import LineService
+import importlib
 
-__all__ = ["SheetsService", "GeminiService", "LineService"]
+# Classes are imported on first access so importing one service module does
+# not load every other service's dependencies
+_EXPORTS = {
+    "StorageBackend": ".storage_backend",
+    "SheetsService": ".sheets_service",
+    "SQLiteStorage": ".sqlite_storage",
+    "GeminiService": ".gemini_service",
+    "LineService": ".line_service",
+    "PortfolioValuationEngine": ".valuation_service",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
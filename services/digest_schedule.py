@@ -0,0 +1,70 @@
+"""Digest schedule buckets: which (hour, frequency, day) slot a user is due in."""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+def schedule_bucket(user: Dict[str, Any]) -> Optional[str]:
+    """Get the "HH|frequency|day" bucket for a user's digest settings.
+
+    Mirrors DigestService.should_send_now: daily buckets have no day, weekly
+    buckets carry the weekday name and monthly digests go out on day 1.
+
+    Returns:
+        Bucket key, or None if the user never receives a digest
+    """
+    digest_enabled = user.get("digest_enabled", False)
+    if not (str(digest_enabled).upper() == "TRUE" or digest_enabled is True):
+        return None
+
+    hour = str(user.get("digest_time", "07")).strip().split(":")[0].zfill(2)
+    frequency = str(user.get("digest_frequency", "daily")).strip().lower()
+
+    if frequency == "daily":
+        day = ""
+    elif frequency == "weekly":
+        day = str(user.get("digest_day", "monday")).strip().lower()
+    elif frequency == "monthly":
+        day = "1"
+    else:
+        return None
+
+    return f"{hour}|{frequency}|{day}"
+
+
+def due_buckets(now: datetime) -> List[str]:
+    """Get every bucket that is due at the given (ICT) time."""
+    hour = str(now.hour).zfill(2)
+    buckets = [f"{hour}|daily|", f"{hour}|weekly|{now.strftime('%A').lower()}"]
+    if now.day == 1:
+        buckets.append(f"{hour}|monthly|1")
+    return buckets
+
+
+def bucket_settings(bucket: str) -> Dict[str, str]:
+    """Expand a bucket key back into digest_* user fields."""
+    hour, frequency, day = bucket.split("|")
+    settings = {"digest_time": hour, "digest_frequency": frequency}
+    if frequency == "weekly":
+        settings["digest_day"] = day
+    return settings
+
+
+def resolve_digest_assets(user: Dict[str, Any]) -> List[str]:
+    """Get the assets a user tracks: digest_assets, else their allocation keys.
+
+    Raises:
+        ValueError: If digest_assets is a string that is not valid JSON
+    """
+    digest_assets = user.get("digest_assets", [])
+    if isinstance(digest_assets, str):
+        digest_assets = json.loads(digest_assets) if digest_assets else []
+
+    if not digest_assets:
+        # Fallback to allocation assets if no specific digest assets are set
+        target_allocation = user.get("target_allocation", {})
+        if isinstance(target_allocation, dict):
+            digest_assets = list(target_allocation.keys())
+
+    return digest_assets or []
@@ -1,15 +1,26 @@
 """Digest service for orchestrating technical analysis alerts and Gemini summaries."""
 
+import hashlib
 import json
 import logging
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime, timezone, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Any, Callable, Dict, List, Optional
 
 from config import Config
 from services.sheets_service import sheets_service
 from services.technical_analysis_service import ta_service
 from services.gemini_service import gemini_service
-from prompts.digest_prompt import DIGEST_PROMPT_TEMPLATE
+from services.kv_store import KVStore, create_kv_store
+from services.digest_schedule import bucket_settings, due_buckets, resolve_digest_assets
+from utils.prompt_payload import encode_prompt_payload
+from prompts.digest_prompt import (
+    DIGEST_BATCH_ASSET_TEMPLATE,
+    DIGEST_BATCH_PROMPT_TEMPLATE,
+    DIGEST_PROMPT_TEMPLATE,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,11 +44,35 @@ class DigestService:
         "OVERSOLD": "Oversold (ขายมากเกินไป)",
     }
 
+    # How long a "sent" checkpoint is kept; only the current hour's key is read
+    DELIVERY_RECORD_TTL = 2 * 24 * 3600
+
+    def __init__(
+        self,
+        narrative_cache: Optional[KVStore] = None,
+        delivery_log: Optional[KVStore] = None,
+    ):
+        """Initialize the service.
+
+        Args:
+            narrative_cache: Optional store for generated narratives, keyed by
+                ticker, ICT date and a fingerprint of the indicator payload.
+                Narratives are reused across instances and restarts only
+                with a shared store (the gcs backend).
+            delivery_log: Optional store of per-user delivery checkpoints,
+                keyed by ICT hour and user, that makes scheduled runs resumable
+                and idempotent. The guarantee spans instances and restarts
+                only with a shared store (the gcs backend); a local SQLite
+                file covers runs on the same instance.
+        """
+        self.narrative_cache = narrative_cache
+        self.delivery_log = delivery_log
+
     def get_current_time_ict(self) -> datetime:
         """Get the current time in ICT (Bangkok) timezone."""
         return datetime.now(timezone(timedelta(hours=7)))
 
-    def should_send_now(self, user: Dict[str, Any]) -> bool:
+    def should_send_now(self, user: Dict[str, Any], now: Optional[datetime] = None) -> bool:
         """Check if the user is scheduled to receive a digest at the current hour."""
         # 1. Check if digest is enabled
         digest_enabled = user.get("digest_enabled", False)
@@ -49,7 +84,7 @@ class DigestService:
         pref_time = str(user.get("digest_time", "07")).strip()
         pref_hour = pref_time.split(":")[0].zfill(2)
 
-        current_time = self.get_current_time_ict()
+        current_time = now or self.get_current_time_ict()
         current_hour = str(current_time.hour).zfill(2)
 
         if current_hour != pref_hour:
@@ -70,6 +105,109 @@ class DigestService:
 
         return False
 
+    def get_digest_assets(self, user: Dict[str, Any]) -> List[str]:
+        """Resolve the assets a user tracks (digest_assets, else allocation keys)."""
+        try:
+            return resolve_digest_assets(user)
+        except ValueError:
+            logger.error(f"Failed to parse digest_assets JSON for user {user.get('user_id')}")
+            return []
+
+    def get_due_users(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get users due for a digest now, reading only the due schedule buckets.
+
+        Falls back to scanning every digest user when the schedule index has
+        not been built yet.
+
+        Returns:
+            User dicts with user_id, digest_* schedule fields and digest_assets
+        """
+        now = now or self.get_current_time_ict()
+        rows = sheets_service.get_digest_schedule(due_buckets(now))
+        if rows is None:
+            logger.info("Digest schedule index not built, scanning all users")
+            return [u for u in sheets_service.get_users_for_digest() if self.should_send_now(u, now)]
+
+        return [
+            {
+                "user_id": row["user_id"],
+                "digest_enabled": True,
+                "digest_assets": row["digest_assets"],
+                **bucket_settings(row["bucket"]),
+            }
+            for row in rows
+        ]
+
+    def analyze_asset(self, asset: str) -> Dict[str, Any]:
+        """Compute indicators and the Thai narrative for one asset."""
+        # 1. Compute indicators
+        payload = ta_service.compute_indicators(asset)
+
+        # 2. Generate Thai narrative via Gemini
+        narrative = self.generate_narrative(asset, payload)
+
+        return {
+            "ticker": asset.upper(),
+            "indicators": payload,
+            "narrative": narrative
+        }
+
+    def analyze_assets(self, assets: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Analyze each distinct asset once, batching the narrative requests.
+
+        Returns:
+            Dict of {TICKER: result}, None for assets that failed
+        """
+        analyses: Dict[str, Optional[Dict[str, Any]]] = {}
+        payloads: Dict[str, Dict[str, Any]] = {}
+        for asset in assets:
+            ticker = asset.upper()
+            if ticker in analyses or ticker in payloads:
+                continue
+            payload = self._indicators_or_none(asset)
+            if payload is None:
+                analyses[ticker] = None
+            else:
+                payloads[ticker] = payload
+
+        for batch in self._narrative_batches(payloads):
+            analyses.update(self._narrate_batch(batch))
+        return analyses
+
+    def _indicators_or_none(self, asset: str) -> Optional[Dict[str, Any]]:
+        try:
+            return ta_service.compute_indicators(asset)
+        except Exception as e:
+            logger.error(f"Error generating digest for asset {asset}: {e}", exc_info=True)
+            return None
+
+    @staticmethod
+    def _narrative_batches(payloads: Dict[str, Dict[str, Any]]) -> List[Dict[str, Dict[str, Any]]]:
+        """Split payloads into groups of DIGEST_NARRATIVE_BATCH_SIZE tickers."""
+        size = max(1, Config.DIGEST_NARRATIVE_BATCH_SIZE)
+        items = list(payloads.items())
+        return [dict(items[i:i + size]) for i in range(0, len(items), size)]
+
+    def _narrate_batch(self, payloads: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Turn a batch of {TICKER: payload} into digest results (None if narration failed)."""
+        try:
+            narratives = self.generate_narratives(payloads)
+        except Exception as e:
+            logger.error(f"Error generating narratives for {', '.join(payloads)}: {e}", exc_info=True)
+            narratives = {}
+        return {
+            ticker: {"ticker": ticker, "indicators": payload, "narrative": narratives[ticker]}
+            if ticker in narratives else None
+            for ticker, payload in payloads.items()
+        }
+
+    @staticmethod
+    def _assemble_digest(
+        assets: List[str], analyses: Dict[str, Optional[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Pick a user's results, in their asset order, from shared analyses."""
+        return [analyses[a.upper()] for a in assets if analyses.get(a.upper())]
+
     def generate_digest(self, user_id: str) -> List[Dict[str, Any]]:
         """Generate real-time technical analysis and narratives for user's tracked assets."""
         user = sheets_service.get_user(user_id)
@@ -77,46 +215,336 @@ class DigestService:
             logger.warning(f"User {user_id} not found in database.")
             return []
 
-        # Parse user's tracked assets
-        digest_assets = user.get("digest_assets", [])
-        if isinstance(digest_assets, str):
-            try:
-                digest_assets = json.loads(digest_assets)
-            except Exception:
-                logger.error(f"Failed to parse digest_assets JSON for user {user_id}")
-                digest_assets = []
-
-        if not digest_assets:
-            # Fallback to allocation assets if no specific digest assets are set
-            target_allocation = user.get("target_allocation", {})
-            if isinstance(target_allocation, dict):
-                digest_assets = list(target_allocation.keys())
-
+        digest_assets = self.get_digest_assets(user)
         if not digest_assets:
             logger.info(f"User {user_id} has no tracked assets for digest.")
             return []
 
-        results = []
-        for asset in digest_assets:
-            try:
-                # 1. Compute indicators
-                payload = ta_service.compute_indicators(asset)
-
-                # 2. Generate Thai narrative via Gemini
-                narrative = self.generate_narrative(asset, payload)
+        return self._assemble_digest(digest_assets, self.analyze_assets(digest_assets))
+
+    def _stream_analyses(
+        self,
+        assets: List[str],
+        pool: ThreadPoolExecutor,
+        on_result: Callable[[str, Optional[Dict[str, Any]]], None],
+        deadline_at: float,
+    ) -> None:
+        """Analyze assets on pool, reporting each result as soon as it is ready.
+
+        Indicators are computed per asset; ready payloads are narrated in
+        batches once a batch is full, no indicators are outstanding, or the
+        oldest ready payload has waited DIGEST_NARRATIVE_BATCH_WAIT_SECONDS,
+        so one slow asset does not hold back everyone else's digest.
+        Returns early at deadline_at (time.monotonic()).
+        """
+        size = max(1, Config.DIGEST_NARRATIVE_BATCH_SIZE)
+        linger = Config.DIGEST_NARRATIVE_BATCH_WAIT_SECONDS
+        # Indicator futures map to their ticker, narrative batches to None
+        pending: Dict[Future, Optional[str]] = {
+            pool.submit(self._indicators_or_none, a): a.upper() for a in assets
+        }
+        ready: Dict[str, Dict[str, Any]] = {}
+        ready_since = 0.0
+
+        while pending or ready:
+            indicators_left = any(ticker is not None for ticker in pending.values())
+            if ready and (len(ready) >= size or not indicators_left
+                          or time.monotonic() - ready_since >= linger):
+                batch = dict(list(ready.items())[:size])
+                for ticker in batch:
+                    del ready[ticker]
+                ready_since = time.monotonic()
+                pending[pool.submit(self._narrate_batch, batch)] = None
+                continue
+
+            timeout = deadline_at - time.monotonic()
+            if timeout <= 0:
+                logger.warning("Digest run hit its deadline while analyzing assets")
+                return
+            if ready:
+                timeout = min(timeout, max(0.0, ready_since + linger - time.monotonic()))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                ticker = pending.pop(future)
+                if ticker is None:
+                    for narrated, result in future.result().items():
+                        on_result(narrated, result)
+                    continue
+                payload = future.result()
+                if payload is None:
+                    on_result(ticker, None)
+                else:
+                    if not ready:
+                        ready_since = time.monotonic()
+                    ready[ticker] = payload
+
+    def delivery_key(self, user_id: str, now: datetime) -> str:
+        """Checkpoint key for one user's digest in the run for this ICT hour."""
+        return f"{now.strftime('%Y-%m-%dT%H')}:{user_id}"
+
+    def _already_delivered(self, key: str) -> bool:
+        if self.delivery_log is None:
+            return False
+        try:
+            return self.delivery_log.get(key) is not None
+        except Exception as e:
+            logger.warning(f"Digest checkpoint read failed: {e}")
+            return False
 
-                results.append({
-                    "ticker": asset.upper(),
-                    "indicators": payload,
-                    "narrative": narrative
-                })
+    def _deliver_once(
+        self,
+        key: str,
+        user_id: str,
+        results: List[Dict[str, Any]],
+        deliver: Callable[[str, List[Dict[str, Any]]], None],
+    ) -> bool:
+        """Claim the checkpoint, deliver, then record the digest as sent.
+
+        The claim expires after DIGEST_CLAIM_TTL_SECONDS so a run that dies
+        mid-push does not lock the user out of this hour's digest. A failed
+        push releases the claim so the next trigger retries it. Claims are
+        exclusive across instances when delivery_log is shared (gcs).
+
+        Store errors fail open like _already_delivered: a claim that cannot
+        be taken still delivers, and a push that went out is reported as
+        delivered even if recording it fails.
+
+        Returns:
+            True if delivered, False if another run already claimed the user
+        """
+        claimed = False
+        if self.delivery_log is not None:
+            try:
+                if not self.delivery_log.add(key, {"status": "claimed"}, ttl=Config.DIGEST_CLAIM_TTL_SECONDS):
+                    return False
+                claimed = True
             except Exception as e:
-                logger.error(f"Error generating digest for asset {asset} for user {user_id}: {e}", exc_info=True)
-
-        return results
+                logger.warning(f"Digest checkpoint claim failed for {user_id}: {e}")
+
+        try:
+            deliver(user_id, results)
+        except Exception:
+            if claimed:
+                try:
+                    self.delivery_log.delete(key)
+                except Exception as e:
+                    logger.warning(f"Digest checkpoint release failed for {user_id}: {e}")
+            raise
+
+        if self.delivery_log is not None:
+            try:
+                self.delivery_log.set(
+                    key,
+                    {"status": "sent", "sent_at": self.get_current_time_ict().isoformat()},
+                    ttl=self.DELIVERY_RECORD_TTL,
+                )
+            except Exception as e:
+                logger.warning(f"Digest checkpoint write failed for {user_id}: {e}")
+        return True
+
+    def run_digest(
+        self,
+        users: List[Dict[str, Any]],
+        deliver: Callable[[str, List[Dict[str, Any]]], None],
+        now: Optional[datetime] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Analyze and deliver a scheduled run in parallel, within a deadline.
+
+        Each distinct asset is analyzed once on a bounded pool, with narratives
+        requested in batches; a user's digest is handed to the delivery pool
+        as soon as all of their assets are done. Users already delivered (or
+        being delivered) for this hour are skipped, so re-triggering the run
+        after a timeout resumes with the users that are still pending.
+
+        Args:
+            users: Candidate users (e.g. from get_due_users)
+            deliver: Called as deliver(user_id, results) to push one digest
+            now: Run time in ICT (defaults to the current time)
+            deadline: Seconds before pending users are left for the next
+                trigger (defaults to DIGEST_RUN_DEADLINE_SECONDS)
+
+        Returns:
+            Dict with due, sent, already_sent, no_results, failed and pending
+            counts plus the delivery errors
+        """
+        now = now or self.get_current_time_ict()
+        deadline = Config.DIGEST_RUN_DEADLINE_SECONDS if deadline is None else deadline
+        deadline_at = time.monotonic() + deadline
+        report: Dict[str, Any] = {
+            "sent": 0, "already_sent": 0, "no_results": 0, "failed": 0, "pending": 0, "errors": [],
+        }
+
+        due: Dict[str, List[str]] = {}
+        for user in users:
+            user_id = user.get("user_id")
+            if not user_id or not self.should_send_now(user, now):
+                continue
+            if self._already_delivered(self.delivery_key(user_id, now)):
+                report["already_sent"] += 1
+            else:
+                due[user_id] = self.get_digest_assets(user)
+
+        waiting: Dict[str, List[str]] = {}
+        remaining: Dict[str, set] = {}
+        for user_id, assets in due.items():
+            remaining[user_id] = {a.upper() for a in assets}
+            for asset in assets:
+                waiting.setdefault(asset.upper(), []).append(user_id)
+        distinct = list({a.upper(): a for assets in due.values() for a in assets}.values())
+        report["due"] = len(due)
+        logger.info(f"Digest run: {len(due)} users due, {len(distinct)} distinct assets, "
+                    f"{report['already_sent']} already sent")
+
+        analyses: Dict[str, Optional[Dict[str, Any]]] = {}
+        deliveries: Dict[Future, str] = {}
+        asset_pool = ThreadPoolExecutor(Config.DIGEST_ASSET_WORKERS, thread_name_prefix="digest-asset")
+        delivery_pool = ThreadPoolExecutor(Config.DIGEST_DELIVERY_WORKERS, thread_name_prefix="digest-push")
+
+        def submit_delivery(user_id: str) -> None:
+            results = self._assemble_digest(due[user_id], analyses)
+            if not results:
+                report["no_results"] += 1
+                return
+            key = self.delivery_key(user_id, now)
+            deliveries[delivery_pool.submit(self._deliver_once, key, user_id, results, deliver)] = user_id
+
+        def finish(ticker: str, result: Optional[Dict[str, Any]]) -> None:
+            analyses[ticker] = result
+            for user_id in waiting[ticker]:
+                remaining[user_id].discard(ticker)
+                if not remaining[user_id]:
+                    submit_delivery(user_id)
+
+        def time_left() -> float:
+            return max(0.0, deadline_at - time.monotonic())
+
+        try:
+            for user_id, assets_left in remaining.items():
+                if not assets_left:
+                    submit_delivery(user_id)
+
+            self._stream_analyses(distinct, asset_pool, finish, deadline_at)
+            done, _ = wait(deliveries, timeout=time_left())
+        finally:
+            # Queued work is dropped; unclaimed users are picked up by the next trigger
+            asset_pool.shutdown(wait=False, cancel_futures=True)
+            delivery_pool.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            user_id = deliveries[future]
+            try:
+                if future.result():
+                    report["sent"] += 1
+                else:
+                    report["already_sent"] += 1
+            except Exception as e:
+                report["failed"] += 1
+                report["errors"].append(f"{user_id}: {e}")
+
+        report["pending"] = len(due) - report["no_results"] - len(done)
+        if report["pending"]:
+            logger.warning(f"Digest run deadline reached with {report['pending']} users pending")
+        return report
+
+    @classmethod
+    def _round_values(cls, value: Any, digits: int) -> Any:
+        """Round every float in a nested structure to significant digits."""
+        if isinstance(value, float):
+            return float(f"{value:.{digits}g}")
+        if isinstance(value, dict):
+            return {k: cls._round_values(v, digits) for k, v in value.items()}
+        if isinstance(value, list):
+            return [cls._round_values(v, digits) for v in value]
+        return value
+
+    def narrative_cache_key(self, ticker: str, payload: Dict[str, Any]) -> str:
+        """Build the cache key: ticker, ICT date and a hash of the rounded metrics.
+
+        The payload timestamp is left out so identical readings share a key.
+        """
+        fingerprint = self._round_values(
+            {"price": payload["metadata"]["current_price"], "metrics": payload["metrics"]},
+            Config.NARRATIVE_CACHE_SIG_DIGITS,
+        )
+        canonical = json.dumps(fingerprint, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+        day = self.get_current_time_ict().date().isoformat()
+        return f"{ticker.upper()}:{day}:{digest}"
+
+    def _seconds_until_day_end(self) -> float:
+        """Seconds until the next midnight in ICT."""
+        now = self.get_current_time_ict()
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (midnight - now).total_seconds()
+
+    def _cached_narrative(self, ticker: str, payload: Dict[str, Any]) -> Optional[str]:
+        if self.narrative_cache is None:
+            return None
+        try:
+            return self.narrative_cache.get(self.narrative_cache_key(ticker, payload))
+        except Exception as e:
+            logger.warning(f"Narrative cache read failed: {e}")
+            return None
+
+    def _store_narrative(self, ticker: str, payload: Dict[str, Any], narrative: str) -> None:
+        if self.narrative_cache is None or not narrative or narrative == gemini_service.ERROR_RESPONSE:
+            return
+        try:
+            self.narrative_cache.set(
+                self.narrative_cache_key(ticker, payload), narrative, ttl=self._seconds_until_day_end()
+            )
+        except Exception as e:
+            logger.warning(f"Narrative cache write failed: {e}")
 
     def generate_narrative(self, ticker: str, payload: Dict[str, Any]) -> str:
-        """Format the Gemini prompt and call the Gemini Service to generate a Thai narrative."""
+        """Get the Thai narrative for a payload, reusing today's cached one if the metrics match."""
+        return self.generate_narratives({ticker: payload})[ticker.upper()]
+
+    def generate_narratives(self, payloads: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """Get Thai narratives for several assets with as few Gemini calls as possible.
+
+        Cached narratives are reused; the rest are requested together in one
+        structured-output call, and any ticker missing from that reply is
+        requested on its own.
+
+        Args:
+            payloads: Dict of {ticker: indicator payload}
+
+        Returns:
+            Dict of {TICKER: narrative}; tickers whose prompt could not be
+            built are omitted when there is more than one
+        """
+        narratives: Dict[str, str] = {}
+        missing: Dict[str, Dict[str, Any]] = {}
+        for ticker, payload in payloads.items():
+            cached = self._cached_narrative(ticker, payload)
+            if cached is not None:
+                logger.info(f"Narrative cache hit for {ticker.upper()}")
+                narratives[ticker.upper()] = cached
+            else:
+                missing[ticker.upper()] = payload
+
+        if len(missing) > 1:
+            narratives.update(self._request_narratives_batch(missing))
+
+        for ticker, payload in missing.items():
+            if ticker not in narratives:
+                if len(missing) > 1:
+                    logger.warning(f"Batched narrative missing for {ticker}, requesting it alone")
+                    try:
+                        narratives[ticker] = self._request_narrative(ticker, payload)
+                    except Exception as e:
+                        logger.error(f"Error generating narrative for {ticker}: {e}", exc_info=True)
+                        continue
+                else:
+                    narratives[ticker] = self._request_narrative(ticker, payload)
+            self._store_narrative(ticker, payload, narratives[ticker])
+        return narratives
+
+    def _prompt_fields(self, ticker: str, payload: Dict[str, Any]) -> Dict[str, str]:
+        """Format the values substituted into the digest prompt templates."""
         metadata = payload["metadata"]
         metrics = payload["metrics"]
         
@@ -162,39 +590,89 @@ class DigestService:
         fib_distance = fib["distance_to_level_pct"]
         fib_distance_str = f"{fib_distance:+.2f}"
 
-        # Prepare prompt parameters
-        prompt = DIGEST_PROMPT_TEMPLATE.format(
-            json_payload=json.dumps(payload, indent=2, ensure_ascii=False),
-            ticker_label=ticker_label,
-            current_price=current_price_str,
-            macro_condition_th=macro_condition_th,
-            rsi_value=f"{momentum['rsi_value']:.2f}" if momentum['rsi_value'] is not None else "N/A",
-            rsi_zone_th=rsi_zone_th,
-            rsi_velocity=f"{momentum['rsi_3d_velocity']:+.2f}",
-            divergence_status_th=divergence_status_th,
-            resistance_hvn=resistance_hvn_str,
-            support_hvn=support_hvn_str,
-            poc_price=poc_price_str,
-            fib_ratio=fib_ratio_str,
-            fib_price=fib_price_str,
-            fib_distance_pct=fib_distance_str
-        )
-
-        logger.info(f"Calling Gemini for {ticker} narrative summary...")
-        response_text = gemini_service.generate_response(prompt, use_research_model=True)
-        
-        # Clean markdown formatting so that it displays as beautiful plain text on LINE
-        import re
-        clean_text = response_text.strip()
+        return {
+            "json_payload": encode_prompt_payload(payload),
+            "ticker_label": ticker_label,
+            "current_price": current_price_str,
+            "macro_condition_th": macro_condition_th,
+            "rsi_value": f"{momentum['rsi_value']:.2f}" if momentum['rsi_value'] is not None else "N/A",
+            "rsi_zone_th": rsi_zone_th,
+            "rsi_velocity": f"{momentum['rsi_3d_velocity']:+.2f}",
+            "divergence_status_th": divergence_status_th,
+            "resistance_hvn": resistance_hvn_str,
+            "support_hvn": support_hvn_str,
+            "poc_price": poc_price_str,
+            "fib_ratio": fib_ratio_str,
+            "fib_price": fib_price_str,
+            "fib_distance_pct": fib_distance_str,
+        }
+
+    @staticmethod
+    def _clean_narrative(text: str) -> str:
+        """Strip markdown so the narrative displays as plain text on LINE."""
+        clean_text = text.strip()
         # Remove bold markdown asterisks (e.g. **text**)
         clean_text = clean_text.replace("**", "")
         # Remove bullet markers (e.g. * or - at start of lines)
         clean_text = re.sub(r"^\s*[\*\-]\s*", "", clean_text, flags=re.MULTILINE)
         # Remove header markers (e.g. ### or # at start of lines)
         clean_text = re.sub(r"^\s*#+\s*", "", clean_text, flags=re.MULTILINE)
-        
         return clean_text.strip()
 
+    def _narrative_prompt(self, ticker: str, payload: Dict[str, Any]) -> str:
+        """Build the single-asset narrative prompt."""
+        return DIGEST_PROMPT_TEMPLATE.format(**self._prompt_fields(ticker, payload))
+
+    def _request_narrative(self, ticker: str, payload: Dict[str, Any]) -> str:
+        """Format the Gemini prompt and call the Gemini Service to generate a Thai narrative."""
+        prompt = self._narrative_prompt(ticker, payload)
+
+        logger.info(f"Calling Gemini for {ticker} narrative summary...")
+        response_text = gemini_service.generate_response(prompt, use_research_model=True)
+        return self._clean_narrative(response_text)
+
+    def _request_narratives_batch(self, payloads: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """Request narratives for several tickers in one structured-output call.
+
+        Returns:
+            Dict of {TICKER: narrative} for the tickers the reply covered
+        """
+        sections = {}
+        for ticker, payload in payloads.items():
+            try:
+                sections[ticker] = DIGEST_BATCH_ASSET_TEMPLATE.format(
+                    ticker=ticker, **self._prompt_fields(ticker, payload)
+                )
+            except Exception as e:
+                logger.error(f"Error building narrative prompt for {ticker}: {e}")
+        if not sections:
+            return {}
+
+        tickers = list(sections)
+        prompt = DIGEST_BATCH_PROMPT_TEMPLATE.format(
+            tickers=", ".join(tickers), asset_sections="\n".join(sections.values())
+        )
+        schema = {
+            "type": "OBJECT",
+            "properties": {ticker: {"type": "STRING"} for ticker in tickers},
+            "required": tickers,
+        }
+
+        logger.info(f"Calling Gemini for batched narratives: {', '.join(tickers)}")
+        parsed = gemini_service.generate_json(prompt, schema, use_research_model=True) or {}
+        return {
+            ticker: self._clean_narrative(text)
+            for ticker, text in parsed.items()
+            if ticker in sections and isinstance(text, str) and text.strip()
+        }
+
 
 # Singleton instance
-digest_service = DigestService()
+digest_service = DigestService(
+    narrative_cache=create_kv_store(
+        Config.NARRATIVE_CACHE_BACKEND, "narratives", Config.CACHE_DB_PATH
+    ),
+    delivery_log=create_kv_store(
+        Config.DIGEST_CHECKPOINT_BACKEND, "digest_deliveries", Config.CACHE_DB_PATH
+    ),
+)
@@ -0,0 +1,107 @@
+"""In-process work queue: bounded parallelism, in-order processing per key."""
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Iterable, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedEventQueue:
+    """Runs jobs on a bounded thread pool, one at a time per key.
+
+    Jobs with the same key (e.g. a LINE user) run strictly in submission
+    order; different keys run in parallel. Each key with queued work holds at
+    most one worker, draining its own backlog before releasing it.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, name: str = "events"):
+        """Configure the queue.
+
+        Args:
+            max_workers: Worker threads shared by all keys
+            max_pending: Queued plus running jobs before submissions are refused
+            name: Worker thread name prefix
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=name)
+        self._queues: dict[Hashable, deque] = {}
+        self._pending = 0
+        self._processed = 0
+        self._failed = 0
+        self._idle = threading.Condition()
+
+    def submit_all(self, jobs: Iterable[tuple[Hashable, Callable[[], None]]]) -> bool:
+        """Queue (key, job) pairs, all or none.
+
+        Returns:
+            False if accepting them would exceed max_pending
+        """
+        jobs = list(jobs)
+        with self._idle:
+            if self._pending + len(jobs) > self.max_pending:
+                logger.warning(f"Event queue full ({self._pending} pending), refusing {len(jobs)} jobs")
+                return False
+            for key, job in jobs:
+                self._pending += 1
+                queue = self._queues.get(key)
+                if queue is None:
+                    # No worker owns this key yet; start one
+                    self._queues[key] = deque([job])
+                    self._executor.submit(self._drain, key)
+                else:
+                    queue.append(job)
+        return True
+
+    def _drain(self, key: Hashable) -> None:
+        while True:
+            with self._idle:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                job = queue.popleft()
+
+            try:
+                job()
+                failed = False
+            except Exception as e:
+                logger.error(f"Event job for {key} failed: {e}", exc_info=True)
+                failed = True
+
+            with self._idle:
+                self._pending -= 1
+                self._processed += 1
+                self._failed += failed
+                if self._pending == 0:
+                    self._idle.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued job has run.
+
+        Returns:
+            False if the timeout expired first
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def get_stats(self) -> dict:
+        """Get queue depth and job counters."""
+        with self._idle:
+            return {
+                "pending": self._pending,
+                "active_keys": len(self._queues),
+                "processed": self._processed,
+                "failed": self._failed,
+            }
+
+
+# Singleton instance for LINE webhook events
+webhook_queue = KeyedEventQueue(
+    Config.WEBHOOK_WORKERS, Config.WEBHOOK_MAX_PENDING, name="webhook"
+)
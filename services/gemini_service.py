@@ -9,23 +9,50 @@ from google import genai
 from google.genai import types
 
 from config import Config
-from prompts.transaction_parser import PARSE_TRANSACTION_PROMPT
+from prompts.transaction_parser import PARSE_TRANSACTION_PROMPT, PARSE_TRANSACTION_SCHEMA
+from utils.image_preprocess import detect_mime_type
 
 
 class GeminiService:
     """Service for Gemini AI operations."""
 
+    # Returned by generate_response when the API call fails
+    ERROR_RESPONSE = "ขออภัย ไม่สามารถประมวลผลได้ในขณะนี้"
+
     def __init__(self):
         """Initialize the Gemini service with dual models."""
-        self.client = genai.Client(api_key=Config.GEMINI_API_KEY)
+        self._client: Optional[genai.Client] = None
         self.ocr_model = Config.GEMINI_OCR_MODEL
         self.research_model = Config.GEMINI_RESEARCH_MODEL
 
-    def parse_transaction_image(self, image_bytes: bytes) -> Optional[dict]:
+    @property
+    def client(self) -> genai.Client:
+        """Lazy-load the Gemini client."""
+        if self._client is None:
+            self._client = genai.Client(api_key=Config.GEMINI_API_KEY)
+        return self._client
+
+    def transaction_parse_config(self, thinking_budget: Optional[int] = None) -> types.GenerateContentConfig:
+        """Generation config for screenshot parsing: JSON constrained to PARSE_TRANSACTION_SCHEMA.
+
+        Args:
+            thinking_budget: Thinking token budget (default Config.GEMINI_OCR_THINKING_BUDGET)
+        """
+        budget = Config.GEMINI_OCR_THINKING_BUDGET if thinking_budget is None else thinking_budget
+        return types.GenerateContentConfig(
+            temperature=0.1,  # Low temperature for consistent parsing
+            response_mime_type="application/json",
+            response_schema=PARSE_TRANSACTION_SCHEMA,
+            max_output_tokens=Config.GEMINI_OCR_MAX_OUTPUT_TOKENS,
+            thinking_config=types.ThinkingConfig(thinking_budget=budget),
+        )
+
+    def parse_transaction_image(self, image_bytes: bytes, mime_type: Optional[str] = None) -> Optional[dict]:
         """Parse a transaction screenshot using Gemini Vision.
 
         Args:
             image_bytes: The image data as bytes
+            mime_type: Image MIME type (detected from the bytes if omitted)
 
         Returns:
             Parsed transaction data as dict, or None if parsing failed
@@ -34,66 +61,75 @@ class GeminiService:
             # Create image part for Gemini
             image_part = types.Part.from_bytes(
                 data=image_bytes,
-                mime_type="image/jpeg",
+                mime_type=mime_type or detect_mime_type(image_bytes) or "image/jpeg",
             )
 
             print(f"🔧 Using model: {self.ocr_model}")
 
-            # Send to Gemini Vision (using OCR model)
-            # Note: Gemini 3 uses "thinking" tokens, so we need higher max_output_tokens
+            # Send to Gemini Vision (using OCR model) in JSON schema mode
             response = self.client.models.generate_content(
                 model=self.ocr_model,
                 contents=[PARSE_TRANSACTION_PROMPT, image_part],
-                config=types.GenerateContentConfig(
-                    temperature=0.1,  # Low temperature for consistent parsing
-                    max_output_tokens=8000,  # High enough for Gemini 3 thinking + output
-                ),
+                config=self.transaction_parse_config(),
             )
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            return None
 
-            # Debug: print full response
-            print(f"🔍 Response object: {response}")
-            print(f"🔍 Response candidates: {response.candidates if hasattr(response, 'candidates') else 'N/A'}")
-
-            # Extract JSON from response - try different methods
-            response_text = None
-            if hasattr(response, 'text') and response.text:
-                response_text = response.text
-            elif hasattr(response, 'candidates') and response.candidates:
-                # Try to get text from candidates
-                candidate = response.candidates[0]
-                if hasattr(candidate, 'content') and candidate.content.parts:
-                    response_text = candidate.content.parts[0].text
-
-            if not response_text:
-                print("Gemini returned empty response")
-                print(f"🔍 Full response dump: {vars(response) if hasattr(response, '__dict__') else response}")
-                return None
-            response_text = response_text.strip()
-
-            # Try to extract JSON if wrapped in markdown code blocks
-            json_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", response_text)
-            if json_match:
-                response_text = json_match.group(1)
-
-            # Parse JSON
-            parsed = json.loads(response_text)
-            print(f"✅ Parsed JSON: {parsed}")
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            print(
+                f"🔢 Tokens: prompt {usage.prompt_token_count}, "
+                f"thinking {usage.thoughts_token_count}, output {usage.candidates_token_count}"
+            )
+        return self.parse_transaction_response(response)
+
+    @staticmethod
+    def parse_transaction_response(response) -> Optional[dict]:
+        """Extract and validate the transaction JSON from a Gemini response.
 
-            # Validate required fields (using asset_normalized from new prompt)
-            required_fields = ["source_app", "asset_normalized", "side", "amount"]
-            if not all(parsed.get(f) for f in required_fields):
-                print(f"❌ Missing required fields. Got: {list(parsed.keys())}")
-                return None
+        Returns:
+            Parsed transaction data as dict, or None if it is missing or invalid
+        """
+        # Extract JSON from response - try different methods
+        response_text = None
+        if hasattr(response, 'text') and response.text:
+            response_text = response.text
+        elif hasattr(response, 'candidates') and response.candidates:
+            # Try to get text from candidates
+            candidate = response.candidates[0]
+            if hasattr(candidate, 'content') and candidate.content.parts:
+                response_text = candidate.content.parts[0].text
+
+        if not response_text:
+            finish_reason = response.candidates[0].finish_reason if getattr(response, "candidates", None) else None
+            print(f"Gemini returned empty response (finish reason: {finish_reason})")
+            return None
+        response_text = response_text.strip()
 
-            return parsed
+        # Schema mode returns bare JSON; free-text replies may wrap it in markdown
+        json_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", response_text)
+        if json_match:
+            response_text = json_match.group(1)
 
+        try:
+            parsed = json.loads(response_text)
         except json.JSONDecodeError as e:
             print(f"JSON parse error: {e}")
             return None
-        except Exception as e:
-            print(f"Gemini API error: {e}")
+        if not isinstance(parsed, dict):
+            print(f"❌ Expected a JSON object, got {type(parsed).__name__}")
+            return None
+        print(f"✅ Parsed JSON: {parsed}")
+
+        # Validate required fields (using asset_normalized from new prompt)
+        required_fields = ["source_app", "asset_normalized", "side", "amount"]
+        if not all(parsed.get(f) for f in required_fields):
+            print(f"❌ Missing required fields. Got: {list(parsed.keys())}")
             return None
 
+        return parsed
+
     def generate_response(self, prompt: str, use_research_model: bool = False) -> str:
         """Generate a text response using Gemini.
 
@@ -114,7 +150,40 @@ class GeminiService:
             return response.text
         except Exception as e:
             print(f"Gemini API error: {e}")
-            return "ขออภัย ไม่สามารถประมวลผลได้ในขณะนี้"
+            return self.ERROR_RESPONSE
+
+    def generate_json(
+        self, prompt: str, response_schema: dict, use_research_model: bool = False
+    ) -> Optional[dict]:
+        """Generate a structured response constrained to a JSON schema.
+
+        Args:
+            prompt: The text prompt
+            response_schema: Gemini response schema (OpenAPI subset), e.g.
+                {"type": "OBJECT", "properties": {...}, "required": [...]}
+            use_research_model: If True, use the research model
+
+        Returns:
+            Parsed JSON object, or None if the call or parsing failed
+        """
+        try:
+            model = self.research_model if use_research_model else self.ocr_model
+            response = self.client.models.generate_content(
+                model=model,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=response_schema,
+                ),
+            )
+            parsed = json.loads(response.text or "")
+            return parsed if isinstance(parsed, dict) else None
+        except json.JSONDecodeError as e:
+            print(f"JSON parse error: {e}")
+            return None
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            return None
 
     def deep_research(self, prompt: str) -> str:
         """Perform deep research using Gemini 2.5 Pro.
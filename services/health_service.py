@@ -0,0 +1,172 @@
+"""Health probes for upstream dependencies, refreshed in the background on read."""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict
+
+from config import Config
+from services.registry import registry
+
+logger = logging.getLogger(__name__)
+
+ICT = timezone(timedelta(hours=7))
+
+
+def _probe_tiingo() -> None:
+    # Token check endpoint: verifies reachability and the API key without
+    # requesting any market data
+    if registry.get("price_service")._tiingo_get("/api/test") is None:
+        raise RuntimeError("Tiingo rejected the request")
+
+
+def _probe_usd_thb() -> None:
+    # Bypasses the rate cache so the upstream sources are actually checked
+    registry.get("price_service").fetch_usd_thb_rate()
+
+
+def _probe_storage() -> None:
+    registry.get("sheets_service").ping()
+
+
+def _probe_gemini() -> None:
+    gemini_service = registry.get("gemini_service")
+    # Model metadata only: no tokens are generated
+    gemini_service.client.models.get(model=gemini_service.ocr_model)
+
+
+# Display name -> probe; a probe raises on failure
+DEFAULT_PROBES: Dict[str, Callable[[], None]] = {
+    "Price API (Tiingo)": _probe_tiingo,
+    "USD/THB Exchange Rate": _probe_usd_thb,
+    "SQLite Storage" if Config.STORAGE_BACKEND == "sqlite" else "Google Sheets": _probe_storage,
+    "Gemini AI": _probe_gemini,
+}
+
+
+class HealthService:
+    """Runs lightweight dependency probes when their cached results go stale.
+
+    Readers always get the cached results at once. If those are missing or
+    older than the interval, the read also starts one probe round on a
+    background thread, so nothing is probed while nobody asks for status and
+    frequent checks still cost at most one round per interval.
+    """
+
+    def __init__(
+        self,
+        probes: Dict[str, Callable[[], None]],
+        interval: float,
+        timeout: float,
+    ):
+        """Initialize the service.
+
+        Args:
+            probes: Dict of {name: probe}; a probe raises on failure
+            interval: Seconds cached results are served before a read refreshes them
+            timeout: Seconds before a probe still running counts as failed
+        """
+        self.probes = probes
+        self.interval = interval
+        self.timeout = timeout
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._refreshed_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max(1, len(probes)), thread_name_prefix="health-probe")
+
+    def refresh_if_stale(self) -> bool:
+        """Start a background probe round if the results are missing or older than the interval.
+
+        Returns:
+            True if a round was started (False if fresh or one is already running)
+        """
+        with self._lock:
+            fresh = self._results and time.monotonic() - self._refreshed_at < self.interval
+            if fresh or self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="health-probes", daemon=True).start()
+        return True
+
+    def _refresh(self) -> None:
+        try:
+            self.run_probes()
+        except Exception as e:
+            logger.error(f"Health probe round failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _timed(self, probe: Callable[[], None]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            probe()
+            error = None
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        return {
+            "healthy": error is None,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "checked_at": datetime.now(ICT),
+            "error": error,
+        }
+
+    def run_probes(self) -> Dict[str, Dict[str, Any]]:
+        """Run every probe in parallel and cache the results."""
+        futures = {self._executor.submit(self._timed, probe): name for name, probe in self.probes.items()}
+        done, not_done = wait(futures, timeout=self.timeout)
+
+        results = {}
+        for future, name in futures.items():
+            if future in done:
+                results[name] = future.result()
+            else:
+                results[name] = {
+                    "healthy": False,
+                    "latency_ms": self.timeout * 1000,
+                    "checked_at": datetime.now(ICT),
+                    "error": "Timed out",
+                }
+        for name, result in results.items():
+            if not result["healthy"]:
+                logger.warning(f"Health probe {name} failed: {result['error']}")
+
+        with self._lock:
+            self._results = results
+            self._refreshed_at = time.monotonic()
+        return results
+
+    def get_results(self) -> Dict[str, Dict[str, Any]]:
+        """Get the latest cached probe results (empty until the first round completes).
+
+        Starts a background refresh if they are stale.
+        """
+        self.refresh_if_stale()
+        with self._lock:
+            return dict(self._results)
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Get the cached results as a JSON-ready report with an overall status."""
+        results = self.get_results()
+        if not results:
+            status = "starting"
+        elif all(r["healthy"] for r in results.values()):
+            status = "ok"
+        else:
+            status = "degraded"
+        return {
+            "status": status,
+            "checked_at": max((r["checked_at"] for r in results.values()), default=None),
+            "probes": results,
+        }
+
+
+# Singleton instance
+health_service = HealthService(
+    DEFAULT_PROBES,
+    interval=Config.HEALTH_PROBE_INTERVAL_SECONDS,
+    timeout=Config.HEALTH_PROBE_TIMEOUT_SECONDS,
+)
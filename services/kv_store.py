@@ -0,0 +1,351 @@
+"""Small key-value stores with per-entry TTL, used as shared caches."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, Optional
+from urllib.parse import quote
+
+from config import Config
+
+
+class KVStore(ABC):
+    """Key-value store with optional per-entry expiry.
+
+    Values must be JSON-serializable so every backend stores them the same
+    way. Expired entries behave as missing.
+    """
+
+    @abstractmethod
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """Get the live values for keys; missing or expired keys are omitted."""
+
+    @abstractmethod
+    def set_many(self, items: dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Store values, expiring after ttl seconds (None = never)."""
+
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store a value only if the key is missing or expired.
+
+        Returns:
+            True if the value was stored, False if a live entry already existed
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a key if present."""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Drop expired entries, returning how many were removed."""
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a single live value."""
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a single value."""
+        self.set_many({key: value}, ttl)
+
+    @staticmethod
+    def _expires_at(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl is not None else None
+
+
+class MemoryKVStore(KVStore):
+    """Process-local store, for tests and single-instance runs."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """Initialize the store.
+
+        Args:
+            max_entries: Optional size bound; once exceeded, expired entries
+                are dropped and then the oldest writes are evicted
+        """
+        self.max_entries = max_entries
+        self._data: dict[str, tuple[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _evict(self) -> None:
+        """Enforce max_entries (caller holds the lock)."""
+        if self.max_entries is None or len(self._data) <= self.max_entries:
+            return
+        now = time.time()
+        for key in [k for k, (_, exp) in self._data.items() if exp is not None and exp <= now]:
+            del self._data[key]
+        while len(self._data) > self.max_entries:
+            del self._data[next(iter(self._data))]
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry and (entry[1] is None or entry[1] > now):
+                    found[key] = json.loads(entry[0])
+        return found
+
+    def set_many(self, items: dict[str, Any], ttl: Optional[float] = None) -> None:
+        expires_at = self._expires_at(ttl)
+        with self._lock:
+            for key, value in items.items():
+                # Serialized so callers cannot mutate cached values in place;
+                # re-inserted so eviction order follows the latest write
+                self._data.pop(key, None)
+                self._data[key] = (json.dumps(value), expires_at)
+            self._evict()
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and (entry[1] is None or entry[1] > now):
+                return False
+            self._data.pop(key, None)
+            self._data[key] = (json.dumps(value), self._expires_at(ttl))
+            self._evict()
+        return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, exp) in self._data.items() if exp is not None and exp <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+
+class SQLiteKVStore(KVStore):
+    """Store backed by a local SQLite file, shared by every process on the host.
+
+    Several stores can share one file; each uses its own namespace.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS kv_store (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        expires_at REAL,
+        PRIMARY KEY (namespace, key)
+    );
+    """
+
+    def __init__(self, db_path: str, namespace: str):
+        """Configure the store; the database at db_path is created on first use."""
+        self.db_path = db_path
+        self.namespace = namespace
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, creating the database on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connect().execute(
+            f"SELECT key, value FROM kv_store WHERE namespace = ? AND key IN ({placeholders}) "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (self.namespace, *keys, time.time()),
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def set_many(self, items: dict[str, Any], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        expires_at = self._expires_at(ttl)
+        self._connect().executemany(
+            "INSERT OR REPLACE INTO kv_store (namespace, key, value, expires_at) "
+            "VALUES (?, ?, ?, ?)",
+            [(self.namespace, key, json.dumps(value), expires_at) for key, value in items.items()],
+        )
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # An expired entry must not block the insert
+            conn.execute(
+                "DELETE FROM kv_store WHERE namespace = ? AND key = ? "
+                "AND expires_at IS NOT NULL AND expires_at <= ?",
+                (self.namespace, key, time.time()),
+            )
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO kv_store (namespace, key, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), self._expires_at(ttl)),
+            )
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._connect().execute(
+            "DELETE FROM kv_store WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+
+    def purge_expired(self) -> int:
+        cursor = self._connect().execute(
+            "DELETE FROM kv_store WHERE namespace = ? AND expires_at IS NOT NULL "
+            "AND expires_at <= ?",
+            (self.namespace, time.time()),
+        )
+        return cursor.rowcount
+
+
+class GCSKVStore(KVStore):
+    """Store backed by a Google Cloud Storage bucket, shared by every instance.
+
+    Each entry is one object, <namespace>/<key>, holding the JSON value and
+    its expiry, so entries survive restarts and redeploys. add() creates the
+    object with an ifGenerationMatch precondition: of several instances
+    claiming the same key at once, exactly one succeeds. Requests use the
+    Cloud Storage JSON API through google-auth, so no client library is
+    needed. Expired objects are deleted by the bucket's lifecycle rule
+    (see deploy.sh); purge_expired does nothing.
+    """
+
+    API_URL = "https://storage.googleapis.com/storage/v1/b"
+    UPLOAD_URL = "https://storage.googleapis.com/upload/storage/v1/b"
+    SCOPES = ["https://www.googleapis.com/auth/devstorage.read_write"]
+
+    def __init__(self, bucket: str, namespace: str, session=None, timeout: float = 10.0):
+        """Configure the store.
+
+        Args:
+            bucket: Bucket name
+            namespace: Object name prefix for this store
+            session: requests-compatible session (default: an AuthorizedSession
+                with Application Default Credentials, created on first use)
+            timeout: Seconds per request
+        """
+        self.bucket = bucket
+        self.namespace = namespace
+        self.timeout = timeout
+        self._session = session
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Lazy-load the authorized HTTP session."""
+        with self._session_lock:
+            if self._session is None:
+                import google.auth
+                from google.auth.transport.requests import AuthorizedSession
+
+                credentials, _ = google.auth.default(scopes=self.SCOPES)
+                self._session = AuthorizedSession(credentials)
+            return self._session
+
+    def _object_url(self, key: str) -> str:
+        return f"{self.API_URL}/{self.bucket}/o/{quote(f'{self.namespace}/{key}', safe='')}"
+
+    def _read(self, key: str) -> Optional[tuple[dict, Optional[str]]]:
+        """Get (entry, generation) for a key, or None if there is no object."""
+        response = self.session.get(self._object_url(key), params={"alt": "media"}, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json(), response.headers.get("x-goog-generation")
+
+    def _write(self, key: str, value: Any, expires_at: Optional[float], if_generation_match=None) -> bool:
+        """Upload an entry; returns False if the generation precondition failed."""
+        params = {"uploadType": "media", "name": f"{self.namespace}/{key}"}
+        if if_generation_match is not None:
+            params["ifGenerationMatch"] = str(if_generation_match)
+        response = self.session.post(
+            f"{self.UPLOAD_URL}/{self.bucket}/o",
+            params=params,
+            data=json.dumps({"value": value, "expires_at": expires_at}),
+            headers={"Content-Type": "application/json"},
+            timeout=self.timeout,
+        )
+        if response.status_code == 412:
+            return False
+        response.raise_for_status()
+        return True
+
+    @staticmethod
+    def _is_live(entry: dict) -> bool:
+        return entry.get("expires_at") is None or entry["expires_at"] > time.time()
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        found = {}
+        for key in keys:
+            stored = self._read(key)
+            if stored is not None and self._is_live(stored[0]):
+                found[key] = stored[0]["value"]
+        return found
+
+    def set_many(self, items: dict[str, Any], ttl: Optional[float] = None) -> None:
+        expires_at = self._expires_at(ttl)
+        for key, value in items.items():
+            self._write(key, value, expires_at)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        expires_at = self._expires_at(ttl)
+        if self._write(key, value, expires_at, if_generation_match=0):
+            return True
+        stored = self._read(key)
+        if stored is None:
+            # Deleted since the failed create; claim it now if nobody else has
+            return self._write(key, value, expires_at, if_generation_match=0)
+        entry, generation = stored
+        if self._is_live(entry) or generation is None:
+            return False
+        # Replace the expired entry only if it is still the one just read
+        return self._write(key, value, expires_at, if_generation_match=generation)
+
+    def delete(self, key: str) -> None:
+        response = self.session.delete(self._object_url(key), timeout=self.timeout)
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    def purge_expired(self) -> int:
+        return 0
+
+
+def create_kv_store(
+    backend: str, namespace: str, db_path: str, max_entries: Optional[int] = None
+) -> Optional[KVStore]:
+    """Build a store from a config value: gcs, sqlite, memory or none.
+
+    gcs uses the CACHE_GCS_BUCKET bucket (falling back to sqlite if it is not
+    set). max_entries bounds the memory backend; SQLite entries are bounded
+    by their TTL and purge_expired.
+    """
+    backend = backend.lower()
+    if backend == "gcs":
+        if Config.CACHE_GCS_BUCKET:
+            return GCSKVStore(Config.CACHE_GCS_BUCKET, namespace)
+        print(f"⚠️ CACHE_GCS_BUCKET is not set, using SQLite for the {namespace} cache")
+        backend = "sqlite"
+    if backend == "sqlite":
+        return SQLiteKVStore(db_path, namespace)
+    if backend == "memory":
+        return MemoryKVStore(max_entries)
+    return None
@@ -1,9 +1,11 @@
 """LINE Messaging API service."""
 
+import inspect
 import requests
-from typing import Optional
+from typing import Callable, Optional
 
 from linebot.v3 import WebhookHandler
+from linebot.v3.webhooks import MessageEvent
 from linebot.v3.messaging import (
     ApiClient,
     Configuration,
@@ -17,6 +19,70 @@ from linebot.v3.messaging import (
 from config import Config
 
 
+class EventWebhookHandler(WebhookHandler):
+    """WebhookHandler that can also run handlers for already-parsed events.
+
+    Lets the webhook verify and parse a request up front, then dispatch each
+    event later (e.g. from a worker thread). add() and default() also record
+    handlers in a routing table of our own, so dispatch() does not depend on
+    the SDK's private attributes.
+    """
+
+    def __init__(self, channel_secret: str):
+        super().__init__(channel_secret)
+        # {(event class, message class or None): handler}
+        self._routes: dict[tuple[type, Optional[type]], Callable] = {}
+        self._default_route: Optional[Callable] = None
+
+    def add(self, event, message=None):
+        """Register a handler for an event (and message) type, as WebhookHandler.add does."""
+        register = super().add(event, message=message)
+
+        def decorator(func):
+            for message_type in message if isinstance(message, (list, tuple)) else [message]:
+                self._routes[(event, message_type)] = func
+            return register(func)
+
+        return decorator
+
+    def default(self):
+        """Register the handler for events no other handler matches."""
+        register = super().default()
+
+        def decorator(func):
+            self._default_route = func
+            return register(func)
+
+        return decorator
+
+    def parse(self, body: str, signature: str):
+        """Verify the signature and parse the body into a WebhookPayload.
+
+        Raises:
+            InvalidSignatureError: If the signature does not match
+        """
+        return self.parser.parse(body, signature, as_payload=True)
+
+    def dispatch(self, event, destination: Optional[str] = None) -> None:
+        """Run the handler registered for one event, routed as handle() does."""
+        func = None
+        if isinstance(event, MessageEvent):
+            func = self._routes.get((event.__class__, event.message.__class__))
+        if func is None:
+            func = self._routes.get((event.__class__, None), self._default_route)
+        if func is None:
+            print(f"No handler for {event.__class__.__name__}")
+            return
+
+        arg_spec = inspect.getfullargspec(func)
+        if arg_spec.varargs is not None or len(arg_spec.args) == 2:
+            func(event, destination)
+        elif len(arg_spec.args) == 1:
+            func(event)
+        else:
+            func()
+
+
 class LineService:
     """Service for LINE Messaging API operations."""
 
@@ -25,7 +91,7 @@ class LineService:
         self.configuration = Configuration(
             access_token=Config.LINE_CHANNEL_ACCESS_TOKEN
         )
-        self.handler = WebhookHandler(Config.LINE_CHANNEL_SECRET)
+        self.handler = EventWebhookHandler(Config.LINE_CHANNEL_SECRET)
 
     @property
     def api(self) -> MessagingApi:
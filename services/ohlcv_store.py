@@ -0,0 +1,206 @@
+"""Local SQLite store of daily OHLCV candles with incremental yfinance refresh."""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _yfinance_history(symbol: str, **kwargs) -> pd.DataFrame:
+    """Download daily candles from yfinance."""
+    return yf.Ticker(symbol).history(**kwargs)
+
+
+class OHLCVStore:
+    """Daily candles per yfinance symbol, persisted in SQLite.
+
+    The first request for a symbol downloads the full history window; later
+    refreshes only download bars from the last few stored dates onwards and
+    merge them in. The overlap doubles as a check for retroactive split or
+    dividend adjustments, which trigger a full re-download.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ohlcv (
+        symbol TEXT NOT NULL,
+        date TEXT NOT NULL,
+        open REAL, high REAL, low REAL, close REAL, volume REAL,
+        PRIMARY KEY (symbol, date)
+    );
+    CREATE TABLE IF NOT EXISTS ohlcv_sync (
+        symbol TEXT PRIMARY KEY,
+        synced_at REAL NOT NULL
+    );
+    """
+
+    FULL_PERIOD = "2y"
+    OVERLAP_BARS = 5
+
+    def __init__(
+        self,
+        db_path: str,
+        refresh_interval: float = 900,
+        history: Callable[..., pd.DataFrame] = _yfinance_history,
+    ):
+        """Configure the store; the database at db_path is created on first use.
+
+        Args:
+            db_path: SQLite file path
+            refresh_interval: Seconds before a symbol is checked for new bars
+            history: Download function, called as history(symbol, period=... | start=...)
+        """
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self.history = history
+        self._local = threading.local()
+        self._symbol_locks: dict[str, threading.Lock] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, creating the database on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # ==================== READ ====================
+
+    def get_history(self, symbol: str, days: int = 365, min_bars: int = 50) -> pd.DataFrame:
+        """Get daily candles for the last `days` days, refreshing from yfinance if due.
+
+        Mirrors the previous fetch behaviour: when the window holds fewer than
+        min_bars candles, twice the window is returned instead.
+
+        Returns:
+            DataFrame with Open/High/Low/Close/Volume columns and a DatetimeIndex
+            (empty if the symbol has no data)
+        """
+        with self._symbol_locks.setdefault(symbol, threading.Lock()):
+            if self._refresh_due(symbol):
+                try:
+                    self.refresh(symbol)
+                except Exception as e:
+                    # Serve what is on disk; only an empty store is fatal upstream
+                    logger.warning(f"OHLCV refresh failed for {symbol}: {e}")
+
+        df = self._read(symbol, date.today() - timedelta(days=days))
+        if len(df) < min_bars:
+            df = self._read(symbol, date.today() - timedelta(days=2 * days))
+        return df
+
+    def _read(self, symbol: str, since: date) -> pd.DataFrame:
+        rows = self._connect().execute(
+            "SELECT date, open, high, low, close, volume FROM ohlcv "
+            "WHERE symbol = ? AND date >= ? ORDER BY date",
+            (symbol, since.isoformat()),
+        ).fetchall()
+        df = pd.DataFrame(rows, columns=["Date"] + OHLCV_COLUMNS)
+        return df.set_index(pd.DatetimeIndex(df.pop("Date"), name="Date"))
+
+    def _refresh_due(self, symbol: str) -> bool:
+        row = self._connect().execute(
+            "SELECT synced_at FROM ohlcv_sync WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        return row is None or time.time() - row[0] >= self.refresh_interval
+
+    # ==================== WRITE ====================
+
+    def refresh(self, symbol: str) -> int:
+        """Download bars newer than what is stored and merge them in.
+
+        Returns:
+            Number of bars written
+        """
+        conn = self._connect()
+        overlap = conn.execute(
+            "SELECT date, close FROM ohlcv WHERE symbol = ? ORDER BY date DESC LIMIT ?",
+            (symbol, self.OVERLAP_BARS),
+        ).fetchall()
+
+        if not overlap:
+            written = self._replace_all(symbol)
+        else:
+            fetched = self._normalize(self.history(symbol, start=overlap[-1][0]))
+            if self._adjusted_since(overlap, fetched):
+                logger.info(f"OHLCV history for {symbol} was re-adjusted, re-downloading")
+                written = self._replace_all(symbol)
+            else:
+                written = self._upsert(symbol, fetched)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO ohlcv_sync (symbol, synced_at) VALUES (?, ?)",
+            (symbol, time.time()),
+        )
+        return written
+
+    def _replace_all(self, symbol: str) -> int:
+        fetched = self._normalize(self.history(symbol, period=self.FULL_PERIOD))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM ohlcv WHERE symbol = ?", (symbol,))
+            written = self._upsert(symbol, fetched, conn)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return written
+
+    def _upsert(
+        self, symbol: str, df: pd.DataFrame, conn: Optional[sqlite3.Connection] = None
+    ) -> int:
+        if df.empty:
+            return 0
+        rows = [
+            (symbol, day, *values)
+            for day, values in zip(df.index, df[OHLCV_COLUMNS].itertuples(index=False))
+        ]
+        (conn or self._connect()).executemany(
+            "INSERT OR REPLACE INTO ohlcv (symbol, date, open, high, low, close, volume) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    @staticmethod
+    def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+        """Keep OHLCV columns, indexed by ISO date strings."""
+        if df is None or df.empty:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        df = df.rename(columns=str.capitalize)[OHLCV_COLUMNS].astype(float)
+        df.index = pd.DatetimeIndex(df.index).strftime("%Y-%m-%d")
+        return df[~df.index.duplicated(keep="last")]
+
+    @staticmethod
+    def _adjusted_since(overlap: list[tuple], fetched: pd.DataFrame) -> bool:
+        """True if completed stored bars no longer match the fresh download.
+
+        The newest stored bar is skipped since it may have been a partial day.
+        """
+        stored = {day: close for day, close in overlap[1:]}
+        common = [day for day in stored if day in fetched.index]
+        if not common:
+            return False
+        return not np.allclose(
+            [stored[day] for day in common],
+            fetched.loc[common, "Close"].to_numpy(),
+            rtol=1e-6,
+            equal_nan=True,
+        )
@@ -0,0 +1,199 @@
+"""Cache of screenshot parses, keyed by image content, with duplicate detection."""
+
+import hashlib
+import io
+import logging
+from typing import Any, Optional
+
+from config import Config
+from services.kv_store import KVStore, create_kv_store
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenshotParseCache:
+    """Remembers what each user's screenshots parsed to and which transactions they produced.
+
+    Users often resend the same screenshot after a slow reply. A resend with
+    the same bytes (SHA-256) reuses the cached parse instead of calling
+    Gemini again.
+
+    A transaction is a likely duplicate when its screenshot was already
+    recorded, or when another screenshot produced the same asset, side,
+    amount, price and date. Optionally, a re-encoded copy (forwarded,
+    re-saved) of a recorded screenshot is also flagged: its 256-bit
+    difference hash is within a small Hamming distance. A perceptual match
+    never stands in for OCR, because two screenshots of the same app screen
+    that differ only in a few digits can hash alike. Likely duplicates are
+    held as pending so the user can still confirm them.
+
+    All entries are scoped per user. Every store error is logged and treated
+    as a miss, so the cache can never block recording a transaction.
+    """
+
+    # Recent perceptual hashes kept per user for near-match lookups
+    PHASH_INDEX_SIZE = 50
+
+    # Difference hash grid: HASH_SIZE x HASH_SIZE bits
+    HASH_SIZE = 16
+
+    def __init__(self, store: Optional[KVStore], ttl: float, phash_max_distance: Optional[int]):
+        """Initialize the cache.
+
+        Args:
+            store: Backing store (None disables the cache)
+            ttl: Seconds entries are kept
+            phash_max_distance: Max differing bits for a perceptual match
+                (None matches exact content only)
+        """
+        self.store = store
+        self.ttl = ttl
+        self.phash_max_distance = phash_max_distance
+
+    @staticmethod
+    def content_hash(image_bytes: bytes) -> str:
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    @classmethod
+    def perceptual_hash(cls, image_bytes: bytes) -> Optional[str]:
+        """Difference hash (dHash) of the image as hex, or None if it cannot be decoded."""
+        size = cls.HASH_SIZE
+        try:
+            from PIL import Image
+
+            image = Image.open(io.BytesIO(image_bytes)).convert("L")
+            pixels = image.resize((size + 1, size), Image.Resampling.LANCZOS).tobytes()
+        except Exception:
+            return None
+        bits = 0
+        for row in range(size):
+            for col in range(size):
+                offset = row * (size + 1) + col
+                bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+        return f"{bits:0{size * size // 4}x}"
+
+    @staticmethod
+    def fingerprint(tx: dict) -> str:
+        """Identity of a trade, independent of the screenshot it came from."""
+        parts = [
+            str(tx.get("asset", "")).upper(),
+            str(tx.get("side", "")).upper(),
+            f"{float(tx.get('amount') or 0):.8g}",
+            f"{float(tx.get('price') or 0):.8g}",
+            str(tx.get("date", "")),
+        ]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+    # ==================== PARSES ====================
+
+    def lookup(self, user_id: str, image_bytes: bytes) -> dict:
+        """Find a cached parse for the image.
+
+        Returns:
+            {"key": content hash, "phash": perceptual hash or None,
+             "entry": {"parsed": dict, "tx_id": str | None} or None,
+             "similar_tx_id": tx_id recorded from a perceptually matching
+             screenshot, or None}
+        """
+        lookup = {"key": self.content_hash(image_bytes), "phash": None, "entry": None, "similar_tx_id": None}
+        if self.store is None:
+            return lookup
+
+        lookup["entry"] = self._get(f"img:{user_id}:{lookup['key']}")
+        if lookup["entry"] is None and self.phash_max_distance is not None:
+            lookup["phash"] = self.perceptual_hash(image_bytes)
+            match = self._nearest(user_id, lookup["phash"])
+            similar = self._get(f"img:{user_id}:{match}") if match else None
+            if similar and similar.get("tx_id"):
+                logger.info(f"Screenshot {lookup['key'][:12]} resembles recorded {match[:12]}")
+                lookup["similar_tx_id"] = similar["tx_id"]
+        return lookup
+
+    def store_parse(self, user_id: str, lookup: dict, parsed: dict) -> None:
+        """Cache a fresh Gemini parse for the looked-up image."""
+        self._set(f"img:{user_id}:{lookup['key']}", {"parsed": parsed, "tx_id": None})
+        if lookup["phash"] is not None:
+            index = self._get(f"phash:{user_id}") or []
+            index = [item for item in index if item[1] != lookup["key"]]
+            index.append([lookup["phash"], lookup["key"]])
+            self._set(f"phash:{user_id}", index[-self.PHASH_INDEX_SIZE:])
+
+    def _nearest(self, user_id: str, phash: Optional[str]) -> Optional[str]:
+        """Content hash of the closest recent screenshot within the distance limit."""
+        if phash is None:
+            return None
+        best, best_distance = None, self.phash_max_distance + 1
+        for other_phash, key in self._get(f"phash:{user_id}") or []:
+            distance = (int(phash, 16) ^ int(other_phash, 16)).bit_count()
+            if distance < best_distance:
+                best, best_distance = key, distance
+        return best
+
+    # ==================== TRANSACTIONS ====================
+
+    def find_duplicate(self, user_id: str, lookup: dict, tx: dict) -> Optional[str]:
+        """Get the tx_id this transaction likely duplicates, or None."""
+        entry = lookup.get("entry")
+        if entry and entry.get("tx_id"):
+            return entry["tx_id"]
+        if lookup.get("similar_tx_id"):
+            return lookup["similar_tx_id"]
+        return self._get(f"tx:{user_id}:{self.fingerprint(tx)}")
+
+    def record_transaction(self, user_id: str, lookup: dict, tx: dict) -> None:
+        """Remember the transaction recorded from the looked-up image."""
+        entry = self._get(f"img:{user_id}:{lookup['key']}")
+        if entry is not None:
+            self._set(f"img:{user_id}:{lookup['key']}", {**entry, "tx_id": tx["tx_id"]})
+        self._set(f"tx:{user_id}:{self.fingerprint(tx)}", tx["tx_id"])
+
+    def hold_pending(self, user_id: str, key: str, pending: dict) -> None:
+        """Keep a flagged transaction until the user confirms or it expires."""
+        self._set(f"pending:{user_id}:{key}", pending)
+
+    def pop_pending(self, user_id: str, key: str) -> Optional[dict]:
+        """Take a held transaction (None if it expired or was already recorded)."""
+        pending = self._get(f"pending:{user_id}:{key}")
+        if pending is not None:
+            self._delete(f"pending:{user_id}:{key}")
+        return pending
+
+    # ==================== STORE ====================
+
+    def _get(self, key: str) -> Any:
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            logger.warning(f"Parse cache read failed: {e}")
+            return None
+
+    def _set(self, key: str, value: Any) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.set(key, value, ttl=self.ttl)
+        except Exception as e:
+            logger.warning(f"Parse cache write failed: {e}")
+
+    def _delete(self, key: str) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.delete(key)
+        except Exception as e:
+            logger.warning(f"Parse cache delete failed: {e}")
+
+
+# Singleton instance
+parse_cache = ScreenshotParseCache(
+    create_kv_store(
+        Config.PARSE_CACHE_BACKEND,
+        "screenshot_parses",
+        Config.CACHE_DB_PATH,
+        max_entries=Config.PARSE_CACHE_MAX_ENTRIES,
+    ),
+    ttl=Config.PARSE_CACHE_TTL_SECONDS,
+    phash_max_distance=Config.PARSE_CACHE_PHASH_MAX_DISTANCE if Config.PARSE_CACHE_PERCEPTUAL else None,
+)
@@ -1,11 +1,14 @@
 """Price service using Tiingo API for stocks, crypto, and forex/gold."""
 
 import requests
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from typing import Optional
 from datetime import datetime, timedelta
-import yfinance as yf
 
 from config import Config
+from services.quote_store import QuoteStore, create_quote_store
 
 
 class PriceError(Exception):
@@ -31,8 +34,12 @@ class PriceService:
         "THB": "thbusd",  # For USD to THB conversion
     }
 
-    def __init__(self):
-        """Initialize the price service."""
+    def __init__(self, quote_store: Optional[QuoteStore] = None):
+        """Initialize the price service.
+
+        Args:
+            quote_store: Optional shared (cross-instance) second-tier quote cache
+        """
         self.api_key = Config.TIINGO_API_KEY
         self.headers = {
             "Authorization": f"Token {self.api_key}",
@@ -41,6 +48,50 @@ class PriceService:
         self._thb_rate_cache: Optional[float] = None
         self._thb_rate_timestamp: Optional[datetime] = None
 
+        # Shared pool for concurrent quote fetches; per-provider semaphores cap
+        # in-flight requests so a large portfolio cannot trip upstream rate limits
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._provider_limits = {
+            "tiingo": threading.BoundedSemaphore(Config.TIINGO_MAX_CONCURRENCY),
+            "yfinance": threading.BoundedSemaphore(Config.YFINANCE_MAX_CONCURRENCY),
+        }
+
+        # Per-ticker quote cache: {TICKER: (price_usd, fetched_at monotonic)}
+        self._quote_cache: dict[str, tuple[float, float]] = {}
+        self._quote_lock = threading.Lock()
+        self._refreshing: set[str] = set()
+        self._refresh_executor: Optional[ThreadPoolExecutor] = None
+        self._cache_stats = {
+            "hits": 0, "stale_hits": 0, "shared_hits": 0, "misses": 0, "refreshes": 0
+        }
+        self.quote_store = quote_store
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Lazy-load the shared quote fetch pool."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=Config.PRICE_FETCH_MAX_WORKERS,
+                    thread_name_prefix="price-fetch",
+                )
+            return self._executor
+
+    @property
+    def refresh_executor(self) -> ThreadPoolExecutor:
+        """Lazy-load the pool for background refreshes and shared-cache writes.
+
+        Kept separate from the fetch pool because a refresh waits on fetch
+        tasks; sharing one pool could starve it.
+        """
+        with self._executor_lock:
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=2, thread_name_prefix="price-refresh"
+                )
+            return self._refresh_executor
+
     def _is_crypto(self, ticker: str) -> bool:
         """Check if ticker is a cryptocurrency."""
         return ticker.upper() in self.CRYPTO_TICKERS
@@ -49,93 +100,253 @@ class PriceService:
         """Check if ticker is in forex/commodities."""
         return ticker.upper() in self.FOREX_TICKERS
 
+    def _get_yfinance_price(self, ticker: str) -> Optional[float]:
+        """Fetch the latest close from yfinance (fallback when Tiingo has no quote)."""
+        ticker = ticker.upper()
+        if self._is_forex(ticker):
+            # Only gold has a yfinance fallback (gold futures)
+            if ticker not in ("GOLD", "XAUUSD"):
+                return None
+            yf_ticker = "GC=F"
+        elif self._is_crypto(ticker):
+            # yfinance uses ticker-USD format for crypto
+            yf_ticker = f"{ticker}-USD"
+        else:
+            yf_ticker = ticker
+
+        # Imported here: yfinance pulls in pandas, which most lookups never need
+        import yfinance as yf
+
+        try:
+            with self._provider_limits["yfinance"]:
+                info = yf.Ticker(yf_ticker).history(period="1d")
+            if not info.empty:
+                return float(info['Close'].iloc[-1])
+        except Exception as e:
+            print(f"yfinance error for {ticker}: {e}")
+
+        return None
+
+    def _tiingo_get(self, path: str, params: Optional[dict] = None) -> Optional[list]:
+        """GET a Tiingo endpoint, returning the decoded JSON list or None."""
+        with self._provider_limits["tiingo"]:
+            response = requests.get(
+                f"{self.BASE_URL}{path}", headers=self.headers, params=params, timeout=10
+            )
+        if response.status_code == 200:
+            return response.json()
+        return None
+
     def _get_stock_price(self, ticker: str) -> Optional[float]:
         """Fetch stock price from IEX endpoint with yfinance fallback."""
         # Try Tiingo first
         try:
-            url = f"{self.BASE_URL}/iex/{ticker.lower()}/prices"
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    return float(data[0].get("last", data[0].get("close", 0)))
+            data = self._tiingo_get(f"/iex/{ticker.lower()}/prices")
+            if data and len(data) > 0:
+                return float(data[0].get("last", data[0].get("close", 0)))
         except Exception as e:
             print(f"Tiingo error for {ticker}: {e}")
         
-        # Fallback to yfinance
-        try:
-            stock = yf.Ticker(ticker)
-            info = stock.history(period="1d")
-            if not info.empty:
-                return float(info['Close'].iloc[-1])
-        except Exception as e:
-            print(f"yfinance error for {ticker}: {e}")
-        
-        return None
+        return self._get_yfinance_price(ticker)
 
     def _get_crypto_price(self, ticker: str) -> Optional[float]:
         """Fetch crypto price from crypto endpoint with yfinance fallback."""
         # Try Tiingo first
         try:
-            crypto_ticker = f"{ticker.lower()}usd"
-            url = f"{self.BASE_URL}/tiingo/crypto/prices"
-            params = {"tickers": crypto_ticker}
-            
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    price_data = data[0].get("priceData", [])
-                    if price_data:
-                        return float(price_data[0].get("close", 0))
+            data = self._tiingo_get("/tiingo/crypto/prices", {"tickers": f"{ticker.lower()}usd"})
+            if data and len(data) > 0:
+                price_data = data[0].get("priceData", [])
+                if price_data:
+                    return float(price_data[0].get("close", 0))
         except Exception as e:
             print(f"Tiingo crypto error for {ticker}: {e}")
         
-        # Fallback to yfinance
-        try:
-            # yfinance uses ticker-USD format for crypto
-            yf_ticker = f"{ticker.upper()}-USD"
-            crypto = yf.Ticker(yf_ticker)
-            info = crypto.history(period="1d")
-            if not info.empty:
-                return float(info['Close'].iloc[-1])
-        except Exception as e:
-            print(f"yfinance crypto error for {ticker}: {e}")
-        
-        return None
+        return self._get_yfinance_price(ticker)
 
     def _get_forex_price(self, ticker: str) -> Optional[float]:
         """Fetch forex/gold price from forex endpoint with yfinance fallback."""
         # Try Tiingo first
         try:
             forex_pair = self.FOREX_TICKERS.get(ticker.upper(), f"{ticker.lower()}usd")
-            url = f"{self.BASE_URL}/tiingo/fx/top?tickers={forex_pair}"
-            
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    bid = float(data[0].get("bidPrice", 0))
-                    ask = float(data[0].get("askPrice", 0))
-                    if bid and ask:
-                        return (bid + ask) / 2
+            data = self._tiingo_get("/tiingo/fx/top", {"tickers": forex_pair})
+            if data and len(data) > 0:
+                bid = float(data[0].get("bidPrice", 0))
+                ask = float(data[0].get("askPrice", 0))
+                if bid and ask:
+                    return (bid + ask) / 2
         except Exception as e:
             print(f"Tiingo forex error for {ticker}: {e}")
         
-        # Fallback to yfinance for GOLD
-        if ticker.upper() in ["GOLD", "XAUUSD"]:
-            try:
-                gold = yf.Ticker("GC=F")  # Gold futures
-                info = gold.history(period="1d")
-                if not info.empty:
-                    return float(info['Close'].iloc[-1])
-            except Exception as e:
-                print(f"yfinance gold error: {e}")
-        
-        return None
+        return self._get_yfinance_price(ticker)
+
+    # ==================== BATCHED TIINGO QUOTES ====================
+
+    def _get_stock_prices_batch(self, tickers: list[str]) -> dict[str, float]:
+        """Fetch many stock quotes with one IEX request (tickers upper-cased)."""
+        prices = {}
+        try:
+            data = self._tiingo_get("/iex/", {"tickers": ",".join(t.lower() for t in tickers)})
+            for item in data or []:
+                ticker = str(item.get("ticker", "")).upper()
+                price = item.get("last") or item.get("tngoLast") or item.get("close")
+                if ticker in tickers and price:
+                    prices[ticker] = float(price)
+        except Exception as e:
+            print(f"Tiingo batch error for {tickers}: {e}")
+        return prices
+
+    def _get_crypto_prices_batch(self, tickers: list[str]) -> dict[str, float]:
+        """Fetch many crypto quotes with one crypto request (tickers upper-cased)."""
+        pairs = {f"{t.lower()}usd": t for t in tickers}
+        prices = {}
+        try:
+            data = self._tiingo_get("/tiingo/crypto/prices", {"tickers": ",".join(pairs)})
+            for item in data or []:
+                ticker = pairs.get(str(item.get("ticker", "")).lower())
+                price_data = item.get("priceData", [])
+                if ticker and price_data and price_data[0].get("close"):
+                    prices[ticker] = float(price_data[0]["close"])
+        except Exception as e:
+            print(f"Tiingo crypto batch error for {tickers}: {e}")
+        return prices
+
+    def _get_forex_prices_batch(self, tickers: list[str]) -> dict[str, float]:
+        """Fetch many forex/gold quotes with one fx/top request (tickers upper-cased)."""
+        pairs: dict[str, list[str]] = {}
+        for t in tickers:
+            pairs.setdefault(self.FOREX_TICKERS.get(t, f"{t.lower()}usd"), []).append(t)
+
+        prices = {}
+        try:
+            data = self._tiingo_get("/tiingo/fx/top", {"tickers": ",".join(pairs)})
+            for item in data or []:
+                bid = float(item.get("bidPrice") or 0)
+                ask = float(item.get("askPrice") or 0)
+                if not (bid and ask):
+                    continue
+                # Several tickers may share a pair (GOLD and XAUUSD -> xauusd)
+                for ticker in pairs.get(str(item.get("ticker", "")).lower(), []):
+                    prices[ticker] = (bid + ask) / 2
+        except Exception as e:
+            print(f"Tiingo forex batch error for {tickers}: {e}")
+        return prices
+
+    def _asset_class(self, ticker: str) -> str:
+        """Classify a ticker as forex (incl. gold), crypto or stock."""
+        if self._is_forex(ticker):
+            return "forex"
+        if self._is_crypto(ticker):
+            return "crypto"
+        return "stock"
+
+    def _group_by_asset_class(self, tickers: list[str]) -> dict[str, list[str]]:
+        """Group upper-cased tickers by the Tiingo endpoint that serves them."""
+        groups: dict[str, list[str]] = {"forex": [], "crypto": [], "stock": []}
+        for ticker in tickers:
+            groups[self._asset_class(ticker)].append(ticker)
+        return {cls: group for cls, group in groups.items() if group}
+
+    # ==================== QUOTE CACHE ====================
+
+    def _cache_ttl(self, ticker: str) -> float:
+        """Seconds a cached quote stays fresh for this ticker's asset class."""
+        return {
+            "crypto": Config.PRICE_TTL_CRYPTO_SECONDS,
+            "stock": Config.PRICE_TTL_STOCK_SECONDS,
+            "forex": Config.PRICE_TTL_GOLD_SECONDS,
+        }[self._asset_class(ticker)]
+
+    def _lookup_cached(
+        self, tickers: list[str]
+    ) -> tuple[dict[str, float], list[str], list[str]]:
+        """Split tickers into cached quotes, the stale subset of those, and misses."""
+        found: dict[str, float] = {}
+        stale: list[str] = []
+        missing: list[str] = []
+        now = time.monotonic()
+        with self._quote_lock:
+            for ticker in tickers:
+                entry = self._quote_cache.get(ticker)
+                age = now - entry[1] if entry else None
+                if entry and age < self._cache_ttl(ticker):
+                    found[ticker] = entry[0]
+                elif entry and age < Config.PRICE_STALE_MAX_SECONDS:
+                    found[ticker] = entry[0]
+                    stale.append(ticker)
+                else:
+                    missing.append(ticker)
+        return found, stale, missing
+
+    def _store_quotes(self, prices: dict[str, float]) -> None:
+        """Record freshly fetched quotes locally and publish them to the shared cache."""
+        now = time.monotonic()
+        with self._quote_lock:
+            for ticker, price in prices.items():
+                self._quote_cache[ticker] = (price, now)
+        if prices and self.quote_store is not None:
+            self.refresh_executor.submit(self._publish_quotes, dict(prices), time.time())
+
+    def _publish_quotes(self, prices: dict[str, float], fetched_at: float) -> None:
+        """Background job: write fetched quotes to the shared cache."""
+        try:
+            self.quote_store.put_quotes(prices, fetched_at, self._thb_rate_cache)
+        except Exception as e:
+            print(f"Shared quote cache write error: {e}")
+
+    def _load_shared(self, tickers: list[str]) -> None:
+        """Copy quotes published by other instances into the local cache.
+
+        Entries keep their original age, so shared quotes expire on the same
+        schedule everywhere. A newer local entry is never overwritten.
+        """
+        if self.quote_store is None or not tickers:
+            return
+        try:
+            shared = self.quote_store.get_quotes(tickers)
+        except Exception as e:
+            print(f"Shared quote cache read error: {e}")
+            return
+
+        now_wall = time.time()
+        now = time.monotonic()
+        with self._quote_lock:
+            for ticker, (price, fetched_at) in shared.items():
+                fetched = now - max(0.0, now_wall - fetched_at)
+                current = self._quote_cache.get(ticker)
+                if current is None or current[1] < fetched:
+                    self._quote_cache[ticker] = (price, fetched)
+
+    def _schedule_refresh(self, tickers: list[str]) -> None:
+        """Refresh stale quotes in the background, at most once per ticker at a time."""
+        with self._quote_lock:
+            pending = [t for t in tickers if t not in self._refreshing]
+            self._refreshing.update(pending)
+            if pending:
+                self._cache_stats["refreshes"] += 1
+        if pending:
+            self.refresh_executor.submit(self._refresh_quotes, pending)
+
+    def _refresh_quotes(self, tickers: list[str]) -> None:
+        """Background job: re-fetch stale quotes and update the cache.
+
+        Tickers another instance already refreshed are taken from the shared
+        cache instead of the upstream provider.
+        """
+        try:
+            self._load_shared(tickers)
+            _, stale, missing = self._lookup_cached(tickers)
+            if stale or missing:
+                self._fetch_prices_usd(stale + missing, Config.PRICE_FETCH_DEADLINE_SECONDS)
+        except Exception as e:
+            print(f"Background price refresh error for {tickers}: {e}")
+        finally:
+            with self._quote_lock:
+                self._refreshing.difference_update(tickers)
+
+    def get_cache_stats(self) -> dict:
+        """Return quote cache counters (hits, stale_hits, shared_hits, misses, refreshes, size)."""
+        with self._quote_lock:
+            return {**self._cache_stats, "size": len(self._quote_cache)}
 
     def get_usd_thb_rate(self) -> float:
         """Get current USD to THB exchange rate with caching.
@@ -147,7 +358,14 @@ class PriceService:
         if (self._thb_rate_cache and self._thb_rate_timestamp and 
             datetime.now() - self._thb_rate_timestamp < timedelta(minutes=5)):
             return self._thb_rate_cache
-        
+        return self.fetch_usd_thb_rate()
+
+    def fetch_usd_thb_rate(self) -> float:
+        """Fetch the USD to THB exchange rate upstream, bypassing (and then refreshing) the cache.
+
+        Raises:
+            PriceError: If unable to fetch exchange rate
+        """
         # Try frankfurter.app (free)
         try:
             url = "https://api.frankfurter.app/latest?from=USD&to=THB"
@@ -199,21 +417,176 @@ class PriceService:
         thb_rate = self.get_usd_thb_rate()
         return price_usd * thb_rate
 
-    def get_prices_thb(self, tickers: list[str]) -> dict[str, float]:
-        """Get prices for multiple tickers in THB.
-        
+    def get_prices_usd(
+        self, tickers: list[str], deadline: Optional[float] = None
+    ) -> dict[str, float]:
+        """Get USD prices for multiple tickers, served from the quote cache when possible.
+
+        Fresh quotes are returned directly. Quotes past their TTL but younger
+        than PRICE_STALE_MAX_SECONDS are returned as-is while a background
+        refresh runs. Local misses are looked up in the shared quote store
+        (if configured) before anything is fetched inline.
+
+        Args:
+            tickers: Tickers to price
+            deadline: Seconds to wait for inline fetches (default PRICE_FETCH_DEADLINE_SECONDS)
+
         Returns:
-            Dict of {ticker: price_thb}, missing tickers are excluded
+            Dict of {ticker: price_usd}, missing or timed-out tickers are excluded
         """
-        prices = {}
-        thb_rate = self.get_usd_thb_rate()  # Fetch once for efficiency
-        
+        if deadline is None:
+            deadline = Config.PRICE_FETCH_DEADLINE_SECONDS
+
+        # Map upper-cased tickers back to every spelling the caller used
+        requested: dict[str, list[str]] = {}
         for ticker in tickers:
-            price_usd = self.get_price_usd(ticker)
+            requested.setdefault(ticker.upper(), []).append(ticker)
+
+        found, stale, local_missing = self._lookup_cached(list(requested))
+        hits = len(found) - len(stale)
+        stale_hits = len(stale)
+
+        missing = local_missing
+        if local_missing and self.quote_store is not None:
+            self._load_shared(local_missing)
+            shared, shared_stale, missing = self._lookup_cached(local_missing)
+            found.update(shared)
+            stale += shared_stale
+
+        with self._quote_lock:
+            self._cache_stats["hits"] += hits
+            self._cache_stats["stale_hits"] += stale_hits
+            self._cache_stats["shared_hits"] += len(local_missing) - len(missing)
+            self._cache_stats["misses"] += len(missing)
+
+        if stale:
+            self._schedule_refresh(stale)
+        if missing:
+            found.update(self._fetch_prices_usd(missing, deadline))
+
+        return {
+            original: price
+            for ticker, price in found.items()
+            for original in requested[ticker]
+        }
+
+    def _fetch_prices_usd(self, tickers: list[str], deadline: float) -> dict[str, float]:
+        """Fetch USD prices for upper-cased tickers with batched, concurrent requests.
+
+        Tickers are grouped by asset class and each class is priced with a
+        single multi-ticker Tiingo request; the (up to three) requests run in
+        parallel. Only tickers missing from those responses fall back to
+        yfinance, again concurrently. Anything still outstanding when the
+        deadline expires is left out (partial result) and finishes in the
+        background, where its quotes are still cached for later requests
+        (late batches are not retried through yfinance). Fetched quotes are
+        stored in the cache.
+
+        Returns:
+            Dict of {TICKER: price_usd}, missing or timed-out tickers are excluded
+        """
+        deadline_at = time.monotonic() + deadline
+        requested = list(dict.fromkeys(tickers))
+
+        batch_fetchers = {
+            "forex": self._get_forex_prices_batch,
+            "crypto": self._get_crypto_prices_batch,
+            "stock": self._get_stock_prices_batch,
+        }
+        groups = self._group_by_asset_class(requested)
+        batch_futures = {
+            self.executor.submit(batch_fetchers[cls], group): group
+            for cls, group in groups.items()
+        }
+        done, not_done = wait(batch_futures, timeout=max(0, deadline_at - time.monotonic()))
+
+        found: dict[str, float] = {}
+        for future in done:
+            try:
+                found.update(future.result())
+            except Exception as e:
+                print(f"Batch price fetch error for {batch_futures[future]}: {e}")
+
+        # Per-ticker yfinance fallback only for tickers the batches came back without
+        answered = {t for future in done for t in batch_futures[future]}
+        missing = [t for t in requested if t in answered and t not in found]
+        fallback_futures = {
+            self.executor.submit(self._get_yfinance_price, ticker): ticker
+            for ticker in missing
+        }
+        fb_done, fb_not_done = wait(
+            fallback_futures, timeout=max(0, deadline_at - time.monotonic())
+        )
+        for future in fb_done:
+            try:
+                price_usd = future.result()
+            except Exception as e:
+                print(f"Price fallback error for {fallback_futures[future]}: {e}")
+                continue
             if price_usd is not None:
-                prices[ticker] = price_usd * thb_rate
-        
-        return prices
+                found[fallback_futures[future]] = price_usd
+
+        timed_out = [t for f in not_done for t in batch_futures[f]]
+        timed_out += [fallback_futures[f] for f in fb_not_done]
+        if timed_out:
+            print(f"⏱️ Price fetch deadline ({deadline}s) exceeded for: {', '.join(timed_out)}")
+            for future in not_done:
+                future.add_done_callback(self._store_late_quotes)
+            for future in fb_not_done:
+                ticker = fallback_futures[future]
+                future.add_done_callback(lambda f, ticker=ticker: self._store_late_quotes(f, ticker))
+
+        self._store_quotes(found)
+        return found
+
+    def _store_late_quotes(self, future: Future, ticker: Optional[str] = None) -> None:
+        """Done callback: cache quotes from a fetch that finished after its deadline.
+
+        Args:
+            future: A batch fetch ({ticker: price}) or, with ticker, a single fallback price
+        """
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Late price fetch error: {e}")
+            return
+        prices = {ticker: result} if ticker is not None else result
+        self._store_quotes({t: p for t, p in (prices or {}).items() if p is not None})
+
+    def get_prices_thb(
+        self, tickers: list[str], deadline: Optional[float] = None
+    ) -> dict[str, float]:
+        """Get prices for multiple tickers in THB.
+
+        The USD/THB rate is fetched alongside the quotes and waited for only
+        until the same deadline; past it, the last known rate is used.
+
+        Returns:
+            Dict of {ticker: price_thb}, missing tickers are excluded
+
+        Raises:
+            PriceError: If the rate is not available by the deadline and none is cached
+        """
+        if deadline is None:
+            deadline = Config.PRICE_FETCH_DEADLINE_SECONDS
+        deadline_at = time.monotonic() + deadline
+
+        # Fetch the rate once, overlapping it with the quote requests
+        rate_future = self.executor.submit(self.get_usd_thb_rate)
+        prices_usd = self.get_prices_usd(tickers, deadline=deadline)
+        try:
+            thb_rate = rate_future.result(timeout=max(0, deadline_at - time.monotonic()))
+        except FutureTimeoutError:
+            thb_rate = self._thb_rate_cache
+            if thb_rate is None:
+                raise PriceError("ไม่สามารถดึงอัตราแลกเปลี่ยน USD/THB ได้ทันเวลา")
+            print(f"⏱️ USD/THB rate deadline ({deadline}s) exceeded, using the last known rate")
+
+        return {
+            ticker: prices_usd[ticker] * thb_rate
+            for ticker in tickers
+            if ticker in prices_usd
+        }
 
     # Legacy method for backward compatibility
     def convert_to_thb(self, amount: float, currency: str) -> float:
@@ -229,4 +602,4 @@ class PriceService:
 
 
 # Singleton instance
-price_service = PriceService()
+price_service = PriceService(quote_store=create_quote_store())
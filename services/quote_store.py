@@ -0,0 +1,113 @@
+"""Second-tier quote caches shared between app instances."""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import Config
+from services.kv_store import KVStore, create_kv_store
+
+
+class QuoteStore(ABC):
+    """Shared store holding the latest USD quote per ticker.
+
+    One instance publishes a freshly fetched quote; every other instance
+    reads it back instead of calling the upstream provider again.
+    """
+
+    @abstractmethod
+    def get_quotes(self, tickers: list[str]) -> dict[str, tuple[float, float]]:
+        """Get {TICKER: (price_usd, fetched_at epoch seconds)} for known tickers."""
+
+    @abstractmethod
+    def put_quotes(
+        self,
+        quotes: dict[str, float],
+        fetched_at: float,
+        usd_thb_rate: Optional[float] = None,
+    ) -> None:
+        """Publish {TICKER: price_usd} fetched at the given epoch time."""
+
+
+class KVQuoteStore(QuoteStore):
+    """Quote store on top of a KVStore (a Cloud Storage bucket or a local SQLite file)."""
+
+    def __init__(self, kv: KVStore, ttl: float):
+        """Entries expire from the store after ttl seconds."""
+        self.kv = kv
+        self.ttl = ttl
+
+    def get_quotes(self, tickers: list[str]) -> dict[str, tuple[float, float]]:
+        return {
+            ticker: (entry["price_usd"], entry["fetched_at"])
+            for ticker, entry in self.kv.get_many(tickers).items()
+        }
+
+    def put_quotes(
+        self,
+        quotes: dict[str, float],
+        fetched_at: float,
+        usd_thb_rate: Optional[float] = None,
+    ) -> None:
+        self.kv.set_many(
+            {
+                ticker: {"price_usd": price, "fetched_at": fetched_at}
+                for ticker, price in quotes.items()
+            },
+            ttl=self.ttl,
+        )
+
+
+class AssetReferenceQuoteStore(QuoteStore):
+    """Quote store backed by the Asset_Reference sheet.
+
+    Rows carry price_usd and an ISO last_updated timestamp; current_price_thb
+    is filled in as well when the USD/THB rate is known.
+    """
+
+    def __init__(self, sheets):
+        """Args: sheets: SheetsService used to read and write Asset_Reference."""
+        self.sheets = sheets
+
+    def get_quotes(self, tickers: list[str]) -> dict[str, tuple[float, float]]:
+        quotes = {}
+        for ticker, record in self.sheets.get_asset_quotes(tickers).items():
+            try:
+                price = float(record.get("price_usd"))
+                fetched_at = datetime.fromisoformat(str(record.get("last_updated"))).timestamp()
+            except (TypeError, ValueError):
+                continue
+            quotes[ticker] = (price, fetched_at)
+        return quotes
+
+    def put_quotes(
+        self,
+        quotes: dict[str, float],
+        fetched_at: float,
+        usd_thb_rate: Optional[float] = None,
+    ) -> None:
+        last_updated = datetime.fromtimestamp(fetched_at, tz=timezone.utc).isoformat()
+        rows = {}
+        for ticker, price in quotes.items():
+            row = {"price_usd": price, "last_updated": last_updated}
+            if usd_thb_rate:
+                row["current_price_thb"] = round(price * usd_thb_rate, 4)
+            rows[ticker] = row
+        self.sheets.upsert_asset_quotes(rows)
+
+
+def create_quote_store() -> Optional[QuoteStore]:
+    """Build the shared quote store selected by QUOTE_CACHE_BACKEND."""
+    backend = Config.QUOTE_CACHE_BACKEND
+    if backend in ("gcs", "sqlite"):
+        return KVQuoteStore(
+            create_kv_store(backend, "quotes", Config.CACHE_DB_PATH),
+            ttl=Config.PRICE_STALE_MAX_SECONDS,
+        )
+    if backend == "sheets":
+        from services.sheets_service import SheetsService, sheets_service
+
+        if not isinstance(sheets_service, SheetsService):
+            sheets_service = SheetsService()
+        return AssetReferenceQuoteStore(sheets_service)
+    return None
@@ -0,0 +1,80 @@
+"""Lazy service registry: service modules are imported on first use.
+
+Several services pull in heavy dependencies at import time (pandas and
+yfinance for prices, pandas-ta for technical analysis, google-genai for
+Gemini). Modules that only need a service on some code paths hold a lazy
+reference instead, so a cold start only pays for what its first request uses.
+"""
+
+import importlib
+from typing import Any
+
+
+# Service name -> module that defines a singleton of the same name
+SERVICE_MODULES = {
+    "ai_insight_service": "services.ai_insight_service",
+    "digest_service": "services.digest_service",
+    "gemini_service": "services.gemini_service",
+    "line_service": "services.line_service",
+    "price_service": "services.price_service",
+    "sheets_service": "services.sheets_service",
+    "ta_service": "services.technical_analysis_service",
+    "valuation_engine": "services.valuation_service",
+}
+
+
+class LazyService:
+    """Stand-in for a service singleton that imports it on first attribute access."""
+
+    def __init__(self, registry: "ServiceRegistry", name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._registry.is_loaded(self._name) else "not loaded"
+        return f"<LazyService {self._name} ({state})>"
+
+
+class ServiceRegistry:
+    """Resolves service singletons by name, importing their module on demand."""
+
+    def __init__(self, modules: dict[str, str]):
+        self._modules = dict(modules)
+        self._instances: dict[str, Any] = {}
+
+    def get(self, name: str) -> Any:
+        """Get a service singleton, importing its module if needed.
+
+        Raises:
+            KeyError: If the service is not registered
+        """
+        instance = self._instances.get(name)
+        if instance is None:
+            # importlib serializes concurrent imports of the same module, so
+            # racing callers all get the one singleton
+            instance = getattr(importlib.import_module(self._modules[name]), name)
+            self._instances[name] = instance
+        return instance
+
+    def lazy(self, name: str) -> LazyService:
+        """Get a proxy that resolves the service the first time it is used."""
+        if name not in self._modules:
+            raise KeyError(name)
+        return LazyService(self, name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def loaded(self) -> list[str]:
+        """Names of the services resolved so far."""
+        return sorted(self._instances)
+
+
+# Singleton instance
+registry = ServiceRegistry(SERVICE_MODULES)
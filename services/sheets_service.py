@@ -1,16 +1,26 @@
 """Google Sheets service for CRUD operations."""
 
 import json
+import threading
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Optional
 
 import gspread
 from google.oauth2.service_account import Credentials
+from gspread.utils import (
+    ValueInputOption,
+    ValueRenderOption,
+    numericise_all,
+    rowcol_to_a1,
+    to_records,
+)
 
 from config import Config
+from services.storage_backend import StorageBackend
 
 
-class SheetsService:
+class SheetsService(StorageBackend):
     """Service for interacting with Google Sheets database."""
 
     SCOPES = [
@@ -22,6 +32,37 @@ class SheetsService:
         """Initialize the Sheets service with credentials."""
         self._client: Optional[gspread.Client] = None
         self._spreadsheet: Optional[gspread.Spreadsheet] = None
+        self._worksheets: dict[str, gspread.Worksheet] = {}
+
+        # Users index: {user_id: (row_num, raw_record)} built from one sheet read
+        self._users_lock = threading.Lock()
+        self._users_index: Optional[dict[str, tuple[int, dict]]] = None
+        self._users_headers: list[str] = []
+        self._users_loaded_at = 0.0
+
+        # Serializes read-modify-write of Holdings rows within this process
+        self._holdings_lock = threading.Lock()
+        # Holdings index: {(user_id, asset): row_num} built from the key columns
+        self._holdings_index_lock = threading.Lock()
+        self._holdings_index: Optional[dict[tuple[str, str], int]] = None
+        self._holdings_loaded_at = 0.0
+        # Users whose ledger has a transaction Holdings missed and whose
+        # holdings_stale flag could not be written either; their reads replay
+        # the ledger until rebuild_holdings runs in this process
+        self._stale_holdings_users: set[str] = set()
+        # Serializes Asset_Reference upserts within this process
+        self._asset_reference_lock = threading.Lock()
+        # Asset_Reference index: {asset_symbol: row_num} plus the header row
+        self._asset_reference_index_lock = threading.Lock()
+        self._asset_reference_index: Optional[dict[str, int]] = None
+        self._asset_reference_headers: list[str] = []
+        self._asset_reference_loaded_at = 0.0
+        # Serializes Digest_Schedule writes within this process
+        self._schedule_lock = threading.Lock()
+        # Digest_Schedule row index: {user_id: (row_num, bucket)} from the key columns
+        self._schedule_index_lock = threading.Lock()
+        self._schedule_index: Optional[dict[str, tuple[int, str]]] = None
+        self._schedule_loaded_at = 0.0
 
     @property
     def client(self) -> gspread.Client:
@@ -49,54 +90,64 @@ class SheetsService:
             self._spreadsheet = self.client.open_by_key(Config.GOOGLE_SHEETS_ID)
         return self._spreadsheet
 
-    # ==================== USERS ====================
+    def _worksheet(self, title: str) -> gspread.Worksheet:
+        """Get a worksheet by title, caching the handle to skip metadata fetches."""
+        sheet = self._worksheets.get(title)
+        if sheet is None:
+            sheet = self.spreadsheet.worksheet(title)
+            self._worksheets[title] = sheet
+        return sheet
 
-    def _parse_user_record(self, record: dict) -> dict:
-        """Parse raw user record fields from Google Sheet, providing sensible defaults."""
-        # Parse target_allocation
-        if record.get("target_allocation"):
-            try:
-                record["target_allocation"] = json.loads(record["target_allocation"])
-            except json.JSONDecodeError:
-                record["target_allocation"] = {}
-        else:
-            record["target_allocation"] = {}
+    def ping(self) -> None:
+        """Fetch only the spreadsheet id, bypassing the worksheet caches."""
+        self.spreadsheet.fetch_sheet_metadata({"fields": "spreadsheetId"})
 
-        # Parse digest fields
-        if "digest_enabled" in record:
-            val = record["digest_enabled"]
-            record["digest_enabled"] = str(val).upper() == "TRUE" or val is True
-        else:
-            record["digest_enabled"] = False
+    # ==================== USERS ====================
 
-        if record.get("digest_assets"):
-            try:
-                record["digest_assets"] = json.loads(record["digest_assets"])
-            except json.JSONDecodeError:
-                record["digest_assets"] = []
-        else:
-            record["digest_assets"] = []
+    def _get_users_index(self) -> tuple[dict[str, tuple[int, dict]], list[str]]:
+        """Return the cached Users index and header row, re-reading the sheet once the TTL expires.
 
-        if "digest_frequency" not in record or not record.get("digest_frequency"):
-            record["digest_frequency"] = "daily"
-        
-        if "digest_time" not in record or not record.get("digest_time"):
-            record["digest_time"] = "07"
-            
-        if "digest_day" not in record or not record.get("digest_day"):
-            record["digest_day"] = "monday"
-            
-        return record
+        The whole tab is fetched with a single read and indexed by user_id,
+        so every lookup within the TTL window is O(1) and costs no API call.
+        Concurrent callers block on the lock instead of issuing duplicate reads.
+        Both are returned from one snapshot so a concurrent invalidation
+        cannot pair an index with an emptied header list.
+        """
+        with self._users_lock:
+            age = time.monotonic() - self._users_loaded_at
+            if self._users_index is not None and age < Config.USERS_CACHE_TTL_SECONDS:
+                return self._users_index, list(self._users_headers)
+
+            rows = self._worksheet("Users").get_all_values()
+            headers = rows[0] if rows else []
+            # Same numericising as get_all_records() so parsed values are unchanged
+            records = to_records(headers, [numericise_all(row) for row in rows[1:]])
+
+            index: dict[str, tuple[int, dict]] = {}
+            for idx, record in enumerate(records):
+                user_id = record.get("user_id")
+                if user_id and user_id not in index:
+                    index[user_id] = (idx + 2, record)  # +1 for header, +1 for 1-indexed
+
+            self._users_index = index
+            self._users_headers = list(headers)
+            self._users_loaded_at = time.monotonic()
+            return index, list(headers)
+
+    def invalidate_users_cache(self) -> None:
+        """Drop the cached Users index so the next lookup re-reads the sheet."""
+        with self._users_lock:
+            self._users_index = None
+            self._users_headers = []
+            self._users_loaded_at = 0.0
 
     def get_user(self, user_id: str) -> Optional[dict]:
         """Get a user by their LINE user ID."""
-        sheet = self.spreadsheet.worksheet("Users")
-        records = sheet.get_all_records()
-
-        for record in records:
-            if record.get("user_id") == user_id:
-                return self._parse_user_record(record)
-        return None
+        index, _ = self._get_users_index()
+        entry = index.get(user_id)
+        if entry is None:
+            return None
+        return self._parse_user_record(dict(entry[1]))
 
     def create_user(
         self,
@@ -108,7 +159,7 @@ class SheetsService:
         onboarding_status: str = "NEW",
     ) -> dict:
         """Create a new user in the Users sheet."""
-        sheet = self.spreadsheet.worksheet("Users")
+        sheet = self._worksheet("Users")
 
         if target_allocation is None:
             target_allocation = {}  # Empty until user sets custom allocation
@@ -125,60 +176,89 @@ class SheetsService:
 
         # Append row to sheet
         sheet.append_row(list(user_data.values()))
+        self.invalidate_users_cache()
 
         # Return with parsed allocation
         user_data["target_allocation"] = target_allocation
         return self._parse_user_record(user_data)
 
     def update_user(self, user_id: str, updates: dict) -> bool:
-        """Update a user's profile."""
-        sheet = self.spreadsheet.worksheet("Users")
-        records = sheet.get_all_records()
+        """Update a user's profile with a single batched write.
 
-        for idx, record in enumerate(records):
-            if record.get("user_id") == user_id:
-                row_num = idx + 2  # +1 for header, +1 for 1-indexed
-
-                # Get column indices
-                headers = sheet.row_values(1)
-
-                # Ensure all update keys exist as headers in the sheet
-                required_headers = ["digest_enabled", "digest_assets", "digest_frequency", "digest_time", "digest_day"]
-                missing_headers = [h for h in required_headers if h not in headers and h in updates]
-                
-                if missing_headers:
-                    # Expand grid columns if needed
-                    current_col_count = sheet.col_count
-                    required_col_count = len(headers) + len(missing_headers)
-                    if required_col_count > current_col_count:
-                        sheet.add_cols(required_col_count - current_col_count)
-
-                    for header in missing_headers:
-                        col_num = len(headers) + 1
-                        sheet.update_cell(1, col_num, header)
-                        headers.append(header)
-
-                for key, value in updates.items():
-                    if key in headers:
-                        col_num = headers.index(key) + 1
-                        # Serialize JSON fields
-                        if key == "target_allocation" and isinstance(value, dict):
-                            value = json.dumps(value)
-                        elif key == "digest_assets" and isinstance(value, list):
-                            value = json.dumps(value)
-                        sheet.update_cell(row_num, col_num, value)
-
-                return True
-        return False
+        Target cells (and any missing digest headers) are resolved against the
+        cached header row and sent as one values batch_update request. Before
+        a header is added, row 1 is re-read in case another instance already
+        added it.
+        """
+        index, headers = self._get_users_index()
+        entry = index.get(user_id)
+        if entry is None:
+            return False
+
+        sheet = self._worksheet("Users")
+        row_num = entry[0]
+
+        # Ensure all update keys exist as headers in the sheet
+        required_headers = [
+            "digest_enabled", "digest_assets", "digest_frequency", "digest_time", "digest_day", "holdings_stale",
+        ]
+        missing_headers = [h for h in required_headers if h not in headers and h in updates]
+        if missing_headers:
+            headers = sheet.row_values(1)
+            missing_headers = [h for h in missing_headers if h not in headers]
+
+        data = []
+        if missing_headers:
+            # Expand grid columns if needed (only ever happens once per sheet)
+            current_col_count = sheet.col_count
+            required_col_count = len(headers) + len(missing_headers)
+            if required_col_count > current_col_count:
+                sheet.add_cols(required_col_count - current_col_count)
+
+            for header in missing_headers:
+                headers.append(header)
+                data.append({
+                    "range": rowcol_to_a1(1, len(headers)),
+                    "values": [[header]],
+                })
+
+        serialized = {}
+        for key, value in updates.items():
+            # Serialize JSON fields
+            if key == "target_allocation" and isinstance(value, dict):
+                value = json.dumps(value)
+            elif key == "digest_assets" and isinstance(value, list):
+                value = json.dumps(value)
+            serialized[key] = value
+
+            if key in headers:
+                col_num = headers.index(key) + 1
+                data.append({
+                    "range": rowcol_to_a1(row_num, col_num),
+                    "values": [[value]],
+                })
+
+        if data:
+            # USER_ENTERED matches the semantics of the previous update_cell calls
+            sheet.batch_update(data, value_input_option=ValueInputOption.user_entered)
+
+        self.invalidate_users_cache()
+
+        if updates.keys() & self.DIGEST_SCHEDULE_FIELDS:
+            merged = self._parse_user_record({**entry[1], **serialized})
+            try:
+                self.set_digest_schedule(user_id, *self._digest_schedule_entry(merged))
+            except Exception as e:
+                # The profile is saved; only the schedule index is behind
+                print(f"❌ Digest_Schedule update failed for {user_id}, run scripts/rebuild_digest_schedule.py: {e}")
+        return True
 
     def get_all_users_with_allocation(self) -> list:
         """Get all users who have target allocations set."""
-        sheet = self.spreadsheet.worksheet("Users")
-        records = sheet.get_all_records()
-        
         users_with_allocation = []
-        for record in records:
-            parsed = self._parse_user_record(record)
+        index, _ = self._get_users_index()
+        for _, record in index.values():
+            parsed = self._parse_user_record(dict(record))
             if parsed.get("target_allocation"):  # Non-empty allocation
                 users_with_allocation.append(parsed)
         
@@ -186,29 +266,154 @@ class SheetsService:
 
     def get_users_for_digest(self) -> list:
         """Get all users with digest enabled."""
-        sheet = self.spreadsheet.worksheet("Users")
-        records = sheet.get_all_records()
-        
         digest_users = []
-        for record in records:
-            parsed = self._parse_user_record(record)
+        index, _ = self._get_users_index()
+        for _, record in index.values():
+            parsed = self._parse_user_record(dict(record))
             if parsed.get("digest_enabled"):
                 digest_users.append(parsed)
         
         return digest_users
 
-    def get_or_create_user(self, user_id: str, display_name: str) -> dict:
-        """Get existing user or create a new one."""
-        user = self.get_user(user_id)
-        if user is None:
-            user = self.create_user(user_id, display_name)
-        return user
+    # ==================== DIGEST SCHEDULE ====================
+
+    def _get_schedule_index(self, refresh: bool = False) -> dict[str, tuple[int, str]]:
+        """Return the cached {user_id: (row_num, bucket)} row index of the Digest_Schedule tab.
+
+        Only the user_id and bucket columns are read to build it, and it is
+        re-read once USERS_CACHE_TTL_SECONDS has passed or when refresh is set.
+
+        Raises:
+            gspread.WorksheetNotFound: If the index has not been built yet
+        """
+        with self._schedule_index_lock:
+            age = time.monotonic() - self._schedule_loaded_at
+            if not refresh and self._schedule_index is not None and age < Config.USERS_CACHE_TTL_SECONDS:
+                return self._schedule_index
+
+            rows = self._worksheet("Digest_Schedule").get("A:B")
+            index = {
+                row[0]: (idx + 1, row[1] if len(row) > 1 else "")
+                for idx, row in enumerate(rows)
+                if idx > 0 and row and row[0]
+            }
+            self._schedule_index = index
+            self._schedule_loaded_at = time.monotonic()
+            return index
+
+    def invalidate_schedule_index(self) -> None:
+        """Drop the cached Digest_Schedule row index so the next lookup re-reads the key columns."""
+        with self._schedule_index_lock:
+            self._schedule_index = None
+            self._schedule_loaded_at = 0.0
+
+    def _read_schedule_at(
+        self, select: Callable[[dict[str, tuple[int, str]]], list[str]], refresh_on_miss: bool = False
+    ) -> dict[str, dict]:
+        """Read the Digest_Schedule rows of the users that select picks from the row index.
+
+        Rows are checked and the index retried as in _read_holdings_at.
+
+        Returns:
+            Dict of {user_id: record with row_num} for selected users that have a row
+        """
+        found: dict[str, dict] = {}
+        for attempt in range(2):
+            loaded_at = self._schedule_loaded_at
+            index = self._get_schedule_index(refresh=attempt > 0)
+            just_loaded = self._schedule_loaded_at != loaded_at
+            wanted = select(index)
+            located = [(user_id, index[user_id][0]) for user_id in wanted if user_id in index]
+
+            found, moved = {}, False
+            if located:
+                columns = self.DIGEST_SCHEDULE_COLUMNS
+                ranges = [f"A{num}:{rowcol_to_a1(num, len(columns))}" for _, num in located]
+                values = self._worksheet("Digest_Schedule").batch_get(ranges)
+                for (user_id, row_num), value_range in zip(located, values):
+                    record = dict(zip(columns, value_range[0] if value_range else []))
+                    if record.get("user_id") != user_id:
+                        moved = True
+                        continue
+                    found[user_id] = {**record, "row_num": row_num}
+
+            missed = refresh_on_miss and not just_loaded and len(located) < len(wanted)
+            if not (moved or missed):
+                break
+        return found
+
+    def set_digest_schedule(self, user_id: str, bucket: Optional[str], assets: list[str]) -> None:
+        """Place a user in a schedule bucket, or remove them when bucket is None.
+
+        The user's row is located through the cached row index, so only that
+        row is read and rewritten. Skipped (with a warning) until the
+        index is built, since a partial index would hide everyone else from
+        the hourly job.
+        """
+        with self._schedule_lock:
+            try:
+                record = self._read_schedule_at(lambda index: [user_id], refresh_on_miss=True).get(user_id)
+            except gspread.WorksheetNotFound:
+                print("⚠️ Digest_Schedule sheet not found, run scripts/rebuild_digest_schedule.py")
+                return
+
+            row_num = record["row_num"] if record is not None else None
+            sheet = self._worksheet("Digest_Schedule")
+
+            if bucket is None:
+                if row_num is not None:
+                    sheet.delete_rows(row_num)
+                    self.invalidate_schedule_index()
+                return
+
+            values = [user_id, bucket, json.dumps(assets), datetime.now().isoformat()]
+            if row_num is None:
+                sheet.append_row(values, value_input_option=ValueInputOption.raw)
+            else:
+                last_col = rowcol_to_a1(row_num, len(values))
+                sheet.update([values], f"A{row_num}:{last_col}", value_input_option=ValueInputOption.raw)
+            self.invalidate_schedule_index()
+
+    def get_digest_schedule(self, buckets: list[str]) -> Optional[list[dict]]:
+        """Get schedule index rows in the given buckets.
+
+        The user_id and bucket columns pick the due users, and only their
+        rows are read, instead of loading and parsing the full Users tab.
+        """
+        wanted = set(buckets)
+        try:
+            records = self._read_schedule_at(
+                lambda index: [user_id for user_id, (_, bucket) in index.items() if bucket in wanted]
+            )
+        except gspread.WorksheetNotFound:
+            return None
+
+        due = []
+        for record in sorted(records.values(), key=lambda r: r["row_num"]):
+            if record.get("bucket") not in wanted:
+                continue
+            try:
+                assets = json.loads(record.get("digest_assets") or "[]")
+            except json.JSONDecodeError:
+                assets = []
+            due.append({"user_id": record["user_id"], "bucket": record["bucket"], "digest_assets": assets})
+        return due
+
+    def replace_digest_schedule(self, rows: list[dict]) -> None:
+        """Replace the whole index with rows of {user_id, bucket, digest_assets}."""
+        now = datetime.now().isoformat()
+        with self._schedule_lock:
+            self.write_table(
+                "Digest_Schedule",
+                self.DIGEST_SCHEDULE_COLUMNS,
+                [[r["user_id"], r["bucket"], json.dumps(r["digest_assets"]), now] for r in rows],
+            )
 
     # ==================== TRANSACTIONS ====================
 
     def append_transaction(self, tx_data: dict) -> str:
-        """Append a transaction to the Transactions sheet."""
-        sheet = self.spreadsheet.worksheet("Transactions")
+        """Append a transaction to the Transactions sheet and update Holdings."""
+        sheet = self._worksheet("Transactions")
 
         # Generate transaction ID
         tx_id = f"TX{datetime.now().strftime('%Y%m%d%H%M%S')}"
@@ -230,64 +435,433 @@ class SheetsService:
         }
 
         sheet.append_row(list(row_data.values()))
+        try:
+            self._apply_to_holdings(row_data)
+        except Exception as e:
+            # The ledger row is written, so the trade is recorded: report
+            # success (a retry would record it twice) and serve this user's
+            # holdings from the ledger until Holdings is rebuilt
+            print(f"❌ Holdings update failed for {tx_id}, run scripts/rebuild_holdings.py: {e}")
+            self._mark_holdings_stale(row_data["user_id"])
         return tx_id
 
     def get_transactions(self, user_id: str) -> list[dict]:
         """Get all transactions for a user."""
-        sheet = self.spreadsheet.worksheet("Transactions")
+        sheet = self._worksheet("Transactions")
         records = sheet.get_all_records()
 
         return [r for r in records if r.get("user_id") == user_id]
 
-    def get_holdings(self, user_id: str) -> dict[str, float]:
-        """Calculate current holdings from transactions."""
-        transactions = self.get_transactions(user_id)
-        holdings: dict[str, float] = {}
+    # ==================== HOLDINGS ====================
 
-        for tx in transactions:
-            asset = tx.get("asset", "")
-            amount = float(tx.get("amount", 0))
-            side = tx.get("side", "BUY").upper()
+    def _read_holdings_rows(self) -> list[tuple[int, dict]]:
+        """Read the Holdings sheet as [(row_num, record)].
 
-            if asset not in holdings:
-                holdings[asset] = 0
+        Unformatted values keep full float precision for quantities.
 
-            if side == "BUY":
-                holdings[asset] += amount
-            elif side == "SELL":
-                holdings[asset] -= amount
+        Raises:
+            gspread.WorksheetNotFound: If the Holdings sheet has not been created
+        """
+        rows = self._worksheet("Holdings").get_all_values(
+            value_render_option=ValueRenderOption.unformatted
+        )
+        if not rows:
+            return []
+        records = to_records(rows[0], rows[1:])
+        return [(idx + 2, record) for idx, record in enumerate(records)]
+
+    def _get_holdings_index(self, refresh: bool = False) -> dict[tuple[str, str], int]:
+        """Return the cached {(user_id, asset): row_num} Holdings index.
+
+        Only the user_id and asset columns are read to build it, and it is
+        re-read once USERS_CACHE_TTL_SECONDS has passed or when refresh is set.
+
+        Raises:
+            gspread.WorksheetNotFound: If the Holdings sheet has not been created
+        """
+        with self._holdings_index_lock:
+            age = time.monotonic() - self._holdings_loaded_at
+            if not refresh and self._holdings_index is not None and age < Config.USERS_CACHE_TTL_SECONDS:
+                return self._holdings_index
+
+            rows = self._worksheet("Holdings").get("A:B")
+            index = {
+                (row[0], row[1]): idx + 1
+                for idx, row in enumerate(rows)
+                if idx > 0 and len(row) >= 2
+            }
+            self._holdings_index = index
+            self._holdings_loaded_at = time.monotonic()
+            return index
+
+    def invalidate_holdings_index(self) -> None:
+        """Drop the cached Holdings index so the next lookup re-reads the key columns."""
+        with self._holdings_index_lock:
+            self._holdings_index = None
+            self._holdings_loaded_at = 0.0
+
+    def _read_holdings_at(
+        self, keys: list[tuple[str, str]], refresh_on_miss: bool = False
+    ) -> dict[tuple[str, str], dict]:
+        """Read the indexed Holdings rows for keys with one request.
+
+        Each row's user_id and asset are checked against its key. If any row
+        has moved (the sheet was rebuilt or edited), or with refresh_on_miss
+        a key is not in a cached index (another process appended it), the
+        index is re-read and the lookup retried once.
 
-        return {k: v for k, v in holdings.items() if v > 0}
+        Returns:
+            Dict of {(user_id, asset): record with row_num} for keys that have a row
+        """
+        found: dict[tuple[str, str], dict] = {}
+        for attempt in range(2):
+            loaded_at = self._holdings_loaded_at
+            index = self._get_holdings_index(refresh=attempt > 0)
+            just_loaded = self._holdings_loaded_at != loaded_at
+            located = [(key, index[key]) for key in keys if key in index]
+
+            found, moved = {}, False
+            if located:
+                ranges = [f"A{num}:{rowcol_to_a1(num, len(self.HOLDINGS_COLUMNS))}" for _, num in located]
+                values = self._worksheet("Holdings").batch_get(
+                    ranges, value_render_option=ValueRenderOption.unformatted
+                )
+                for (key, row_num), value_range in zip(located, values):
+                    record = dict(zip(self.HOLDINGS_COLUMNS, value_range[0] if value_range else []))
+                    if (record.get("user_id"), record.get("asset")) != key:
+                        moved = True
+                        continue
+                    found[key] = {**record, "row_num": row_num}
+
+            missed = refresh_on_miss and not just_loaded and len(located) < len(keys)
+            if not (moved or missed):
+                break
+        return found
+
+    def _apply_to_holdings(self, tx: dict) -> None:
+        """Incrementally update the materialized holding for one new transaction.
+
+        The position's row is located through the Holdings index, so only
+        that row is read and rewritten. A position missing from the index is
+        looked up again on a fresh index before a new row is appended.
+        """
+        key = (tx.get("user_id", ""), tx.get("asset", ""))
+
+        with self._holdings_lock:
+            record = self._read_holdings_at([key], refresh_on_miss=True).get(key)
+
+            holding = {"quantity": 0, "total_thb": 0, "asset_type": tx.get("asset_type", "")}
+            if record is not None:
+                holding = {
+                    "quantity": float(record.get("quantity") or 0),
+                    "total_thb": float(record.get("total_thb") or 0),
+                    "asset_type": record.get("asset_type", ""),
+                }
+
+            self._apply_transaction(holding, tx)
+            values = [
+                key[0],
+                key[1],
+                holding["asset_type"],
+                holding["quantity"],
+                holding["total_thb"],
+                datetime.now().isoformat(),
+            ]
+
+            sheet = self._worksheet("Holdings")
+            if record is None:
+                sheet.append_row(values)
+                self.invalidate_holdings_index()
+            else:
+                row_num = record["row_num"]
+                last_col = rowcol_to_a1(row_num, len(values))
+                sheet.update([values], f"A{row_num}:{last_col}")
+
+    def _mark_holdings_stale(self, user_id: str) -> None:
+        """Flag a user's Holdings rows as behind the ledger until the next rebuild.
+
+        The flag is the holdings_stale column of the user's Users row, so it
+        survives restarts and other instances see it once their Users cache
+        expires. If it cannot be written, this process remembers the user.
+        """
+        try:
+            if self.update_user(user_id, {"holdings_stale": "TRUE"}):
+                return
+        except Exception as e:
+            print(f"❌ Could not flag stale holdings for {user_id}: {e}")
+        self._stale_holdings_users.add(user_id)
+
+    def _stale_holdings_user_ids(self) -> set[str]:
+        """Users whose Holdings rows must not be trusted until rebuild_holdings runs."""
+        index, _ = self._get_users_index()
+        flagged = {
+            user_id for user_id, (_, record) in index.items()
+            if str(record.get("holdings_stale", "")).upper() == "TRUE"
+        }
+        return flagged | self._stale_holdings_users
+
+    def _holdings_from_transactions(self, user_id: str) -> dict[str, dict]:
+        """Calculate holdings by replaying a user's full transaction history."""
+        replayed = self._replay_holdings(self.get_transactions(user_id))
+        return {asset: holding for (_, asset), holding in replayed.items()}
 
     def get_holdings_value(self, user_id: str) -> dict[str, dict]:
-        """Calculate holdings with THB values from transactions.
-        
+        """Get holdings with THB cost basis from the materialized Holdings sheet.
+
+        Only the user's rows (found through the Holdings index) are read.
+        Falls back to replaying Transactions if Holdings has not been built
+        yet, or while the user is flagged holdings_stale (a holdings update
+        failed since the last rebuild).
+
         Returns:
             Dict of {asset: {quantity, total_thb, asset_type}}
         """
-        transactions = self.get_transactions(user_id)
-        holdings: dict[str, dict] = {}
-
-        for tx in transactions:
-            asset = tx.get("asset", "")
-            amount = float(tx.get("amount", 0))
-            total_thb = float(tx.get("total_thb", 0))
-            asset_type = tx.get("asset_type", "")
-            side = tx.get("side", "BUY").upper()
-
-            if asset not in holdings:
-                holdings[asset] = {"quantity": 0, "total_thb": 0, "asset_type": asset_type}
-
-            if side == "BUY":
-                holdings[asset]["quantity"] += amount
-                holdings[asset]["total_thb"] += total_thb
-            elif side == "SELL":
-                holdings[asset]["quantity"] -= amount
-                holdings[asset]["total_thb"] -= total_thb
-
-        # Filter out zero or negative holdings
+        if user_id in self._stale_holdings_user_ids():
+            return self._filter_open(self._holdings_from_transactions(user_id))
+
+        try:
+            keys = [key for key in self._get_holdings_index() if key[0] == user_id]
+            records = self._read_holdings_at(keys)
+        except gspread.WorksheetNotFound:
+            holdings = self._holdings_from_transactions(user_id)
+        else:
+            holdings = {}
+            for (_, asset), record in records.items():
+                holdings[asset] = {
+                    "quantity": float(record.get("quantity") or 0),
+                    "total_thb": float(record.get("total_thb") or 0),
+                    "asset_type": record.get("asset_type", ""),
+                }
+
+        return self._filter_open(holdings)
+
+    @staticmethod
+    def _filter_open(holdings: dict[str, dict]) -> dict[str, dict]:
+        """Filter out zero or negative holdings."""
         return {k: v for k, v in holdings.items() if v["quantity"] > 0}
 
+    def rebuild_holdings(self, verify_only: bool = False) -> dict:
+        """Replay the Transactions ledger and rebuild (or verify) the Holdings sheet.
+
+        Args:
+            verify_only: If True, only report mismatches without writing
+
+        Returns:
+            Dict with positions count and list of mismatched (user_id, asset) rows
+        """
+        with self._holdings_lock:
+            # Flags raised after this point may be missed by the ledger read,
+            # so only the ones seen now are cleared
+            stale_users = self._stale_holdings_user_ids()
+            transactions = self._worksheet("Transactions").get_all_records()
+            expected = self._replay_holdings(transactions)
+
+            try:
+                current = {
+                    (r.get("user_id"), r.get("asset")): r
+                    for _, r in self._read_holdings_rows()
+                }
+            except gspread.WorksheetNotFound:
+                current = {}
+
+            mismatches = self._diff_holdings(expected, current)
+
+            if not verify_only:
+                now = datetime.now().isoformat()
+                rows = [
+                    [user_id, asset, h["asset_type"], h["quantity"], h["total_thb"], now]
+                    for (user_id, asset), h in sorted(expected.items())
+                ]
+                self.write_table("Holdings", self.HOLDINGS_COLUMNS, rows)
+                for user_id in stale_users:
+                    self.update_user(user_id, {"holdings_stale": ""})
+                self._stale_holdings_users -= stale_users
+
+            return {"positions": len(expected), "mismatches": mismatches}
+
+    # ==================== ASSET REFERENCE ====================
+
+    ASSET_REFERENCE_COLUMNS = [
+        "asset_symbol",
+        "asset_name",
+        "current_price_thb",
+        "last_updated",
+        "price_usd",
+    ]
+
+    def _get_asset_reference_index(self, refresh: bool = False) -> tuple[dict[str, int], list[str]]:
+        """Return the cached ({asset_symbol: row_num}, headers) Asset_Reference index.
+
+        Only the header row and the asset_symbol column are read to build it,
+        and it is re-read once USERS_CACHE_TTL_SECONDS has passed or when
+        refresh is set.
+
+        Raises:
+            gspread.WorksheetNotFound: If the Asset_Reference sheet has not been created
+        """
+        with self._asset_reference_index_lock:
+            age = time.monotonic() - self._asset_reference_loaded_at
+            if not refresh and self._asset_reference_index is not None and age < Config.USERS_CACHE_TTL_SECONDS:
+                return self._asset_reference_index, self._asset_reference_headers
+
+            sheet = self._worksheet("Asset_Reference")
+            headers = sheet.row_values(1)
+            index = {}
+            if "asset_symbol" in headers:
+                symbols = sheet.col_values(headers.index("asset_symbol") + 1)
+                index = {symbol: idx + 1 for idx, symbol in enumerate(symbols) if idx > 0 and symbol}
+            self._asset_reference_index = index
+            self._asset_reference_headers = headers
+            self._asset_reference_loaded_at = time.monotonic()
+            return index, headers
+
+    def invalidate_asset_reference_index(self) -> None:
+        """Drop the cached Asset_Reference index so the next lookup re-reads it."""
+        with self._asset_reference_index_lock:
+            self._asset_reference_index = None
+            self._asset_reference_loaded_at = 0.0
+
+    def _read_asset_reference_at(
+        self, symbols: list[str], refresh_on_miss: bool = False
+    ) -> tuple[dict[str, dict], list[str]]:
+        """Read the indexed Asset_Reference rows for symbols with one request.
+
+        Rows are checked and the index retried as in _read_holdings_at.
 
-# Singleton instance
-sheets_service = SheetsService()
+        Returns:
+            Tuple of ({asset_symbol: record with row_num} for symbols that
+            have a row, the sheet's headers)
+        """
+        found: dict[str, dict] = {}
+        headers: list[str] = []
+        for attempt in range(2):
+            loaded_at = self._asset_reference_loaded_at
+            index, headers = self._get_asset_reference_index(refresh=attempt > 0)
+            just_loaded = self._asset_reference_loaded_at != loaded_at
+            located = [(symbol, index[symbol]) for symbol in symbols if symbol in index]
+
+            found, moved = {}, False
+            if located:
+                ranges = [f"A{num}:{rowcol_to_a1(num, len(headers))}" for _, num in located]
+                values = self._worksheet("Asset_Reference").batch_get(
+                    ranges, value_render_option=ValueRenderOption.unformatted
+                )
+                for (symbol, row_num), value_range in zip(located, values):
+                    record = dict(zip(headers, value_range[0] if value_range else []))
+                    if record.get("asset_symbol") != symbol:
+                        moved = True
+                        continue
+                    found[symbol] = {**record, "row_num": row_num}
+
+            missed = refresh_on_miss and not just_loaded and len(located) < len(symbols)
+            if not (moved or missed):
+                break
+        return found, headers
+
+    def get_asset_quotes(self, symbols: list[str]) -> dict[str, dict]:
+        """Read cached quote rows for symbols from the Asset_Reference sheet.
+
+        Only the symbols' rows (found through the Asset_Reference index) are
+        read.
+
+        Returns:
+            Dict of {asset_symbol: record} for symbols that have a row
+        """
+        try:
+            found, _ = self._read_asset_reference_at(list(symbols))
+        except gspread.WorksheetNotFound:
+            return {}
+        return {
+            symbol: {k: v for k, v in record.items() if k != "row_num"}
+            for symbol, record in found.items()
+        }
+
+    def upsert_asset_quotes(self, quotes: dict[str, dict]) -> None:
+        """Create or update Asset_Reference rows, one per symbol.
+
+        Rows are located through the Asset_Reference index, so only the
+        quoted symbols' rows are read. Existing rows are rewritten with one
+        batch_update request and new symbols are appended with one
+        append_rows request.
+
+        Args:
+            quotes: Dict of {asset_symbol: {column: value}}
+        """
+        if not quotes:
+            return
+
+        with self._asset_reference_lock:
+            sheet = self._worksheet("Asset_Reference")
+            existing, headers = self._read_asset_reference_at(list(quotes), refresh_on_miss=True)
+            headers = list(headers)
+
+            data = []
+            missing_headers = [h for h in self.ASSET_REFERENCE_COLUMNS if h not in headers]
+            if missing_headers:
+                if len(headers) + len(missing_headers) > sheet.col_count:
+                    sheet.add_cols(len(headers) + len(missing_headers) - sheet.col_count)
+                for header in missing_headers:
+                    headers.append(header)
+                    data.append({"range": rowcol_to_a1(1, len(headers)), "values": [[header]]})
+
+            new_rows = []
+            for symbol, values in quotes.items():
+                record = existing.get(symbol)
+                if record is None:
+                    record = {**values, "asset_symbol": symbol}
+                    new_rows.append([record.get(h, "") for h in headers])
+                    continue
+                for key, value in values.items():
+                    if key in headers:
+                        data.append({
+                            "range": rowcol_to_a1(record["row_num"], headers.index(key) + 1),
+                            "values": [[value]],
+                        })
+
+            # RAW keeps ISO timestamps as text instead of sheet date serials
+            if data:
+                sheet.batch_update(data, value_input_option=ValueInputOption.raw)
+            if new_rows:
+                sheet.append_rows(new_rows, value_input_option=ValueInputOption.raw)
+            if missing_headers or new_rows:
+                self.invalidate_asset_reference_index()
+
+    # ==================== BULK IMPORT / EXPORT ====================
+
+    def read_table(self, title: str) -> list[dict]:
+        """Read every record of a worksheet (used by storage migrations)."""
+        return self._worksheet(title).get_all_records()
+
+    def write_table(self, title: str, headers: list[str], rows: list[list]) -> None:
+        """Replace a worksheet's contents with a header row and data rows in one write.
+
+        The worksheet is created if it does not exist yet.
+        """
+        try:
+            sheet = self._worksheet(title)
+        except gspread.WorksheetNotFound:
+            sheet = self.spreadsheet.add_worksheet(
+                title=title, rows=max(len(rows) + 1, 1000), cols=len(headers)
+            )
+            self._worksheets[title] = sheet
+
+        sheet.clear()
+        sheet.update([headers] + rows, "A1")
+        if title == "Users":
+            self.invalidate_users_cache()
+        elif title == "Holdings":
+            self.invalidate_holdings_index()
+        elif title == "Asset_Reference":
+            self.invalidate_asset_reference_index()
+        elif title == "Digest_Schedule":
+            self.invalidate_schedule_index()
+
+
+# Singleton instance of the active storage backend. The name is kept for
+# existing callers; STORAGE_BACKEND=sqlite swaps in the local implementation.
+if Config.STORAGE_BACKEND == "sqlite":
+    from services.sqlite_storage import SQLiteStorage
+
+    sheets_service: StorageBackend = SQLiteStorage(Config.SQLITE_DB_PATH)
+else:
+    sheets_service = SheetsService()
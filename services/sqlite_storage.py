@@ -0,0 +1,423 @@
+"""Local SQLite storage backend (WAL mode) implementing the SheetsService API."""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+from services.storage_backend import StorageBackend
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    display_name TEXT NOT NULL DEFAULT '',
+    monthly_budget INTEGER,
+    target_allocation TEXT NOT NULL DEFAULT '',
+    risk_profile TEXT NOT NULL DEFAULT '',
+    onboarding_status TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT '',
+    digest_enabled TEXT NOT NULL DEFAULT '',
+    digest_assets TEXT NOT NULL DEFAULT '',
+    digest_frequency TEXT NOT NULL DEFAULT '',
+    digest_time TEXT NOT NULL DEFAULT '',
+    digest_day TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tx_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL DEFAULT '',
+    asset TEXT NOT NULL DEFAULT '',
+    asset_raw TEXT NOT NULL DEFAULT '',
+    asset_type TEXT NOT NULL DEFAULT '',
+    side TEXT NOT NULL DEFAULT 'BUY',
+    amount REAL NOT NULL DEFAULT 0,
+    price REAL NOT NULL DEFAULT 0,
+    currency TEXT NOT NULL DEFAULT 'THB',
+    total_thb REAL NOT NULL DEFAULT 0,
+    source_app TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions (user_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_asset ON transactions (user_id, asset);
+
+CREATE TABLE IF NOT EXISTS holdings (
+    user_id TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    asset_type TEXT NOT NULL DEFAULT '',
+    quantity REAL NOT NULL DEFAULT 0,
+    total_thb REAL NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user_id, asset)
+);
+
+CREATE TABLE IF NOT EXISTS digest_schedule (
+    user_id TEXT PRIMARY KEY,
+    bucket TEXT NOT NULL,
+    digest_assets TEXT NOT NULL DEFAULT '[]',
+    updated_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_digest_schedule_bucket ON digest_schedule (bucket);
+"""
+
+
+class SQLiteStorage(StorageBackend):
+    """Storage backend backed by a local SQLite database.
+
+    Each thread gets its own connection; WAL mode lets readers proceed while
+    a writer holds the lock. Values are stored in the same textual form as
+    the Google Sheets rows so records parse identically on both backends.
+    """
+
+    def __init__(self, db_path: str):
+        """Open (and create if needed) the database at db_path."""
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        has_schedule = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'digest_schedule'"
+        ).fetchone()
+        conn.executescript(SCHEMA)
+        if has_schedule is None:
+            # Databases created before the schedule index existed
+            self.rebuild_digest_schedule()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes use explicit BEGIN IMMEDIATE transactions
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in a single write transaction."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _serialize_user_value(key: str, value):
+        """Store values the way Google Sheets would render them."""
+        if key in ("target_allocation", "digest_assets") and isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if isinstance(value, bool):
+            return "TRUE" if value else "FALSE"
+        if value is None:
+            return ""
+        return value
+
+    def ping(self) -> None:
+        self._connect().execute("SELECT 1").fetchone()
+
+    # ==================== USERS ====================
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        """Get a user by their LINE user ID."""
+        row = self._connect().execute(
+            "SELECT * FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._parse_user_record(dict(row))
+
+    def create_user(
+        self,
+        user_id: str,
+        display_name: str,
+        monthly_budget: int = 10000,
+        target_allocation: Optional[dict] = None,
+        risk_profile: str = "moderate",
+        onboarding_status: str = "NEW",
+    ) -> dict:
+        """Create a new user."""
+        if target_allocation is None:
+            target_allocation = {}  # Empty until user sets custom allocation
+
+        user_data = {
+            "user_id": user_id,
+            "display_name": display_name,
+            "monthly_budget": monthly_budget,
+            "target_allocation": json.dumps(target_allocation),
+            "risk_profile": risk_profile,
+            "onboarding_status": onboarding_status,
+            "created_at": datetime.now().isoformat(),
+        }
+
+        columns = ", ".join(user_data)
+        placeholders = ", ".join("?" for _ in user_data)
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO users ({columns}) VALUES ({placeholders})",
+                list(user_data.values()),
+            )
+
+        user_data["target_allocation"] = target_allocation
+        return self._parse_user_record(user_data)
+
+    def update_user(self, user_id: str, updates: dict) -> bool:
+        """Update a user's profile. Unknown keys are ignored, as on Sheets."""
+        fields = {
+            key: self._serialize_user_value(key, value)
+            for key, value in updates.items()
+            if key in self.USER_COLUMNS and key != "user_id"
+        }
+
+        with self._transaction() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if exists is None:
+                return False
+            if fields:
+                assignments = ", ".join(f"{key} = ?" for key in fields)
+                conn.execute(
+                    f"UPDATE users SET {assignments} WHERE user_id = ?",
+                    [*fields.values(), user_id],
+                )
+            if fields.keys() & self.DIGEST_SCHEDULE_FIELDS:
+                row = conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+                bucket, assets = self._digest_schedule_entry(self._parse_user_record(dict(row)))
+                self._write_digest_schedule(conn, user_id, bucket, assets)
+        return True
+
+    def get_all_users_with_allocation(self) -> list:
+        """Get all users who have target allocations set."""
+        rows = self._connect().execute(
+            "SELECT * FROM users WHERE target_allocation != '' ORDER BY rowid"
+        ).fetchall()
+        parsed = [self._parse_user_record(dict(row)) for row in rows]
+        return [user for user in parsed if user.get("target_allocation")]
+
+    def get_users_for_digest(self) -> list:
+        """Get all users with digest enabled."""
+        rows = self._connect().execute(
+            "SELECT * FROM users WHERE UPPER(digest_enabled) = 'TRUE' ORDER BY rowid"
+        ).fetchall()
+        return [self._parse_user_record(dict(row)) for row in rows]
+
+    # ==================== DIGEST SCHEDULE ====================
+
+    @staticmethod
+    def _write_digest_schedule(
+        conn: sqlite3.Connection, user_id: str, bucket: Optional[str], assets: list[str]
+    ) -> None:
+        if bucket is None:
+            conn.execute("DELETE FROM digest_schedule WHERE user_id = ?", (user_id,))
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO digest_schedule (user_id, bucket, digest_assets, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (user_id, bucket, json.dumps(assets), datetime.now().isoformat()),
+        )
+
+    def set_digest_schedule(self, user_id: str, bucket: Optional[str], assets: list[str]) -> None:
+        """Place a user in a schedule bucket, or remove them when bucket is None."""
+        with self._transaction() as conn:
+            self._write_digest_schedule(conn, user_id, bucket, assets)
+
+    def get_digest_schedule(self, buckets: list[str]) -> Optional[list[dict]]:
+        """Get schedule index rows in the given buckets (indexed lookup)."""
+        if not buckets:
+            return []
+        rows = self._connect().execute(
+            "SELECT user_id, bucket, digest_assets FROM digest_schedule "
+            f"WHERE bucket IN ({', '.join('?' for _ in buckets)}) ORDER BY user_id",
+            buckets,
+        ).fetchall()
+        return [
+            {"user_id": row["user_id"], "bucket": row["bucket"],
+             "digest_assets": json.loads(row["digest_assets"] or "[]")}
+            for row in rows
+        ]
+
+    def replace_digest_schedule(self, rows: list[dict]) -> None:
+        """Replace the whole index with rows of {user_id, bucket, digest_assets}."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM digest_schedule")
+            for row in rows:
+                self._write_digest_schedule(
+                    conn, row["user_id"], row["bucket"], row["digest_assets"]
+                )
+
+    # ==================== TRANSACTIONS ====================
+
+    def append_transaction(self, tx_data: dict) -> str:
+        """Insert a transaction and update the holding in the same transaction."""
+        tx_id = f"TX{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+        row_data = {
+            "tx_id": tx_id,
+            "user_id": tx_data.get("user_id", ""),
+            "date": tx_data.get("date", datetime.now().strftime("%Y-%m-%d")),
+            "asset": tx_data.get("asset", ""),
+            "asset_raw": tx_data.get("asset_raw", tx_data.get("asset", "")),
+            "asset_type": tx_data.get("asset_type", ""),
+            "side": tx_data.get("side", "BUY"),
+            "amount": tx_data.get("amount", 0),
+            "price": tx_data.get("price", 0),
+            "currency": tx_data.get("currency", "THB"),
+            "total_thb": tx_data.get("total_thb", 0),
+            "source_app": tx_data.get("source_app", ""),
+            "created_at": datetime.now().isoformat(),
+        }
+
+        with self._transaction() as conn:
+            self._insert_transaction(conn, row_data)
+            self._apply_to_holdings(conn, row_data)
+        return tx_id
+
+    def _insert_transaction(self, conn: sqlite3.Connection, row_data: dict) -> None:
+        """Insert one ledger row."""
+        values = [row_data.get(col, "") for col in self.TRANSACTION_COLUMNS]
+        conn.execute(
+            f"INSERT INTO transactions ({', '.join(self.TRANSACTION_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in self.TRANSACTION_COLUMNS)})",
+            values,
+        )
+
+    def _apply_to_holdings(self, conn: sqlite3.Connection, tx: dict) -> None:
+        """Incrementally update the materialized holding for one new transaction."""
+        key = (tx.get("user_id", ""), tx.get("asset", ""))
+        row = conn.execute(
+            "SELECT asset_type, quantity, total_thb FROM holdings WHERE user_id = ? AND asset = ?",
+            key,
+        ).fetchone()
+
+        if row is None:
+            holding = {"quantity": 0, "total_thb": 0, "asset_type": tx.get("asset_type", "")}
+        else:
+            holding = dict(row)
+
+        self._apply_transaction(holding, tx)
+        conn.execute(
+            "INSERT OR REPLACE INTO holdings "
+            "(user_id, asset, asset_type, quantity, total_thb, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, holding["asset_type"], holding["quantity"], holding["total_thb"],
+             datetime.now().isoformat()),
+        )
+
+    def get_transactions(self, user_id: str) -> list[dict]:
+        """Get all transactions for a user."""
+        rows = self._connect().execute(
+            f"SELECT {', '.join(self.TRANSACTION_COLUMNS)} FROM transactions "
+            "WHERE user_id = ? ORDER BY id",
+            (user_id,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    # ==================== HOLDINGS ====================
+
+    def get_holdings_value(self, user_id: str) -> dict[str, dict]:
+        """Get holdings with THB cost basis.
+
+        Returns:
+            Dict of {asset: {quantity, total_thb, asset_type}}
+        """
+        rows = self._connect().execute(
+            "SELECT asset, asset_type, quantity, total_thb FROM holdings "
+            "WHERE user_id = ? AND quantity > 0",
+            (user_id,),
+        ).fetchall()
+        return {
+            row["asset"]: {
+                "quantity": row["quantity"],
+                "total_thb": row["total_thb"],
+                "asset_type": row["asset_type"],
+            }
+            for row in rows
+        }
+
+    def rebuild_holdings(self, verify_only: bool = False) -> dict:
+        """Replay the transactions table and rebuild (or verify) the holdings table."""
+        with self._transaction() as conn:
+            transactions = [
+                dict(row) for row in conn.execute("SELECT * FROM transactions ORDER BY id")
+            ]
+            expected = self._replay_holdings(transactions)
+            current = {
+                (row["user_id"], row["asset"]): dict(row)
+                for row in conn.execute("SELECT * FROM holdings")
+            }
+            mismatches = self._diff_holdings(expected, current)
+
+            if not verify_only:
+                now = datetime.now().isoformat()
+                conn.execute("DELETE FROM holdings")
+                conn.executemany(
+                    "INSERT INTO holdings "
+                    "(user_id, asset, asset_type, quantity, total_thb, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (user_id, asset, h["asset_type"], h["quantity"], h["total_thb"], now)
+                        for (user_id, asset), h in expected.items()
+                    ],
+                )
+
+        return {"positions": len(expected), "mismatches": mismatches}
+
+    # ==================== BULK IMPORT / EXPORT ====================
+
+    def import_records(self, users: list[dict], transactions: list[dict]) -> None:
+        """Replace all users and transactions with the given records, then rebuild holdings.
+
+        Records are the raw rows as read from the Google Sheets tabs.
+        """
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM users")
+            conn.execute("DELETE FROM transactions")
+
+            for record in users:
+                if not record.get("user_id"):
+                    continue
+                values = [
+                    self._serialize_user_value(col, record.get(col, ""))
+                    for col in self.USER_COLUMNS
+                ]
+                conn.execute(
+                    f"INSERT OR REPLACE INTO users ({', '.join(self.USER_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in self.USER_COLUMNS)})",
+                    values,
+                )
+
+            for record in transactions:
+                row_data = dict(record)
+                for col in ("amount", "price", "total_thb"):
+                    row_data[col] = float(row_data.get(col) or 0)
+                self._insert_transaction(conn, row_data)
+
+        self.rebuild_holdings()
+        self.rebuild_digest_schedule()
+
+    def export_table(self, table: str) -> tuple[list[str], list[list]]:
+        """Export a table as (headers, rows) in Google Sheets column order."""
+        columns = {
+            "users": self.USER_COLUMNS,
+            "transactions": self.TRANSACTION_COLUMNS,
+            "holdings": self.HOLDINGS_COLUMNS,
+            "digest_schedule": self.DIGEST_SCHEDULE_COLUMNS,
+        }[table]
+        order = "id" if table == "transactions" else "rowid"
+        rows = self._connect().execute(
+            f"SELECT {', '.join(columns)} FROM {table} ORDER BY {order}"
+        ).fetchall()
+        return list(columns), [list(row) for row in rows]
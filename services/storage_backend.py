@@ -0,0 +1,257 @@
+"""Storage backend interface shared by the Google Sheets and SQLite implementations."""
+
+import json
+import math
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from services.digest_schedule import resolve_digest_assets, schedule_bucket
+
+
+class StorageBackend(ABC):
+    """Persistence API used by handlers and services.
+
+    Implementations store users, the transaction ledger and materialized
+    holdings. Records are returned in the same shape as the Google Sheets
+    rows so callers do not depend on which backend is active.
+    """
+
+    # Column order for users, transactions and holdings (mirrors scripts/setup_sheets.py)
+    USER_COLUMNS = [
+        "user_id",
+        "display_name",
+        "monthly_budget",
+        "target_allocation",
+        "risk_profile",
+        "onboarding_status",
+        "created_at",
+        "digest_enabled",
+        "digest_assets",
+        "digest_frequency",
+        "digest_time",
+        "digest_day",
+    ]
+    TRANSACTION_COLUMNS = [
+        "tx_id",
+        "user_id",
+        "date",
+        "asset",
+        "asset_raw",
+        "asset_type",
+        "side",
+        "amount",
+        "price",
+        "currency",
+        "total_thb",
+        "source_app",
+        "created_at",
+    ]
+    HOLDINGS_COLUMNS = ["user_id", "asset", "asset_type", "quantity", "total_thb", "updated_at"]
+    DIGEST_SCHEDULE_COLUMNS = ["user_id", "bucket", "digest_assets", "updated_at"]
+
+    # update_user keys that can move a user between digest schedule buckets
+    DIGEST_SCHEDULE_FIELDS = {
+        "digest_enabled",
+        "digest_assets",
+        "digest_frequency",
+        "digest_time",
+        "digest_day",
+        "target_allocation",
+    }
+
+    @abstractmethod
+    def ping(self) -> None:
+        """Make the cheapest possible round trip to the store; raises if it is unreachable."""
+
+    # ==================== USERS ====================
+
+    @abstractmethod
+    def get_user(self, user_id: str) -> Optional[dict]:
+        """Get a user by their LINE user ID."""
+
+    @abstractmethod
+    def create_user(
+        self,
+        user_id: str,
+        display_name: str,
+        monthly_budget: int = 10000,
+        target_allocation: Optional[dict] = None,
+        risk_profile: str = "moderate",
+        onboarding_status: str = "NEW",
+    ) -> dict:
+        """Create a new user."""
+
+    @abstractmethod
+    def update_user(self, user_id: str, updates: dict) -> bool:
+        """Update a user's profile. Returns False if the user does not exist."""
+
+    @abstractmethod
+    def get_all_users_with_allocation(self) -> list:
+        """Get all users who have target allocations set."""
+
+    @abstractmethod
+    def get_users_for_digest(self) -> list:
+        """Get all users with digest enabled."""
+
+    def get_or_create_user(self, user_id: str, display_name: str) -> dict:
+        """Get existing user or create a new one."""
+        user = self.get_user(user_id)
+        if user is None:
+            user = self.create_user(user_id, display_name)
+        return user
+
+    def _parse_user_record(self, record: dict) -> dict:
+        """Parse raw user record fields from storage, providing sensible defaults."""
+        # Parse target_allocation
+        if record.get("target_allocation"):
+            try:
+                record["target_allocation"] = json.loads(record["target_allocation"])
+            except json.JSONDecodeError:
+                record["target_allocation"] = {}
+        else:
+            record["target_allocation"] = {}
+
+        # Parse digest fields
+        if "digest_enabled" in record:
+            val = record["digest_enabled"]
+            record["digest_enabled"] = str(val).upper() == "TRUE" or val is True
+        else:
+            record["digest_enabled"] = False
+
+        if record.get("digest_assets"):
+            try:
+                record["digest_assets"] = json.loads(record["digest_assets"])
+            except json.JSONDecodeError:
+                record["digest_assets"] = []
+        else:
+            record["digest_assets"] = []
+
+        if "digest_frequency" not in record or not record.get("digest_frequency"):
+            record["digest_frequency"] = "daily"
+        
+        if "digest_time" not in record or not record.get("digest_time"):
+            record["digest_time"] = "07"
+            
+        if "digest_day" not in record or not record.get("digest_day"):
+            record["digest_day"] = "monday"
+            
+        return record
+
+    # ==================== DIGEST SCHEDULE ====================
+
+    @abstractmethod
+    def set_digest_schedule(self, user_id: str, bucket: Optional[str], assets: list[str]) -> None:
+        """Place a user in a schedule bucket, or remove them when bucket is None."""
+
+    @abstractmethod
+    def get_digest_schedule(self, buckets: list[str]) -> Optional[list[dict]]:
+        """Get schedule index rows in the given buckets.
+
+        Returns:
+            List of {user_id, bucket, digest_assets}, or None if the index has
+            not been built (callers then fall back to scanning all users)
+        """
+
+    @abstractmethod
+    def replace_digest_schedule(self, rows: list[dict]) -> None:
+        """Replace the whole index with rows of {user_id, bucket, digest_assets}."""
+
+    @staticmethod
+    def _digest_schedule_entry(user: dict) -> tuple[Optional[str], list[str]]:
+        """Get (bucket, resolved assets) for a parsed user record."""
+        try:
+            assets = resolve_digest_assets(user)
+        except ValueError:
+            assets = []
+        return schedule_bucket(user), assets
+
+    def rebuild_digest_schedule(self) -> int:
+        """Rebuild the schedule index from the Users table.
+
+        Returns:
+            Number of users placed in a bucket
+        """
+        rows = []
+        for user in self.get_users_for_digest():
+            bucket, assets = self._digest_schedule_entry(user)
+            if bucket:
+                rows.append({"user_id": user["user_id"], "bucket": bucket, "digest_assets": assets})
+        self.replace_digest_schedule(rows)
+        return len(rows)
+
+    # ==================== TRANSACTIONS ====================
+
+    @abstractmethod
+    def append_transaction(self, tx_data: dict) -> str:
+        """Append a transaction to the ledger and update holdings. Returns tx_id."""
+
+    @abstractmethod
+    def get_transactions(self, user_id: str) -> list[dict]:
+        """Get all transactions for a user."""
+
+    # ==================== HOLDINGS ====================
+
+    @abstractmethod
+    def get_holdings_value(self, user_id: str) -> dict[str, dict]:
+        """Get holdings with THB cost basis.
+
+        Returns:
+            Dict of {asset: {quantity, total_thb, asset_type}}
+        """
+
+    @abstractmethod
+    def rebuild_holdings(self, verify_only: bool = False) -> dict:
+        """Replay the transaction ledger and rebuild (or verify) holdings.
+
+        Returns:
+            Dict with positions count and list of mismatched (user_id, asset) rows
+        """
+
+    def get_holdings(self, user_id: str) -> dict[str, float]:
+        """Get current holding quantities for a user."""
+        return {k: v["quantity"] for k, v in self.get_holdings_value(user_id).items()}
+
+    @staticmethod
+    def _apply_transaction(holding: dict, tx: dict) -> None:
+        """Apply a single BUY/SELL transaction to a running holding in place."""
+        amount = float(tx.get("amount", 0) or 0)
+        total_thb = float(tx.get("total_thb", 0) or 0)
+        side = str(tx.get("side", "BUY")).upper()
+
+        if side == "BUY":
+            holding["quantity"] += amount
+            holding["total_thb"] += total_thb
+        elif side == "SELL":
+            holding["quantity"] -= amount
+            holding["total_thb"] -= total_thb
+
+    def _replay_holdings(self, transactions: list[dict]) -> dict[tuple[str, str], dict]:
+        """Replay a transaction ledger into {(user_id, asset): holding}."""
+        holdings: dict[tuple[str, str], dict] = {}
+        for tx in transactions:
+            key = (tx.get("user_id", ""), tx.get("asset", ""))
+            if key not in holdings:
+                holdings[key] = {"quantity": 0, "total_thb": 0, "asset_type": tx.get("asset_type", "")}
+            self._apply_transaction(holdings[key], tx)
+        return holdings
+
+    @staticmethod
+    def _diff_holdings(
+        expected: dict[tuple[str, str], dict], current: dict[tuple[str, str], dict]
+    ) -> list[dict]:
+        """List positions where materialized holdings disagree with the replayed ledger."""
+        mismatches = []
+        for key in sorted(set(expected) | set(current)):
+            exp = expected.get(key)
+            cur = current.get(key)
+            if exp is None or cur is None or not (
+                math.isclose(exp["quantity"], float(cur.get("quantity") or 0), abs_tol=1e-9)
+                and math.isclose(exp["total_thb"], float(cur.get("total_thb") or 0), abs_tol=1e-6)
+            ):
+                mismatches.append({
+                    "user_id": key[0],
+                    "asset": key[1],
+                    "expected": exp,
+                    "materialized": cur,
+                })
+        return mismatches
@@ -7,6 +7,8 @@ import pandas_ta as ta
 import yfinance as yf
 from typing import Optional
 
+from config import Config
+from services.ohlcv_store import OHLCVStore
 from services.price_service import PriceService
 
 logger = logging.getLogger(__name__)
@@ -21,6 +23,15 @@ class TechnicalAnalysisService:
         "XAU": "GC=F",
     }
 
+    def __init__(self, ohlcv_store: Optional[OHLCVStore] = None):
+        """Initialize the service.
+
+        Args:
+            ohlcv_store: Optional local candle store; without it every call
+                downloads the full history from yfinance
+        """
+        self.ohlcv_store = ohlcv_store
+
     def get_yf_symbol(self, ticker: str) -> str:
         """Map user ticker to yfinance symbol."""
         ticker_upper = ticker.upper().strip()
@@ -41,11 +52,14 @@ class TechnicalAnalysisService:
         yf_symbol = self.get_yf_symbol(ticker)
         logger.info(f"Computing indicators for ticker: {ticker} (yfinance: {yf_symbol})")
 
-        ticker_obj = yf.Ticker(yf_symbol)
-        df = ticker_obj.history(period="1y")
+        if self.ohlcv_store is not None:
+            df = self.ohlcv_store.get_history(yf_symbol, days=365, min_bars=50)
+        else:
+            ticker_obj = yf.Ticker(yf_symbol)
+            df = ticker_obj.history(period="1y")
 
-        if df.empty or len(df) < 50:
-            df = ticker_obj.history(period="2y")
+            if df.empty or len(df) < 50:
+                df = ticker_obj.history(period="2y")
 
         if df.empty:
             raise ValueError(f"No historical data found for {yf_symbol}")
@@ -209,9 +223,30 @@ class TechnicalAnalysisService:
 
         return bearish_div, bullish_div
 
-    def _compute_volume_profile(self, df: pd.DataFrame, price: float) -> dict:
-        """Compute Volume Profile (VRVP) from the last 60 days of data."""
-        vp_df = df.iloc[-60:]
+    def _compute_volume_profile(
+        self,
+        df: pd.DataFrame,
+        price: float,
+        lookback: Optional[int] = None,
+        num_bins: Optional[int] = None,
+        distribution: Optional[str] = None,
+    ) -> dict:
+        """Compute Volume Profile (VRVP) over the last `lookback` bars.
+
+        Args:
+            df: OHLCV dataframe
+            price: Current price
+            lookback: Bars to include (default VP_LOOKBACK_BARS, 60)
+            num_bins: Price bins (default VP_NUM_BINS, 50)
+            distribution: "uniform" splits a bar's volume equally across every
+                bin its range touches; "proportional" weights each bin by the
+                share of the bar's range it covers (default VP_DISTRIBUTION)
+        """
+        lookback = lookback or Config.VP_LOOKBACK_BARS
+        num_bins = num_bins or Config.VP_NUM_BINS
+        distribution = distribution or Config.VP_DISTRIBUTION
+
+        vp_df = df.iloc[-lookback:]
         min_p = float(vp_df["Low"].min())
         max_p = float(vp_df["High"].max())
 
@@ -227,48 +262,34 @@ class TechnicalAnalysisService:
                 }
             }
 
-        num_bins = 50
-        bins = np.zeros(num_bins)
         bin_edges = np.linspace(min_p, max_p, num_bins + 1)
         bin_centers = bin_edges[:-1] + (max_p - min_p) / (2 * num_bins)
         bin_width = (max_p - min_p) / num_bins
 
-        for _, row in vp_df.iterrows():
-            high = row["High"]
-            low = row["Low"]
-            vol = row["Volume"]
-            if pd.isna(high) or pd.isna(low) or pd.isna(vol) or vol <= 0:
-                continue
-
-            if high == low:
-                bin_idx = min(max(0, int((low - min_p) / bin_width)), num_bins - 1)
-                bins[bin_idx] += vol
-            else:
-                overlap_indices = []
-                for i in range(num_bins):
-                    if bin_edges[i] <= high and bin_edges[i+1] >= low:
-                        overlap_indices.append(i)
-                if overlap_indices:
-                    val_per_bin = vol / len(overlap_indices)
-                    for i in overlap_indices:
-                        bins[i] += val_per_bin
+        bins = self._volume_by_bin(
+            vp_df["High"].to_numpy(dtype=float),
+            vp_df["Low"].to_numpy(dtype=float),
+            vp_df["Volume"].to_numpy(dtype=float),
+            bin_edges,
+            distribution,
+        )
 
         poc_idx = int(np.argmax(bins))
         poc_price = float(bin_centers[poc_idx])
 
         # High Volume Nodes (HVNs): volume >= 80% of max volume (POC volume)
         hvn_threshold = 0.8 * bins[poc_idx] if bins[poc_idx] > 0 else 0
-        hvn_indices = [i for i, v in enumerate(bins) if v >= hvn_threshold]
+        hvn_centers = bin_centers[bins >= hvn_threshold]
 
         immediate_support_hvn = min_p
         immediate_resistance_hvn = max_p
 
-        support_candidates = [bin_centers[i] for i in hvn_indices if bin_centers[i] < price]
-        if support_candidates:
+        support_candidates = hvn_centers[hvn_centers < price]
+        if support_candidates.size:
             immediate_support_hvn = float(support_candidates[-1])
 
-        resistance_candidates = [bin_centers[i] for i in hvn_indices if bin_centers[i] > price]
-        if resistance_candidates:
+        resistance_candidates = hvn_centers[hvn_centers > price]
+        if resistance_candidates.size:
             immediate_resistance_hvn = float(resistance_candidates[0])
 
         # Liquidity Gap (LVN): >= 3 consecutive bins with volume <= 20% of max volume between price and POC
@@ -278,22 +299,11 @@ class TechnicalAnalysisService:
         start_idx = min(price_bin_idx, poc_idx)
         end_idx = max(price_bin_idx, poc_idx)
 
-        consecutive_lvn = []
-        max_consecutive_lvn = []
+        run_start, run_len = self._longest_run(bins[start_idx:end_idx + 1] <= lvn_threshold)
 
-        for i in range(start_idx, end_idx + 1):
-            if bins[i] <= lvn_threshold:
-                consecutive_lvn.append(i)
-            else:
-                if len(consecutive_lvn) > len(max_consecutive_lvn):
-                    max_consecutive_lvn = list(consecutive_lvn)
-                consecutive_lvn = []
-        if len(consecutive_lvn) > len(max_consecutive_lvn):
-            max_consecutive_lvn = list(consecutive_lvn)
-
-        gap_detected = len(max_consecutive_lvn) >= 3
-        gap_start = float(bin_edges[max_consecutive_lvn[0]]) if gap_detected else 0.0
-        gap_end = float(bin_edges[max_consecutive_lvn[-1] + 1]) if gap_detected else 0.0
+        gap_detected = run_len >= 3
+        gap_start = float(bin_edges[start_idx + run_start]) if gap_detected else 0.0
+        gap_end = float(bin_edges[start_idx + run_start + run_len]) if gap_detected else 0.0
 
         return {
             "point_of_control_price": poc_price,
@@ -306,6 +316,66 @@ class TechnicalAnalysisService:
             }
         }
 
+    @staticmethod
+    def _volume_by_bin(
+        high: np.ndarray,
+        low: np.ndarray,
+        volume: np.ndarray,
+        bin_edges: np.ndarray,
+        distribution: str = "uniform",
+    ) -> np.ndarray:
+        """Distribute each bar's volume over the price bins its range overlaps.
+
+        Builds a (bars x bins) weight matrix by broadcasting and sums it down
+        the bar axis. Rows are added in bar order, so uniform mode reproduces
+        the per-bar loop bit for bit (equal bins stay exactly equal for POC
+        ties). Bars with NaN prices/volume or volume <= 0 are skipped; zero
+        range bars put all volume in the bin containing their price.
+        """
+        if distribution not in ("uniform", "proportional"):
+            raise ValueError(f"Unknown volume distribution: {distribution}")
+
+        num_bins = len(bin_edges) - 1
+        min_p = bin_edges[0]
+        bin_width = (bin_edges[-1] - min_p) / num_bins
+        lower = bin_edges[:-1][np.newaxis, :]
+        upper = bin_edges[1:][np.newaxis, :]
+        high_col = high[:, np.newaxis]
+        low_col = low[:, np.newaxis]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            valid = ~(np.isnan(high) | np.isnan(low) | np.isnan(volume)) & (volume > 0)
+            point = valid & (high == low)
+            ranged = valid & ~point
+
+            if distribution == "uniform":
+                overlap = ((lower <= high_col) & (upper >= low_col)).astype(float)
+                counts = overlap.sum(axis=1, keepdims=True)
+                weights = overlap * (volume[:, np.newaxis] / counts)
+            else:
+                covered = np.minimum(upper, high_col) - np.maximum(lower, low_col)
+                weights = np.clip(covered, 0, None) * (volume / (high - low))[:, np.newaxis]
+
+            weights = np.where(ranged[:, np.newaxis], weights, 0.0)
+
+            point_idx = np.clip(((low - min_p) / bin_width), 0, num_bins - 1)
+            point_idx = np.nan_to_num(point_idx).astype(int)
+            point_rows = np.flatnonzero(point)
+            weights[point_rows, point_idx[point_rows]] = volume[point_rows]
+
+        return weights.sum(axis=0)
+
+    @staticmethod
+    def _longest_run(mask: np.ndarray) -> tuple[int, int]:
+        """Return (start, length) of the first longest run of True values."""
+        if not mask.any():
+            return 0, 0
+        padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(padded))
+        starts, ends = edges[::2], edges[1::2]
+        longest = int(np.argmax(ends - starts))
+        return int(starts[longest]), int(ends[longest] - starts[longest])
+
     def _compute_fibonacci(self, df: pd.DataFrame) -> dict:
         """Compute Fibonacci Retracement levels from swing high/low in last 120 bars."""
         swing_df = df.iloc[-120:]
@@ -363,4 +433,8 @@ class TechnicalAnalysisService:
 
 
 # Singleton instance
-ta_service = TechnicalAnalysisService()
+ta_service = TechnicalAnalysisService(
+    ohlcv_store=OHLCVStore(Config.OHLCV_DB_PATH, Config.OHLCV_REFRESH_SECONDS)
+    if Config.OHLCV_DB_PATH
+    else None
+)
@@ -0,0 +1,157 @@
+"""Portfolio valuation shared by the status, report, DCA and rebalance commands."""
+
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from config import Config
+from models.portfolio import AssetValuation, PortfolioSnapshot
+from services.registry import registry
+from services.sheets_service import sheets_service
+from utils.flex_messages import FlexMessages
+
+
+class PortfolioValuationEngine:
+    """Values users' holdings at market prices and memoizes the snapshots.
+
+    A snapshot is reused for Config.VALUATION_CACHE_TTL_SECONDS, so commands
+    issued back to back cost one holdings read and one price fetch. Recording
+    a transaction invalidates the user's snapshot.
+    """
+
+    def __init__(self, ttl: float):
+        """Initialize the engine.
+
+        Args:
+            ttl: Seconds a snapshot is reused (0 disables memoization)
+        """
+        self.ttl = ttl
+        self._snapshots: dict[str, tuple[PortfolioSnapshot, float]] = {}
+        self._lock = threading.Lock()
+
+    def get_snapshot(self, user_id: str, require_prices: bool = False) -> PortfolioSnapshot:
+        """Get the valuation of one user's portfolio.
+
+        Args:
+            user_id: LINE user ID
+            require_prices: Raise instead of leaving unpriced holdings out
+
+        Raises:
+            PriceError: If require_prices is set and a holding has no price
+        """
+        snapshot = self._cached(user_id)
+        if snapshot is None:
+            snapshot = self._value({user_id: sheets_service.get_holdings_value(user_id)})[user_id]
+        if require_prices and snapshot.missing:
+            from services.price_service import PriceError
+
+            raise PriceError(f"ไม่สามารถดึงราคา: {', '.join(snapshot.missing)}")
+        return snapshot
+
+    def get_snapshots(self, user_ids: list[str]) -> tuple[dict[str, PortfolioSnapshot], dict[str, str]]:
+        """Value many portfolios with one price fetch for the union of their tickers.
+
+        Returns:
+            ({user_id: snapshot}, {user_id: error}) for users whose holdings
+            could not be read
+
+        Raises:
+            PriceError: If the price fetch fails
+        """
+        snapshots: dict[str, PortfolioSnapshot] = {}
+        holdings_by_user: dict[str, dict] = {}
+        errors: dict[str, str] = {}
+        for user_id in user_ids:
+            cached = self._cached(user_id)
+            if cached is not None:
+                snapshots[user_id] = cached
+                continue
+            try:
+                holdings_by_user[user_id] = sheets_service.get_holdings_value(user_id)
+            except Exception as e:
+                errors[user_id] = str(e)
+
+        if holdings_by_user:
+            snapshots.update(self._value(holdings_by_user))
+        return snapshots, errors
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Drop one user's memoized snapshot, or every snapshot."""
+        with self._lock:
+            if user_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(user_id, None)
+
+    def _cached(self, user_id: str) -> Optional[PortfolioSnapshot]:
+        with self._lock:
+            entry = self._snapshots.get(user_id)
+            if entry is None:
+                return None
+            snapshot, valued_at = entry
+            if time.monotonic() - valued_at >= self.ttl:
+                del self._snapshots[user_id]
+                return None
+            return snapshot
+
+    def _value(self, holdings_by_user: dict[str, dict]) -> dict[str, PortfolioSnapshot]:
+        """Price the holdings of every user with a single fetch and memoize the results.
+
+        Nothing is fetched when no user has holdings, so empty portfolios
+        still get a snapshot (with no USD/THB rate) during a price outage.
+        """
+        price_service = registry.get("price_service")
+
+        tickers = sorted({ticker for holdings in holdings_by_user.values() for ticker in holdings})
+        prices = price_service.get_prices_thb(tickers) if tickers else {}
+        usd_thb_rate = price_service.get_usd_thb_rate() if tickers else None
+
+        valued_at = time.monotonic()
+        snapshots = {}
+        for user_id, holdings in holdings_by_user.items():
+            snapshot = self._build_snapshot(user_id, holdings, prices, usd_thb_rate)
+            snapshots[user_id] = snapshot
+            # Partially priced snapshots are not reused; the next call retries
+            if not snapshot.missing and self.ttl > 0:
+                with self._lock:
+                    self._snapshots[user_id] = (snapshot, valued_at)
+        return snapshots
+
+    @staticmethod
+    def _build_snapshot(
+        user_id: str, holdings: dict, prices: dict[str, float], usd_thb_rate: Optional[float]
+    ) -> PortfolioSnapshot:
+        priced = [ticker for ticker in holdings if ticker in prices]
+        values = {ticker: holdings[ticker]["quantity"] * prices[ticker] for ticker in priced}
+        total_value = sum(values.values())
+
+        assets = []
+        for ticker in priced:
+            data = holdings[ticker]
+            cost = data["total_thb"]
+            pl_amount = values[ticker] - cost
+            assets.append(AssetValuation(
+                ticker=ticker,
+                asset_type=data.get("asset_type") or FlexMessages.get_asset_type(ticker),
+                quantity=data["quantity"],
+                price=prices[ticker],
+                value=values[ticker],
+                cost=cost,
+                pl_amount=pl_amount,
+                pl_percent=(pl_amount / cost * 100) if cost > 0 else 0,
+                percentage=(values[ticker] / total_value * 100) if total_value > 0 else 0,
+            ))
+
+        return PortfolioSnapshot(
+            user_id=user_id,
+            assets=tuple(assets),
+            missing=tuple(ticker for ticker in holdings if ticker not in prices),
+            quantities={ticker: data["quantity"] for ticker, data in holdings.items()},
+            usd_thb_rate=usd_thb_rate,
+            valued_at=datetime.now(),
+        )
+
+
+# Singleton instance
+valuation_engine = PortfolioValuationEngine(ttl=Config.VALUATION_CACHE_TTL_SECONDS)
@@ -0,0 +1,111 @@
+"""De-duplication of LINE webhook events by webhookEventId."""
+
+import logging
+import threading
+from typing import Optional
+
+from config import Config
+from services.kv_store import KVStore, create_kv_store
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookDeduplicator:
+    """Records seen webhookEventIds so redelivered events are processed once.
+
+    LINE redelivers an event with the same webhookEventId when our response
+    was slow or failed. An event is claimed when it is accepted for
+    processing; a claim can be released if the request is then refused, so
+    LINE's next redelivery goes through.
+
+    Claims are only seen by instances sharing the store: with the gcs
+    backend every instance sees them and they survive restarts; a local
+    SQLite file or memory store only covers its own instance.
+    """
+
+    # Expired claims are purged from the store every N claims
+    PURGE_EVERY = 1000
+
+    def __init__(self, store: Optional[KVStore], ttl: float):
+        """Initialize the deduplicator.
+
+        Args:
+            store: Claim store (None disables de-duplication)
+            ttl: Seconds an event id is remembered
+        """
+        self.store = store
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {"accepted": 0, "duplicates": 0, "flagged_redeliveries": 0}
+
+    @staticmethod
+    def event_id(event) -> Optional[str]:
+        return getattr(event, "webhook_event_id", None)
+
+    def claim(self, event) -> bool:
+        """Record an event as accepted.
+
+        Fails open: events without an id, or any store error, are accepted.
+
+        Returns:
+            False if the event id was already claimed (a duplicate)
+        """
+        delivery_context = getattr(event, "delivery_context", None)
+        if getattr(delivery_context, "is_redelivery", False):
+            self._count("flagged_redeliveries")
+
+        event_id = self.event_id(event)
+        if self.store is None or not event_id:
+            self._count("accepted")
+            return True
+
+        try:
+            claimed = self.store.add(event_id, True, ttl=self.ttl)
+        except Exception as e:
+            logger.warning(f"Webhook de-duplication store failed: {e}")
+            claimed = True
+
+        if not claimed:
+            logger.info(f"Skipping duplicate webhook event {event_id}")
+            self._count("duplicates")
+            return False
+
+        if self._count("accepted") % self.PURGE_EVERY == 0:
+            try:
+                self.store.purge_expired()
+            except Exception as e:
+                logger.warning(f"Webhook de-duplication purge failed: {e}")
+        return True
+
+    def release(self, event) -> None:
+        """Forget a claim, e.g. when the event could not be queued after all."""
+        event_id = self.event_id(event)
+        if self.store is None or not event_id:
+            return
+        try:
+            self.store.delete(event_id)
+        except Exception as e:
+            logger.warning(f"Webhook de-duplication release failed: {e}")
+        self._count("accepted", -1)
+
+    def _count(self, name: str, delta: int = 1) -> int:
+        with self._lock:
+            self._stats[name] += delta
+            return self._stats[name]
+
+    def get_stats(self) -> dict:
+        """Get counters: accepted events, skipped duplicates and events LINE flagged as redelivered."""
+        with self._lock:
+            return dict(self._stats)
+
+
+# Singleton instance
+webhook_dedup = WebhookDeduplicator(
+    create_kv_store(
+        Config.WEBHOOK_DEDUP_BACKEND,
+        "webhook_events",
+        Config.CACHE_DB_PATH,
+        max_entries=Config.WEBHOOK_DEDUP_MAX_ENTRIES,
+    ),
+    ttl=Config.WEBHOOK_DEDUP_TTL_SECONDS,
+)
@@ -3,6 +3,7 @@
 
 import os
 import sys
+import threading
 import pytest
 from datetime import datetime, timezone, timedelta
 from unittest.mock import patch, MagicMock
@@ -10,7 +11,9 @@ from unittest.mock import patch, MagicMock
 # Adjust path to import services
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from config import Config
 from services.digest_service import DigestService
+from services.kv_store import MemoryKVStore
 
 
 @pytest.fixture
@@ -262,3 +265,290 @@ def test_generate_digest_success(mock_gemini, mock_ta, mock_sheets):
     assert results[0]["narrative"] == "Mock Thai analysis"
     assert results[1]["narrative"] == "Mock Thai analysis"
 
+
+
+@patch("services.digest_service.ta_service")
+@patch("services.digest_service.gemini_service")
+def test_run_digest_analyzes_each_asset_once(mock_gemini, mock_ta, mock_user_daily):
+    """Shared assets are computed once per run, not once per user."""
+    users = [
+        {**mock_user_daily, "user_id": "U1", "digest_assets": '["GOLD", "BTC"]'},
+        {**mock_user_daily, "user_id": "U2", "digest_assets": '["btc"]'},
+        {**mock_user_daily, "user_id": "U3", "digest_time": "18:00"},  # not due
+        {**mock_user_daily, "user_id": "U4", "digest_assets": '["ETH"]'},
+    ]
+    service = DigestService()
+    mock_now = datetime(2026, 6, 22, 7, 0, tzinfo=timezone(timedelta(hours=7)))
+    delivered = {}
+
+    def compute(asset):
+        if asset.upper() == "ETH":
+            raise ValueError("no data")
+        return {"asset": asset.upper()}
+
+    mock_ta.compute_indicators.side_effect = compute
+    with patch.object(service, "generate_narratives", side_effect=lambda p: {t: "n" for t in p}):
+        report = service.run_digest(users, delivered.__setitem__, now=mock_now)
+
+    assert sorted(c.args[0].upper() for c in mock_ta.compute_indicators.call_args_list) == ["BTC", "ETH", "GOLD"]
+    assert [r["ticker"] for r in delivered["U1"]] == ["GOLD", "BTC"]
+    assert [r["ticker"] for r in delivered["U2"]] == ["BTC"]
+    assert delivered["U1"][1] is delivered["U2"][0]
+    assert set(delivered) == {"U1", "U2"}
+    assert report["due"] == 3
+    assert report["sent"] == 2
+    assert report["no_results"] == 1
+    assert report["pending"] == 0
+
+
+def test_run_digest_is_idempotent_and_retries_failures(mock_user_daily):
+    """A re-triggered run skips delivered users and retries failed pushes."""
+    users = [{**mock_user_daily, "user_id": f"U{i}"} for i in range(4)]
+    service = DigestService(delivery_log=MemoryKVStore())
+    mock_now = datetime(2026, 6, 22, 7, 0, tzinfo=timezone(timedelta(hours=7)))
+    delivered = []
+
+    def deliver(user_id, results):
+        if user_id == "U2" and user_id not in failed:
+            failed.add(user_id)
+            raise RuntimeError("push failed")
+        delivered.append(user_id)
+
+    failed = set()
+    with patch.object(service, "_indicators_or_none", side_effect=lambda a: {"asset": a}), \
+         patch.object(service, "generate_narratives", side_effect=lambda p: {t: "n" for t in p}):
+        first = service.run_digest(users, deliver, now=mock_now)
+        second = service.run_digest(users, deliver, now=mock_now)
+        third = service.run_digest(users, deliver, now=mock_now.replace(minute=45))
+
+    assert first["sent"] == 3
+    assert first["failed"] == 1
+    assert first["errors"] == ["U2: push failed"]
+    assert second["sent"] == 1
+    assert second["already_sent"] == 3
+    assert third["sent"] == 0
+    assert third["already_sent"] == 4
+    assert sorted(delivered) == ["U0", "U1", "U2", "U3"]
+
+
+def test_run_digest_leaves_slow_users_pending_at_deadline(mock_user_daily):
+    """Users not reached before the deadline stay unclaimed for the next trigger."""
+    users = [
+        {**mock_user_daily, "user_id": "FAST", "digest_assets": '["BTC"]'},
+        {**mock_user_daily, "user_id": "SLOW", "digest_assets": '["GOLD"]'},
+    ]
+    log = MemoryKVStore()
+    service = DigestService(delivery_log=log)
+    mock_now = datetime(2026, 6, 22, 7, 0, tzinfo=timezone(timedelta(hours=7)))
+    release = threading.Event()
+
+    def compute(asset):
+        if asset == "GOLD":
+            release.wait(5)
+        return {"asset": asset}
+
+    delivered = {}
+    with patch.object(Config, "DIGEST_NARRATIVE_BATCH_WAIT_SECONDS", 0.02), \
+         patch.object(service, "_indicators_or_none", side_effect=compute), \
+         patch.object(service, "generate_narratives", side_effect=lambda p: {t: "n" for t in p}):
+        report = service.run_digest(users, delivered.__setitem__, now=mock_now, deadline=0.2)
+    release.set()
+
+    assert set(delivered) == {"FAST"}
+    assert report["sent"] == 1
+    assert report["pending"] == 1
+    assert log.get(service.delivery_key("SLOW", mock_now)) is None
+    assert log.get(service.delivery_key("FAST", mock_now))["status"] == "sent"
+
+
+def test_deliver_once_fails_open_on_checkpoint_store_errors():
+    """Store errors never block a push, and a sent push is always reported as sent."""
+    log = MagicMock()
+    log.add.side_effect = RuntimeError("store down")
+    log.set.side_effect = RuntimeError("store down")
+    service = DigestService(delivery_log=log)
+    delivered = []
+
+    assert service._deliver_once("k", "U1", [], lambda user_id, results: delivered.append(user_id)) is True
+    assert delivered == ["U1"]
+
+    log.add.side_effect = None
+    log.add.return_value = True
+    assert service._deliver_once("k", "U2", [], lambda user_id, results: delivered.append(user_id)) is True
+    assert delivered == ["U1", "U2"]
+    log.delete.assert_not_called()
+
+@patch("services.digest_service.gemini_service")
+def test_narrative_prompt_embeds_compact_payload(mock_gemini):
+    """The prompt JSON is rounded, unindented and omits values the template already states."""
+    mock_gemini.generate_response.return_value = "บทวิเคราะห์"
+    payload = _narrative_payload(price=92450.123456)
+    payload["metrics"]["trend"]["distance_from_50_ema_pct"] = 4.151234
+    payload["metrics"]["trend"]["ema_50_price"] = 88766.98765
+
+    DigestService().generate_narrative("BTC", payload)
+    prompt = mock_gemini.generate_response.call_args[0][0]
+
+    assert '{"trend":{"ema_50_price":88766.99,"ema_200_price":82177,"distance_from_50_ema_pct":4.15,' in prompt
+    assert '"liquidity_gap_below":{"detected":false}' in prompt
+    assert "timestamp" not in prompt
+    assert "rsi_value" not in prompt
+    assert "$92,450.12" in prompt
+
+
+@patch("services.digest_service.gemini_service")
+def test_generate_narratives_batches_tickers_in_one_call(mock_gemini):
+    """Several tickers share one structured-output request keyed by ticker."""
+    mock_gemini.generate_json.return_value = {"BTC": "**บทวิเคราะห์ BTC**", "GOLD": "บทวิเคราะห์ GOLD"}
+    service = DigestService()
+
+    narratives = service.generate_narratives(
+        {"btc": _narrative_payload(), "GOLD": _narrative_payload(price=2300.0)}
+    )
+
+    assert narratives == {"BTC": "บทวิเคราะห์ BTC", "GOLD": "บทวิเคราะห์ GOLD"}
+    mock_gemini.generate_json.assert_called_once()
+    mock_gemini.generate_response.assert_not_called()
+    prompt, schema = mock_gemini.generate_json.call_args[0][:2]
+    assert schema["required"] == ["BTC", "GOLD"]
+    assert set(schema["properties"]) == {"BTC", "GOLD"}
+    assert prompt.count("=== BTC ===") == 1 and prompt.count("=== GOLD ===") == 1
+    assert "GOLD (ทองคำ)" in prompt and "BTC/USDT" in prompt
+
+
+@patch("services.digest_service.gemini_service")
+def test_generate_narratives_falls_back_per_ticker(mock_gemini):
+    """Tickers missing from an unparseable or partial reply are requested alone."""
+    mock_gemini.generate_json.return_value = {"BTC": "บทวิเคราะห์ BTC", "GOLD": "  "}
+    mock_gemini.generate_response.return_value = "บทวิเคราะห์เดี่ยว"
+    service = DigestService()
+
+    narratives = service.generate_narratives(
+        {"BTC": _narrative_payload(), "GOLD": _narrative_payload(price=2300.0)}
+    )
+
+    assert narratives == {"BTC": "บทวิเคราะห์ BTC", "GOLD": "บทวิเคราะห์เดี่ยว"}
+    mock_gemini.generate_response.assert_called_once()
+    assert "GOLD (ทองคำ)" in mock_gemini.generate_response.call_args[0][0]
+
+    mock_gemini.generate_json.return_value = None
+    mock_gemini.generate_response.reset_mock()
+    service.generate_narratives({"BTC": _narrative_payload(), "GOLD": _narrative_payload(price=2300.0)})
+    assert mock_gemini.generate_response.call_count == 2
+
+
+def _narrative_payload(price=92450.0, timestamp="2026-06-23T07:00:00"):
+    return {
+        "metadata": {"ticker": "BTC", "yfinance_symbol": "BTC-USD",
+                     "current_price": price, "timestamp": timestamp},
+        "metrics": {
+            "trend": {"macro_condition": "BULLISH_EXPANSION", "ema_50_price": 88766.0,
+                      "ema_200_price": 82177.0, "distance_from_50_ema_pct": 4.15,
+                      "distance_from_200_ema_pct": 12.5},
+            "momentum": {"rsi_value": 64.2, "rsi_condition": "NEUTRAL_HIGH", "rsi_3d_velocity": 2.1,
+                         "bearish_divergence_detected": False, "bullish_divergence_detected": False},
+            "volume_profile": {"point_of_control_price": 88000.0, "immediate_support_hvn": 91200.0,
+                               "immediate_resistance_hvn": 94800.0,
+                               "liquidity_gap_below": {"detected": False, "start_price": 0.0, "end_price": 0.0}},
+            "fibonacci": {"anchor_swing_low": 74000.0, "anchor_swing_high": 95000.0,
+                          "closest_level_ratio": "0.236", "closest_level_price": 90044.0,
+                          "distance_to_level_pct": -2.6,
+                          "golden_pocket_zone": {"fib_05_price": 84500.0, "fib_0618_price": 82022.0}},
+        },
+    }
+
+
+@patch("services.digest_service.gemini_service")
+def test_narrative_cache_reuses_same_day_metrics(mock_gemini):
+    """Unchanged (rounded) metrics on the same ICT day skip the Gemini call."""
+    from services.kv_store import MemoryKVStore
+
+    mock_gemini.generate_response.return_value = "บทวิเคราะห์"
+    mock_gemini.ERROR_RESPONSE = "error"
+    service = DigestService(narrative_cache=MemoryKVStore())
+    morning = datetime(2026, 6, 23, 7, 0, tzinfo=timezone(timedelta(hours=7)))
+
+    with patch.object(service, "get_current_time_ict", return_value=morning):
+        first = service.generate_narrative("BTC", _narrative_payload())
+        # New timestamp and a sub-rounding price tick hit the cache
+        again = service.generate_narrative("btc", _narrative_payload(92451.0, "2026-06-23T09:00:00"))
+        assert mock_gemini.generate_response.call_count == 1
+        assert again == first
+
+        service.generate_narrative("BTC", _narrative_payload(95000.0))
+        assert mock_gemini.generate_response.call_count == 2
+
+    # The next ICT day starts with an empty cache
+    with patch.object(service, "get_current_time_ict", return_value=morning + timedelta(days=1)):
+        service.generate_narrative("BTC", _narrative_payload())
+    assert mock_gemini.generate_response.call_count == 3
+
+
+@patch("services.digest_service.gemini_service")
+def test_narrative_cache_skips_errors_and_expires_at_midnight(mock_gemini):
+    cache = MagicMock()
+    cache.get.return_value = None
+    mock_gemini.ERROR_RESPONSE = "error"
+    mock_gemini.generate_response.return_value = "error"
+    service = DigestService(narrative_cache=cache)
+    evening = datetime(2026, 6, 23, 22, 30, tzinfo=timezone(timedelta(hours=7)))
+
+    with patch.object(service, "get_current_time_ict", return_value=evening):
+        service.generate_narrative("BTC", _narrative_payload())
+        cache.set.assert_not_called()
+
+        mock_gemini.generate_response.return_value = "ok"
+        service.generate_narrative("BTC", _narrative_payload())
+
+    key, value = cache.set.call_args[0]
+    assert key.startswith("BTC:2026-06-23:")
+    assert value == "ok"
+    assert cache.set.call_args.kwargs["ttl"] == 90 * 60
+
+
+def test_schedule_buckets_agree_with_should_send_now():
+    """A user is in a due bucket exactly when should_send_now says so."""
+    from services.digest_schedule import due_buckets, schedule_bucket
+
+    service = DigestService()
+    users = [
+        {"digest_enabled": True, "digest_frequency": "daily", "digest_time": "07:00"},
+        {"digest_enabled": "TRUE", "digest_frequency": "weekly", "digest_time": "7", "digest_day": "Monday"},
+        {"digest_enabled": True, "digest_frequency": "monthly", "digest_time": "18"},
+        {"digest_enabled": False, "digest_frequency": "daily", "digest_time": "07"},
+        {"digest_enabled": True, "digest_frequency": "yearly", "digest_time": "07"},
+    ]
+    start = datetime(2026, 6, 1, 0, 0, tzinfo=timezone(timedelta(hours=7)))
+
+    for hours in range(0, 24 * 8):
+        now = start + timedelta(hours=hours)
+        buckets = due_buckets(now)
+        with patch.object(service, "get_current_time_ict", return_value=now):
+            for user in users:
+                assert (schedule_bucket(user) in buckets) == service.should_send_now(user)
+
+
+@patch("services.digest_service.sheets_service")
+def test_get_due_users_reads_due_buckets(mock_sheets):
+    service = DigestService()
+    now = datetime(2026, 6, 22, 7, 0, tzinfo=timezone(timedelta(hours=7)))  # Monday
+    mock_sheets.get_digest_schedule.return_value = [
+        {"user_id": "U1", "bucket": "07|weekly|monday", "digest_assets": ["GOLD"]},
+    ]
+
+    users = service.get_due_users(now)
+
+    mock_sheets.get_digest_schedule.assert_called_once_with(["07|daily|", "07|weekly|monday"])
+    mock_sheets.get_users_for_digest.assert_not_called()
+    assert users == [{"user_id": "U1", "digest_enabled": True, "digest_assets": ["GOLD"],
+                      "digest_time": "07", "digest_frequency": "weekly", "digest_day": "monday"}]
+    with patch.object(service, "get_current_time_ict", return_value=now):
+        assert service.should_send_now(users[0]) is True
+
+    # Index not built yet: full scan filtered by should_send_now
+    mock_sheets.get_digest_schedule.return_value = None
+    mock_sheets.get_users_for_digest.return_value = [
+        {"user_id": "U2", "digest_enabled": True, "digest_time": "07"},
+        {"user_id": "U3", "digest_enabled": True, "digest_time": "08"},
+    ]
+    assert [u["user_id"] for u in service.get_due_users(now)] == ["U2"]
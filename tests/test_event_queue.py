@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Unit tests for the keyed event queue and webhook event dispatch."""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from linebot.v3.webhooks import FollowEvent, ImageMessageContent, MessageEvent, TextMessageContent
+
+from services.event_queue import KeyedEventQueue
+from services.line_service import EventWebhookHandler
+
+
+def test_jobs_run_in_order_per_key_and_in_parallel_across_keys():
+    queue = KeyedEventQueue(max_workers=4, max_pending=100)
+    seen = {"A": [], "B": []}
+    running = set()
+    overlap = threading.Event()
+
+    def job(key, n):
+        def run():
+            running.add(key)
+            if running == {"A", "B"}:
+                overlap.set()
+            time.sleep(0.01)
+            seen[key].append(n)
+            running.discard(key)
+        return run
+
+    assert queue.submit_all([(key, job(key, n)) for n in range(5) for key in ("A", "B")])
+    assert queue.wait_idle(timeout=5)
+
+    assert seen == {"A": list(range(5)), "B": list(range(5))}
+    assert overlap.is_set()
+    assert queue.get_stats() == {"pending": 0, "active_keys": 0, "processed": 10, "failed": 0}
+
+
+def test_failed_jobs_do_not_stop_the_key():
+    queue = KeyedEventQueue(max_workers=1, max_pending=10)
+    seen = []
+
+    def boom():
+        raise RuntimeError("handler crashed")
+
+    queue.submit_all([("A", boom), ("A", lambda: seen.append("next"))])
+    assert queue.wait_idle(timeout=5)
+
+    assert seen == ["next"]
+    assert queue.get_stats()["failed"] == 1
+
+
+def test_submit_all_refuses_whole_batch_when_full():
+    queue = KeyedEventQueue(max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    assert queue.submit_all([("A", lambda: release.wait(5))])
+    assert not queue.submit_all([("B", lambda: None), ("C", lambda: None)])
+    assert queue.get_stats()["pending"] == 1
+
+    release.set()
+    assert queue.wait_idle(timeout=5)
+
+
+def test_webhook_handler_parses_then_dispatches_events():
+    handler = EventWebhookHandler("secret")
+    calls = []
+
+    @handler.add(MessageEvent, message=TextMessageContent)
+    def on_text(event):
+        calls.append(("text", event.message.text))
+
+    @handler.add(MessageEvent, message=ImageMessageContent)
+    def on_image(event):
+        calls.append(("image", event.message.id))
+
+    @handler.add(FollowEvent)
+    def on_follow(event, destination):
+        calls.append(("follow", destination))
+
+    @handler.default()
+    def on_other(event):
+        calls.append(("default", event.type))
+
+    source = {"type": "user", "userId": "U1"}
+    common = {"timestamp": 1, "mode": "active", "webhookEventId": "E", "source": source,
+              "deliveryContext": {"isRedelivery": False}}
+    body = json.dumps({"destination": "BOT", "events": [
+        {**common, "type": "message", "replyToken": "r",
+         "message": {"type": "text", "id": "1", "text": "hi", "quoteToken": "q"}},
+        {**common, "type": "message", "replyToken": "r",
+         "message": {"type": "image", "id": "2", "quoteToken": "q",
+                     "contentProvider": {"type": "line"}}},
+        {**common, "type": "follow", "replyToken": "r", "follow": {"isUnblocked": False}},
+        {**common, "type": "unfollow"},
+    ]})
+    signature = base64.b64encode(
+        hmac.new(b"secret", body.encode("utf-8"), hashlib.sha256).digest()
+    ).decode("utf-8")
+
+    payload = handler.parse(body, signature)
+    assert calls == []
+    for event in payload.events:
+        handler.dispatch(event, payload.destination)
+
+    expected = [("text", "hi"), ("image", "2"), ("follow", "BOT"), ("default", "unfollow")]
+    assert calls == expected
+
+    # The SDK's own handle() still routes to the same handlers
+    calls.clear()
+    handler.handle(body, signature)
+    assert calls == expected
@@ -1,6 +1,5 @@
 """Tests for Gemini service."""
 
-import pytest
 from unittest.mock import patch, MagicMock
 import json
 
@@ -100,3 +99,59 @@ class TestGeminiService:
             result = service.parse_transaction_image(b"fake_image_bytes")
 
             assert result is None
+
+    def test_parse_transaction_requests_schema_json_with_thinking_budget(self):
+        """Test that parsing uses JSON schema mode and the configured thinking budget."""
+        mock_response = MagicMock()
+        mock_response.text = json.dumps({
+            "source_app": "Bitkub",
+            "asset_normalized": "ETH",
+            "side": "SELL",
+            "amount": 0.25,
+        })
+
+        with patch("services.gemini_service.genai") as mock_genai, \
+                patch("services.gemini_service.Config.GEMINI_OCR_THINKING_BUDGET", 256):
+            mock_client = MagicMock()
+            mock_client.models.generate_content.return_value = mock_response
+            mock_genai.Client.return_value = mock_client
+
+            from services.gemini_service import GeminiService
+            from prompts.transaction_parser import PARSE_TRANSACTION_SCHEMA
+            service = GeminiService()
+            result = service.parse_transaction_image(b"\x89PNG\r\n\x1a\nfake")
+
+            config = mock_client.models.generate_content.call_args.kwargs["config"]
+            assert config.response_mime_type == "application/json"
+            assert config.response_schema == PARSE_TRANSACTION_SCHEMA
+            assert config.thinking_config.thinking_budget == 256
+            image_part = mock_client.models.generate_content.call_args.kwargs["contents"][1]
+            assert image_part.inline_data.mime_type == "image/png"
+            assert result["asset_normalized"] == "ETH"
+
+    def test_parse_transaction_response_accepts_fenced_json(self):
+        """Test that free-text replies wrapped in markdown still parse."""
+        mock_response = MagicMock()
+        mock_response.text = '```json\n{"source_app": "Dime", "asset_normalized": "GOLD", "side": "BUY", "amount": 1}\n```'
+
+        from services.gemini_service import GeminiService
+        result = GeminiService.parse_transaction_response(mock_response)
+
+        assert result["asset_normalized"] == "GOLD"
+
+    def test_parse_transaction_response_handles_null_fields(self):
+        """Test that schema-mode nulls pass for optional fields and fail for key fields."""
+        from services.gemini_service import GeminiService
+        from prompts.transaction_parser import PARSE_TRANSACTION_SCHEMA
+
+        assert PARSE_TRANSACTION_SCHEMA["properties"]["price"]["nullable"] is True
+        assert PARSE_TRANSACTION_SCHEMA["properties"]["side"]["nullable"] is True
+
+        parsed = {"source_app": "Dime", "asset_normalized": "AAPL", "side": "BUY", "amount": 2,
+                  "price": None, "currency": None, "total": None, "date": None}
+        mock_response = MagicMock()
+        mock_response.text = json.dumps(parsed)
+        assert GeminiService.parse_transaction_response(mock_response)["price"] is None
+
+        mock_response.text = json.dumps({**parsed, "side": None})
+        assert GeminiService.parse_transaction_response(mock_response) is None
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Unit tests for the lazily refreshed health probes."""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.health_service import HealthService
+from utils.flex_messages import FlexMessages
+
+
+def _failing_probe():
+    raise ConnectionError("upstream down")
+
+
+def test_run_probes_caches_results_and_times_out_slow_probes():
+    release = threading.Event()
+    service = HealthService(
+        {"ok": lambda: None, "down": _failing_probe, "slow": release.wait},
+        interval=60,
+        timeout=0.2,
+    )
+
+    results = service.run_probes()
+    release.set()
+
+    assert results["ok"]["healthy"] is True and results["ok"]["error"] is None
+    assert results["down"] == {**results["down"], "healthy": False, "error": "upstream down"}
+    assert results["slow"]["healthy"] is False and results["slow"]["error"] == "Timed out"
+    assert all(r["latency_ms"] >= 0 and r["checked_at"] for r in results.values())
+
+    with service._lock:
+        assert service._results == results
+
+
+def test_readers_never_call_probes():
+    probe = MagicMock()
+    service = HealthService({"Gemini AI": probe}, interval=60, timeout=1)
+    service.refresh_if_stale = MagicMock()
+
+    assert service.get_summary() == {"status": "starting", "checked_at": None, "probes": {}}
+    service.run_probes()
+    probe.reset_mock()
+
+    for _ in range(5):
+        summary = service.get_summary()
+    probe.assert_not_called()
+    assert summary["status"] == "ok"
+    assert summary["checked_at"] == summary["probes"]["Gemini AI"]["checked_at"]
+
+    flex = FlexMessages.service_status(summary["probes"], summary["checked_at"])
+    assert "Gemini AI" in str(flex) and "ระบบทำงานปกติ" in str(flex)
+
+
+def test_stale_results_refresh_in_background_on_read():
+    calls = []
+    release = threading.Event()
+
+    def probe():
+        calls.append(1)
+        release.wait(2)
+
+    service = HealthService({"ok": probe}, interval=0.2, timeout=5)
+    assert calls == []  # nothing runs until someone reads
+
+    # The first read returns at once and starts a single round
+    assert service.get_summary()["status"] == "starting"
+    assert service.get_summary()["status"] == "starting"
+    release.set()
+    deadline = time.monotonic() + 2
+    while not service.get_results() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 1
+
+    # Fresh results are served without probing
+    assert service.get_results()["ok"]["healthy"] is True
+    assert service.refresh_if_stale() is False
+    assert len(calls) == 1
+
+    time.sleep(0.25)
+    assert service.refresh_if_stale() is True
+    deadline = time.monotonic() + 2
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2
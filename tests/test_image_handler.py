@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Unit tests for the staged image handler."""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Adjust path to import handlers
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from handlers.image_handler import ImageHandler
+from services.kv_store import MemoryKVStore
+from services.parse_cache import ScreenshotParseCache
+from utils.stage_graph import StageGraph
+
+STAGE_SECONDS = 0.2
+
+PARSED = {
+    "source_app": "Dime",
+    "asset_raw": "AAPL",
+    "asset_normalized": "AAPL",
+    "asset_type": "STOCK",
+    "side": "BUY",
+    "amount": 1,
+    "price": 200,
+    "currency": "USD",
+    "total": 200,
+}
+
+
+def _slow(result):
+    def call(*args):
+        time.sleep(STAGE_SECONDS)
+        return result
+    return call
+
+
+def _event():
+    return SimpleNamespace(
+        reply_token="R",
+        message=SimpleNamespace(id="M1"),
+        source=SimpleNamespace(user_id="U1"),
+    )
+
+
+def test_independent_stages_overlap_with_ocr():
+    line = MagicMock()
+    line.get_message_content.return_value = b"jpeg"
+    line.get_profile.side_effect = _slow({"display_name": "Ann"})
+    gemini = MagicMock()
+    gemini.parse_transaction_image.side_effect = _slow(dict(PARSED))
+    prices = MagicMock()
+    prices.get_usd_thb_rate.side_effect = _slow(35.0)
+    storage = MagicMock()
+    storage.get_or_create_user.side_effect = _slow({"user_id": "U1"})
+    storage.append_transaction.return_value = "TX1"
+
+    with patch("handlers.image_handler.line_service", line), \
+            patch("handlers.image_handler.gemini_service", gemini), \
+            patch("handlers.image_handler.price_service", prices), \
+            patch("handlers.image_handler.sheets_service", storage), \
+            patch("handlers.image_handler.parse_cache", ScreenshotParseCache(MemoryKVStore(), 60, None)), \
+            patch("handlers.image_handler.valuation_engine", MagicMock()):
+        started = time.perf_counter()
+        ImageHandler().handle(_event())
+        elapsed = time.perf_counter() - started
+
+    # OCR (0.2s) in parallel with the profile and the FX rate, then ensure_user
+    assert elapsed < 3 * STAGE_SECONDS
+    storage.get_or_create_user.assert_called_once_with("U1", "Ann")
+    tx = storage.append_transaction.call_args[0][0]
+    assert tx["total_thb"] == 7000
+    assert line.reply_flex.call_args[0][1] == "บันทึก BUY AAPL สำเร็จ"
+
+
+def test_unparsed_screenshot_creates_no_user():
+    line = MagicMock()
+    line.get_message_content.return_value = b"jpeg"
+    line.get_profile.return_value = {"display_name": "Ann"}
+    gemini = MagicMock()
+    gemini.parse_transaction_image.return_value = None
+    storage = MagicMock()
+
+    with patch("handlers.image_handler.line_service", line), \
+            patch("handlers.image_handler.gemini_service", gemini), \
+            patch("handlers.image_handler.price_service", MagicMock()), \
+            patch("handlers.image_handler.sheets_service", storage), \
+            patch("handlers.image_handler.parse_cache", ScreenshotParseCache(MemoryKVStore(), 60, None)), \
+            patch("handlers.image_handler.valuation_engine", MagicMock()):
+        ImageHandler().handle(_event())
+
+    storage.get_or_create_user.assert_not_called()
+    storage.append_transaction.assert_not_called()
+    assert "อ่านรูปไม่สำเร็จ" in str(line.reply_flex.call_args) + str(line.reply_text.call_args)
+
+
+def test_resent_screenshot_reuses_parse_and_is_held_as_duplicate():
+    line = MagicMock()
+    line.get_message_content.return_value = b"jpeg"
+    gemini = MagicMock()
+    gemini.parse_transaction_image.side_effect = lambda *args: dict(PARSED)
+    prices = MagicMock()
+    prices.get_usd_thb_rate.return_value = 35.0
+    storage = MagicMock()
+    storage.append_transaction.side_effect = ["TX1", "TX2"]
+    handler = ImageHandler()
+
+    with patch("handlers.image_handler.line_service", line), \
+            patch("handlers.image_handler.gemini_service", gemini), \
+            patch("handlers.image_handler.price_service", prices), \
+            patch("handlers.image_handler.sheets_service", storage), \
+            patch("handlers.image_handler.parse_cache", ScreenshotParseCache(MemoryKVStore(), 60, None)), \
+            patch("handlers.image_handler.valuation_engine", MagicMock()):
+        handler.handle(_event())
+        handler.handle(_event())
+
+        assert gemini.parse_transaction_image.call_count == 1
+        assert storage.append_transaction.call_count == 1
+        duplicate_flex = line.reply_flex.call_args[0][2]
+        assert "TX1" in str(duplicate_flex)
+
+        # The user confirms: the held transaction is recorded once
+        key = duplicate_flex["footer"]["contents"][0]["action"]["data"].split("=", 1)[1]
+        handler.record_pending("R2", "U1", key)
+        handler.record_pending("R3", "U1", key)
+
+    assert storage.append_transaction.call_count == 2
+    assert storage.append_transaction.call_args[0][0]["total_thb"] == 7000
+    assert line.reply_flex.call_args[0][1] == "บันทึก BUY AAPL สำเร็จ"
+    assert "หมดอายุ" in line.reply_text.call_args[0][1]
+
+
+def test_stage_graph_propagates_dependency_failures():
+    def fail():
+        raise ValueError("boom")
+
+    never_called = MagicMock()
+    with ThreadPoolExecutor(2) as executor:
+        graph = StageGraph(executor)
+        graph.add("a", fail)
+        graph.add("b", never_called, after=["a"])
+        graph.add("c", lambda x: x + 1, 1)
+        graph.add("d", lambda c: c * 10, after=["c"])
+
+        with pytest.raises(ValueError, match="boom"):
+            graph.result("b")
+        assert graph.result("d") == 20
+
+    never_called.assert_not_called()
+    assert set(graph.timings()) == {"a", "c", "d"}
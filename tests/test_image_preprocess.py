@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Unit tests for OCR screenshot preprocessing."""
+
+import io
+import os
+import sys
+
+from PIL import Image, ImageDraw
+
+# Adjust path to import utils
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.image_preprocess import detect_mime_type, preprocess_image
+
+
+def _screenshot(fmt="PNG", mode="RGB") -> bytes:
+    """A 1170x2532 screen: noisy content block surrounded by a wide white border."""
+    image = Image.new(mode, (1170, 2532), "white")
+    image.paste(Image.effect_noise((770, 1200), 40).convert(mode), (200, 600))
+    draw = ImageDraw.Draw(image)
+    for y in range(600, 1800, 60):
+        draw.rectangle((200, y, 970, y + 30), fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def test_detect_mime_type():
+    assert detect_mime_type(_screenshot("PNG")) == "image/png"
+    assert detect_mime_type(_screenshot("JPEG")) == "image/jpeg"
+    assert detect_mime_type(_screenshot("WEBP")) == "image/webp"
+    assert detect_mime_type(b"not an image") is None
+
+
+def test_preprocess_trims_downscales_and_reencodes():
+    original = _screenshot("PNG", mode="RGBA")
+
+    processed, mime_type = preprocess_image(original, max_side=768, quality=80)
+    image = Image.open(io.BytesIO(processed))
+
+    assert mime_type == "image/jpeg" and image.format == "JPEG"
+    assert len(processed) < len(original)
+    assert max(image.size) <= 768
+    # The white border was cropped: content spans 770x1170 of the original
+    assert image.size[0] / image.size[1] < 0.75
+
+
+def test_preprocess_passes_through_unreadable_or_disabled():
+    assert preprocess_image(b"\x89PNG\r\n\x1a\ncorrupt", max_side=768) == (
+        b"\x89PNG\r\n\x1a\ncorrupt", "image/png"
+    )
+    original = _screenshot("PNG")
+    assert preprocess_image(original, max_side=0) == (original, "image/png")
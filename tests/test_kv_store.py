@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Unit tests for the key-value cache stores."""
+
+import json
+import os
+import sys
+import time
+from urllib.parse import unquote
+
+import pytest
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.kv_store import GCSKVStore, MemoryKVStore, SQLiteKVStore
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, generation=None):
+        self.status_code = status_code
+        self._body = body
+        self.headers = {"x-goog-generation": str(generation)} if generation else {}
+
+    def json(self):
+        return json.loads(self._body)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeGCSSession:
+    """In-memory stand-in for the Cloud Storage JSON API, with generations."""
+
+    def __init__(self):
+        self.objects = {}  # name -> (body, generation)
+        self.generation = 0
+
+    def get(self, url, params=None, timeout=None):
+        stored = self.objects.get(unquote(url.rsplit("/o/", 1)[1]))
+        if stored is None:
+            return FakeResponse(404)
+        return FakeResponse(200, *stored)
+
+    def post(self, url, params=None, data=None, headers=None, timeout=None):
+        name = params["name"]
+        expected = params.get("ifGenerationMatch")
+        current = self.objects.get(name, (None, 0))[1]
+        if expected is not None and int(expected) != current:
+            return FakeResponse(412)
+        self.generation += 1
+        self.objects[name] = (data, self.generation)
+        return FakeResponse(200)
+
+    def delete(self, url, timeout=None):
+        name = unquote(url.rsplit("/o/", 1)[1])
+        return FakeResponse(204 if self.objects.pop(name, None) else 404)
+
+
+@pytest.fixture(params=["memory", "sqlite", "gcs"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryKVStore()
+    if request.param == "gcs":
+        return GCSKVStore("bucket", namespace="test", session=FakeGCSSession())
+    return SQLiteKVStore(str(tmp_path / "cache.db"), namespace="test")
+
+
+def test_round_trip_json_values(store):
+    store.set("a", {"price": 1.5, "tags": ["x"]})
+    store.set_many({"b": 2, "c": "three"})
+
+    assert store.get("a") == {"price": 1.5, "tags": ["x"]}
+    assert store.get_many(["b", "c", "missing"]) == {"b": 2, "c": "three"}
+    assert store.get("missing", "default") == "default"
+
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_expired_entries_are_missing_and_purged(store):
+    store.set("old", 1, ttl=0.01)
+    store.set("new", 2, ttl=60)
+    store.set("forever", 3)
+    time.sleep(0.02)
+
+    assert store.get_many(["old", "new", "forever"]) == {"new": 2, "forever": 3}
+    # Expired GCS objects are left to the bucket's lifecycle rule
+    assert store.purge_expired() == (0 if isinstance(store, GCSKVStore) else 1)
+
+
+def test_add_only_claims_missing_or_expired_keys(store):
+    assert store.add("claim", "first", ttl=0.01) is True
+    assert store.add("claim", "second") is False
+    assert store.get("claim") == "first"
+
+    time.sleep(0.02)
+    assert store.add("claim", "third") is True
+    assert store.get("claim") == "third"
+
+
+def test_sqlite_namespaces_share_one_file(tmp_path):
+    path = str(tmp_path / "cache.db")
+    quotes = SQLiteKVStore(path, namespace="quotes")
+    other = SQLiteKVStore(path, namespace="other")
+
+    quotes.set("BTC", 1)
+    assert other.get("BTC") is None
+    # A second handle (e.g. another worker process) sees the same data
+    assert SQLiteKVStore(path, namespace="quotes").get("BTC") == 1
+
+
+def test_memory_store_evicts_expired_then_oldest_when_bounded():
+    store = MemoryKVStore(max_entries=3)
+    store.set("expired", 0, ttl=0.01)
+    store.set("a", 1)
+    store.set("b", 2)
+    time.sleep(0.02)
+
+    store.set("c", 3)
+    assert store.get_many(["a", "b", "c"]) == {"a": 1, "b": 2, "c": 3}
+
+    store.set("a", 10)  # rewritten, so "b" is now the oldest
+    assert store.add("d", 4) is True
+    assert store.get_many(["a", "b", "c", "d"]) == {"a": 10, "c": 3, "d": 4}
+
+
+def test_gcs_store_is_shared_and_claims_are_exclusive():
+    session = FakeGCSSession()
+    first = GCSKVStore("bucket", namespace="digest", session=session)
+    second = GCSKVStore("bucket", namespace="digest", session=session)
+
+    assert first.add("2026-01-01T08:U1", "claimed") is True
+    assert second.add("2026-01-01T08:U1", "claimed") is False
+    assert second.get("2026-01-01T08:U1") == "claimed"
+    assert "digest/2026-01-01T08:U1" in session.objects
+
+    second.delete("2026-01-01T08:U1")
+    second.delete("2026-01-01T08:U1")  # deleting a missing key is fine
+    assert first.add("2026-01-01T08:U1", "again") is True
+
+
+def test_gcs_add_loses_race_for_expired_key():
+    session = FakeGCSSession()
+    store = GCSKVStore("bucket", namespace="test", session=session)
+    store.set("claim", "old", ttl=0.01)
+    time.sleep(0.02)
+
+    read = session.get
+
+    def read_then_overwrite(url, params=None, timeout=None):
+        # Another instance replaces the expired entry between read and write
+        response = read(url, params=params, timeout=timeout)
+        session.post(None, params={"name": "test/claim"}, data=json.dumps({"value": "other", "expires_at": None}))
+        return response
+
+    session.get = read_then_overwrite
+    assert store.add("claim", "mine") is False
+    session.get = read
+    assert store.get("claim") == "other"
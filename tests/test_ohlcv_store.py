@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Unit tests for the local OHLCV candle store (no live yfinance calls)."""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.ohlcv_store import OHLCVStore
+
+
+def candles(start: date, days: int, close: float = 100.0) -> pd.DataFrame:
+    """Daily candles as yfinance returns them (tz-aware index, extra columns)."""
+    index = pd.date_range(start, periods=days, freq="D", tz="America/New_York")
+    closes = [close + i for i in range(days)]
+    return pd.DataFrame({
+        "Open": closes, "High": [c + 1 for c in closes], "Low": [c - 1 for c in closes],
+        "Close": closes, "Volume": [1000.0] * days, "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=index)
+
+
+@pytest.fixture
+def history():
+    """Fake downloader: 400 days of history ending today."""
+    start = date.today() - timedelta(days=399)
+    full = candles(start, 400)
+
+    def fetch(symbol, period=None, start=None):
+        if period is not None:
+            return full
+        return full[full.index.strftime("%Y-%m-%d") >= start]
+
+    return MagicMock(side_effect=fetch)
+
+
+def test_first_call_downloads_full_history(tmp_path, history):
+    store = OHLCVStore(str(tmp_path / "ohlcv.db"), history=history)
+
+    df = store.get_history("AAPL", days=365)
+
+    history.assert_called_once_with("AAPL", period="2y")
+    assert list(df.columns) == ["Open", "High", "Low", "Close", "Volume"]
+    assert 360 <= len(df) <= 366
+    assert df.index[-1].date() == date.today()
+
+
+def test_refresh_is_incremental_and_throttled(tmp_path, history):
+    store = OHLCVStore(str(tmp_path / "ohlcv.db"), refresh_interval=900, history=history)
+    store.get_history("AAPL")
+    store.get_history("AAPL")
+    assert history.call_count == 1  # within the refresh interval
+
+    store.refresh_interval = 0
+    store.get_history("AAPL")
+
+    _, kwargs = history.call_args
+    assert set(kwargs) == {"start"}
+    assert kwargs["start"] == (date.today() - timedelta(days=4)).isoformat()
+
+
+def test_readjusted_history_triggers_full_download(tmp_path, history):
+    store = OHLCVStore(str(tmp_path / "ohlcv.db"), refresh_interval=0, history=history)
+    store.get_history("AAPL")
+
+    # A split halves every historical close
+    halved = candles(date.today() - timedelta(days=399), 400)
+    halved[["Open", "High", "Low", "Close"]] /= 2
+    history.side_effect = lambda symbol, period=None, start=None: halved
+
+    df = store.get_history("AAPL")
+
+    assert history.call_args.kwargs == {"period": "2y"}
+    assert df["Close"].iloc[0] == pytest.approx(halved["Close"].iloc[-len(df)])
+
+
+def test_failed_refresh_serves_stored_candles(tmp_path, history):
+    store = OHLCVStore(str(tmp_path / "ohlcv.db"), refresh_interval=0, history=history)
+    stored = store.get_history("AAPL")
+
+    history.side_effect = ConnectionError("offline")
+
+    pd.testing.assert_frame_equal(store.get_history("AAPL"), stored)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Unit tests for the screenshot parse cache."""
+
+import io
+import os
+import sys
+
+from PIL import Image
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.kv_store import MemoryKVStore
+from services.parse_cache import ScreenshotParseCache
+
+PARSED = {"asset_normalized": "BTC", "side": "BUY", "amount": 0.01, "price": 60000}
+TX = {"tx_id": "TX1", "asset": "BTC", "side": "BUY", "amount": 0.01, "price": 60000, "date": "2025-01-15"}
+
+
+def _screenshot(fmt: str, quality: int = 95) -> bytes:
+    image = Image.linear_gradient("L").resize((600, 1200)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **({"quality": quality} if fmt == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+def test_resent_screenshot_hits_the_cache():
+    cache = ScreenshotParseCache(MemoryKVStore(), ttl=60, phash_max_distance=None)
+    original = _screenshot("PNG")
+
+    first = cache.lookup("U1", original)
+    assert first["entry"] is None
+    cache.store_parse("U1", first, PARSED)
+
+    assert cache.lookup("U1", original)["entry"]["parsed"] == PARSED
+    # Entries are per user
+    assert cache.lookup("U2", original)["entry"] is None
+    # A re-encoded copy is not an exact match
+    assert cache.lookup("U1", _screenshot("JPEG", quality=60))["entry"] is None
+
+
+def test_reencoded_copy_of_recorded_screenshot_is_flagged_but_reparsed():
+    cache = ScreenshotParseCache(MemoryKVStore(), ttl=60, phash_max_distance=4)
+    first = cache.lookup("U1", _screenshot("PNG"))
+    cache.store_parse("U1", first, PARSED)
+    assert cache.lookup("U1", _screenshot("JPEG", quality=60))["similar_tx_id"] is None
+
+    cache.record_transaction("U1", first, TX)
+    reencoded = cache.lookup("U1", _screenshot("JPEG", quality=60))
+
+    assert reencoded["entry"] is None
+    assert reencoded["similar_tx_id"] == "TX1"
+    # Flagged even if the fresh parse differs from the recorded one
+    assert cache.find_duplicate("U1", reencoded, {**TX, "price": 60100}) == "TX1"
+
+
+def test_recorded_transactions_flag_duplicates():
+    cache = ScreenshotParseCache(MemoryKVStore(), ttl=60, phash_max_distance=4)
+    lookup = cache.lookup("U1", b"screenshot-1")
+    cache.store_parse("U1", lookup, PARSED)
+    assert cache.find_duplicate("U1", lookup, TX) is None
+
+    cache.record_transaction("U1", lookup, TX)
+
+    # Same screenshot again
+    assert cache.find_duplicate("U1", cache.lookup("U1", b"screenshot-1"), TX) == "TX1"
+    # A different screenshot of the same trade
+    other = cache.lookup("U1", b"screenshot-2")
+    assert cache.find_duplicate("U1", other, {**TX, "tx_id": ""}) == "TX1"
+    assert cache.find_duplicate("U1", other, {**TX, "amount": 0.02}) is None
+
+    cache.hold_pending("U1", other["key"], {"transaction": TX})
+    assert cache.pop_pending("U1", other["key"]) == {"transaction": TX}
+    assert cache.pop_pending("U1", other["key"]) is None
+
+
+def test_disabled_cache_always_misses():
+    cache = ScreenshotParseCache(None, ttl=60, phash_max_distance=4)
+    lookup = cache.lookup("U1", b"screenshot")
+    cache.store_parse("U1", lookup, PARSED)
+    cache.record_transaction("U1", lookup, TX)
+
+    assert cache.lookup("U1", b"screenshot")["entry"] is None
+    assert cache.find_duplicate("U1", lookup, TX) is None
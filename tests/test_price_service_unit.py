@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Unit tests for PriceService fetch orchestration (no live API calls)."""
+
+import os
+import sys
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.kv_store import SQLiteKVStore
+from services.price_service import PriceError, PriceService
+from services.quote_store import AssetReferenceQuoteStore, KVQuoteStore
+
+
+@pytest.fixture
+def service():
+    svc = PriceService()
+    with patch.object(svc, "get_usd_thb_rate", return_value=35.0):
+        yield svc
+
+
+def test_get_prices_thb_fetches_concurrently(service):
+    """Wall-clock time is the slowest request, not the sum of all requests."""
+    def slow_batch(tickers):
+        time.sleep(0.3)
+        return {t: 10.0 for t in tickers}
+
+    with patch.object(service, "_get_stock_prices_batch", side_effect=slow_batch), \
+         patch.object(service, "_get_crypto_prices_batch", side_effect=slow_batch), \
+         patch.object(service, "_get_forex_prices_batch", side_effect=slow_batch):
+        start = time.monotonic()
+        prices = service.get_prices_thb(["AAPL", "NVDA", "BTC", "GOLD"])
+        elapsed = time.monotonic() - start
+
+    assert prices == {"AAPL": 350.0, "NVDA": 350.0, "BTC": 350.0, "GOLD": 350.0}
+    assert elapsed < 0.9
+
+
+def test_get_prices_thb_returns_partial_result_on_deadline(service):
+    """Quotes that miss the deadline are dropped instead of blocking the caller."""
+    def slow_crypto(tickers):
+        time.sleep(1.0)
+        return {t: 1.0 for t in tickers}
+
+    with patch.object(service, "_get_stock_prices_batch", return_value={"AAPL": 2.0}), \
+         patch.object(service, "_get_crypto_prices_batch", side_effect=slow_crypto):
+        start = time.monotonic()
+        prices = service.get_prices_thb(["AAPL", "BTC"], deadline=0.2)
+        elapsed = time.monotonic() - start
+
+    assert prices == {"AAPL": 70.0}
+    assert elapsed < 0.8
+
+
+def test_get_prices_thb_does_not_wait_past_deadline_for_rate():
+    """A slow rate fetch falls back to the last known rate, or fails without one."""
+    svc = PriceService()
+
+    def slow_rate():
+        time.sleep(1.0)
+        return 36.0
+
+    with patch.object(svc, "get_usd_thb_rate", side_effect=slow_rate), \
+         patch.object(svc, "_get_stock_prices_batch", return_value={"AAPL": 2.0}):
+        start = time.monotonic()
+        with pytest.raises(PriceError):
+            svc.get_prices_thb(["AAPL"], deadline=0.2)
+
+        svc._thb_rate_cache = 35.0
+        assert svc.get_prices_thb(["AAPL"], deadline=0.2) == {"AAPL": 70.0}
+        assert time.monotonic() - start < 0.9
+
+
+def test_quotes_arriving_after_deadline_are_cached(service):
+    """A batch that misses the deadline still fills the cache for the next request."""
+    def slow_crypto(tickers):
+        time.sleep(0.3)
+        return {t: 1.0 for t in tickers}
+
+    with patch.object(service, "_get_crypto_prices_batch", side_effect=slow_crypto) as crypto:
+        assert service.get_prices_usd(["BTC"], deadline=0.05) == {}
+        time.sleep(0.5)
+        assert service.get_prices_usd(["BTC"], deadline=0.05) == {"BTC": 1.0}
+
+    assert crypto.call_count == 1
+
+
+def test_batches_by_asset_class_and_falls_back_only_for_missing(service):
+    """One request per asset class; yfinance is tried only for tickers Tiingo missed."""
+    with patch.object(service, "_get_stock_prices_batch", return_value={"AAPL": 200.0}) as stocks, \
+         patch.object(service, "_get_crypto_prices_batch", return_value={"BTC": 90000.0}) as crypto, \
+         patch.object(service, "_get_forex_prices_batch", return_value={"GOLD": 2500.0}) as forex, \
+         patch.object(service, "_get_yfinance_price", return_value=150.0) as fallback:
+        prices = service.get_prices_usd(["AAPL", "NVDA", "btc", "ETH", "GOLD", "AAPL"])
+
+    stocks.assert_called_once_with(["AAPL", "NVDA"])
+    crypto.assert_called_once_with(["BTC", "ETH"])
+    forex.assert_called_once_with(["GOLD"])
+    assert sorted(c.args[0] for c in fallback.call_args_list) == ["ETH", "NVDA"]
+    assert prices == {"AAPL": 200.0, "NVDA": 150.0, "btc": 90000.0, "ETH": 150.0, "GOLD": 2500.0}
+
+
+def test_forex_batch_fans_out_shared_pairs(service):
+    """GOLD and XAUUSD share the xauusd pair and both receive the quote."""
+    response = [{"ticker": "xauusd", "bidPrice": 2499.0, "askPrice": 2501.0}]
+
+    with patch.object(service, "_tiingo_get", return_value=response) as tiingo:
+        prices = service._get_forex_prices_batch(["GOLD", "XAUUSD"])
+
+    tiingo.assert_called_once_with("/tiingo/fx/top", {"tickers": "xauusd"})
+    assert prices == {"GOLD": 2500.0, "XAUUSD": 2500.0}
+
+
+def test_crypto_and_stock_batches_map_tickers_back(service):
+    """Multi-ticker responses are fanned back out to the requested tickers."""
+    crypto_response = [
+        {"ticker": "btcusd", "priceData": [{"close": 90000.0}]},
+        {"ticker": "ethusd", "priceData": []},
+    ]
+    with patch.object(service, "_tiingo_get", return_value=crypto_response) as tiingo:
+        assert service._get_crypto_prices_batch(["BTC", "ETH"]) == {"BTC": 90000.0}
+    tiingo.assert_called_once_with("/tiingo/crypto/prices", {"tickers": "btcusd,ethusd"})
+
+    stock_response = [{"ticker": "AAPL", "last": None, "tngoLast": 201.5}, {"ticker": "NVDA", "last": 120.0}]
+    with patch.object(service, "_tiingo_get", return_value=stock_response) as tiingo:
+        assert service._get_stock_prices_batch(["AAPL", "NVDA"]) == {"AAPL": 201.5, "NVDA": 120.0}
+    tiingo.assert_called_once_with("/iex/", {"tickers": "aapl,nvda"})
+
+
+def test_quote_cache_serves_fresh_hits_without_refetch(service):
+    batch = lambda tickers: {t: 10.0 for t in tickers}
+    with patch.object(service, "_get_stock_prices_batch", side_effect=batch) as stock:
+        assert service.get_prices_usd(["AAPL"]) == {"AAPL": 10.0}
+        assert service.get_prices_usd(["aapl"]) == {"aapl": 10.0}
+
+    assert stock.call_count == 1
+    stats = service.get_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_quote_cache_serves_stale_and_refreshes_in_background(service):
+    with patch.object(service, "_get_crypto_prices_batch", return_value={"BTC": 20.0}) as crypto:
+        # Entry older than the crypto TTL but within the stale window
+        service._quote_cache["BTC"] = (10.0, time.monotonic() - 30)
+        assert service.get_prices_usd(["BTC"]) == {"BTC": 10.0}
+
+        for _ in range(50):
+            if service._quote_cache["BTC"][0] == 20.0:
+                break
+            time.sleep(0.02)
+
+    assert crypto.call_count == 1
+    assert service._quote_cache["BTC"][0] == 20.0
+    assert service.get_cache_stats()["stale_hits"] == 1
+    assert service.get_cache_stats()["refreshes"] == 1
+
+
+def test_quote_cache_ttl_depends_on_asset_class(service):
+    # 30s old: stale for crypto (15s) but still fresh for stocks (60s) and gold (300s)
+    aged = time.monotonic() - 30
+    service._quote_cache.update({"BTC": (1.0, aged), "AAPL": (2.0, aged), "GOLD": (3.0, aged)})
+    with patch.object(service, "_schedule_refresh") as refresh:
+        service.get_prices_usd(["BTC", "AAPL", "GOLD"])
+
+    refresh.assert_called_once_with(["BTC"])
+
+
+def test_quote_cache_refetches_past_stale_window(service):
+    service._quote_cache["AAPL"] = (1.0, time.monotonic() - 10_000)
+    with patch.object(service, "_get_stock_prices_batch", return_value={"AAPL": 5.0}):
+        assert service.get_prices_usd(["AAPL"]) == {"AAPL": 5.0}
+
+    assert service.get_cache_stats()["misses"] == 1
+
+
+def test_shared_quote_store_collapses_upstream_fetches(tmp_path):
+    """A quote fetched by one instance is reused by another via the shared store."""
+    shared = KVQuoteStore(SQLiteKVStore(str(tmp_path / "cache.db"), "quotes"), ttl=900)
+    first, second = PriceService(quote_store=shared), PriceService(quote_store=shared)
+
+    with patch.object(first, "_get_stock_prices_batch", return_value={"AAPL": 10.0}):
+        assert first.get_prices_usd(["AAPL"]) == {"AAPL": 10.0}
+    first.refresh_executor.shutdown(wait=True)
+
+    with patch.object(second, "_get_stock_prices_batch") as upstream:
+        assert second.get_prices_usd(["AAPL"]) == {"AAPL": 10.0}
+
+    upstream.assert_not_called()
+    assert second.get_cache_stats()["shared_hits"] == 1
+    assert second.get_cache_stats()["misses"] == 0
+
+
+def test_shared_quote_keeps_original_age(service):
+    """A shared quote older than the TTL is served stale and refreshed."""
+    service.quote_store = MagicMock()
+    service.quote_store.get_quotes.return_value = {"BTC": (10.0, time.time() - 30)}
+
+    with patch.object(service, "_schedule_refresh") as refresh:
+        assert service.get_prices_usd(["BTC"]) == {"BTC": 10.0}
+
+    refresh.assert_called_once_with(["BTC"])
+
+
+def test_asset_reference_quote_store_round_trip():
+    sheets = MagicMock()
+    store = AssetReferenceQuoteStore(sheets)
+    fetched_at = time.time()
+
+    store.put_quotes({"GOLD": 2000.0}, fetched_at, usd_thb_rate=35.0)
+    rows = sheets.upsert_asset_quotes.call_args[0][0]
+    assert rows["GOLD"]["price_usd"] == 2000.0
+    assert rows["GOLD"]["current_price_thb"] == 70000.0
+
+    sheets.get_asset_quotes.return_value = {
+        "GOLD": {"asset_symbol": "GOLD", **rows["GOLD"]},
+        "BAD": {"asset_symbol": "BAD", "price_usd": "", "last_updated": ""},
+    }
+    quotes = store.get_quotes(["GOLD", "BAD"])
+    assert quotes["GOLD"][0] == 2000.0
+    assert quotes["GOLD"][1] == pytest.approx(fetched_at, abs=1)
+    assert "BAD" not in quotes
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Unit tests for the lazy service registry."""
+
+import os
+import subprocess
+import sys
+import types
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.registry import ServiceRegistry
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_lazy_service_imports_module_on_first_use(monkeypatch):
+    module = types.ModuleType("fake_service_module")
+    module.fake_service = types.SimpleNamespace(ping=lambda: "pong")
+    registry = ServiceRegistry({"fake_service": "fake_service_module"})
+
+    proxy = registry.lazy("fake_service")
+    assert not registry.is_loaded("fake_service")
+
+    monkeypatch.setitem(sys.modules, "fake_service_module", module)
+    assert proxy.ping() == "pong"
+    assert registry.loaded() == ["fake_service"]
+    assert registry.get("fake_service") is module.fake_service
+
+
+def test_webhook_entry_modules_skip_heavy_imports():
+    """Text handlers must not pay for pandas, pandas-ta or google-genai at import."""
+    code = (
+        "import sys, handlers.message_handler, handlers.image_handler, services.price_service; "
+        "print(','.join(m for m in ('pandas', 'pandas_ta', 'yfinance', 'google.genai') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
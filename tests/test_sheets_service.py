@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""Unit tests for SheetsService caching and write paths (no live Sheets access)."""
+
+import os
+import re
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import gspread
+from gspread.utils import a1_to_rowcol
+
+from services.sheets_service import SheetsService
+
+
+USERS_ROWS = [
+    ["user_id", "display_name", "monthly_budget", "target_allocation", "risk_profile",
+     "onboarding_status", "created_at", "digest_enabled", "digest_assets"],
+    ["U1", "Alice", "10000", '{"GOLD": 60, "BTC": 40}', "moderate", "ACTIVE", "2026-01-01", "TRUE", '["GOLD"]'],
+    ["U2", "Bob", "5000", "", "moderate", "NEW", "2026-01-02", "FALSE", ""],
+]
+
+
+@pytest.fixture
+def service():
+    """SheetsService wired to a fake Users worksheet."""
+    svc = SheetsService()
+    users_sheet = MagicMock()
+    users_sheet.get_all_values.return_value = [list(r) for r in USERS_ROWS]
+    users_sheet.row_values.return_value = list(USERS_ROWS[0])
+    users_sheet.col_count = len(USERS_ROWS[0])
+    svc._worksheets["Users"] = users_sheet
+    svc._worksheets["Digest_Schedule"] = fake_indexed_sheet([
+        ["user_id", "bucket", "digest_assets", "updated_at"],
+        ["U1", "07|daily|", '["GOLD"]', "2026-01-01"],
+    ])
+    return svc
+
+
+def test_get_user_reads_sheet_once(service):
+    """Repeated lookups within the TTL reuse a single sheet read."""
+    users_sheet = service._worksheets["Users"]
+
+    alice = service.get_user("U1")
+    bob = service.get_user("U2")
+    missing = service.get_user("U404")
+
+    assert alice["display_name"] == "Alice"
+    assert alice["monthly_budget"] == 10000
+    assert alice["target_allocation"] == {"GOLD": 60, "BTC": 40}
+    assert alice["digest_enabled"] is True
+    assert bob["target_allocation"] == {}
+    assert missing is None
+    assert users_sheet.get_all_values.call_count == 1
+
+
+def test_parsed_user_does_not_mutate_cache(service):
+    """Callers mutating a returned record must not corrupt the cached row."""
+    user = service.get_user("U1")
+    user["target_allocation"]["GOLD"] = 0
+
+    assert service.get_user("U1")["target_allocation"]["GOLD"] == 60
+
+
+def test_cache_expires_after_ttl(service):
+    """The sheet is re-read once the TTL has elapsed."""
+    users_sheet = service._worksheets["Users"]
+
+    with patch("services.sheets_service.Config.USERS_CACHE_TTL_SECONDS", 0):
+        service.get_user("U1")
+        service.get_user("U1")
+
+    assert users_sheet.get_all_values.call_count == 2
+
+
+def test_list_queries_share_cached_index(service):
+    """Allocation and digest queries reuse the same cached read."""
+    users_sheet = service._worksheets["Users"]
+
+    with_allocation = service.get_all_users_with_allocation()
+    digest_users = service.get_users_for_digest()
+
+    assert [u["user_id"] for u in with_allocation] == ["U1"]
+    assert [u["user_id"] for u in digest_users] == ["U1"]
+    assert users_sheet.get_all_values.call_count == 1
+
+
+def test_create_user_invalidates_cache(service):
+    """A newly created user is visible on the next lookup."""
+    users_sheet = service._worksheets["Users"]
+    service.get_user("U1")
+
+    service.create_user("U3", "Carol")
+    users_sheet.get_all_values.return_value = [list(r) for r in USERS_ROWS] + [
+        ["U3", "Carol", "10000", "{}", "moderate", "NEW", "2026-01-03", "", ""]
+    ]
+
+    assert service.get_user("U3")["display_name"] == "Carol"
+    assert users_sheet.get_all_values.call_count == 2
+
+
+def test_update_user_uses_indexed_row(service):
+    """update_user writes to the row number recorded in the index."""
+    users_sheet = service._worksheets["Users"]
+
+    assert service.update_user("U2", {"onboarding_status": "ACTIVE"}) is True
+    assert service.update_user("U404", {"onboarding_status": "ACTIVE"}) is False
+
+    data = users_sheet.batch_update.call_args[0][0]
+    assert data == [{"range": "F3", "values": [["ACTIVE"]]}]
+    # Index was invalidated by the write
+    service.get_user("U2")
+    assert users_sheet.get_all_values.call_count == 2
+
+
+def test_update_user_single_batched_request(service):
+    """All fields and new headers go out in one batch_update, no per-cell calls."""
+    users_sheet = service._worksheets["Users"]
+
+    service.update_user("U1", {
+        "target_allocation": {"GOLD": 100},
+        "onboarding_status": "ACTIVE",
+        "monthly_budget": 20000,
+        "digest_assets": ["BTC"],
+        "digest_frequency": "weekly",
+        "digest_time": "08",
+    })
+
+    users_sheet.batch_update.assert_called_once()
+    users_sheet.update_cell.assert_not_called()
+    # Row 1 is re-read only because headers are about to be added
+    users_sheet.row_values.assert_called_once_with(1)
+
+    data = users_sheet.batch_update.call_args[0][0]
+    ranges = {d["range"]: d["values"][0][0] for d in data}
+    # Missing digest headers are appended after the existing 9 columns (J, K)
+    assert ranges["J1"] == "digest_frequency"
+    assert ranges["K1"] == "digest_time"
+    assert ranges["D2"] == '{"GOLD": 100}'
+    assert ranges["I2"] == '["BTC"]'
+    assert ranges["J2"] == "weekly"
+    assert ranges["K2"] == "08"
+    users_sheet.add_cols.assert_called_once_with(2)
+
+
+def test_update_user_reuses_header_added_elsewhere(service):
+    """A header another instance already added is written to, not appended again."""
+    users_sheet = service._worksheets["Users"]
+    users_sheet.row_values.return_value = list(USERS_ROWS[0]) + ["digest_frequency"]
+
+    service.update_user("U2", {"digest_frequency": "weekly", "onboarding_status": "ACTIVE"})
+    service.update_user("U1", {"onboarding_status": "ACTIVE"})
+
+    first, second = [c[0][0] for c in users_sheet.batch_update.call_args_list]
+    assert first == [{"range": "J3", "values": [["weekly"]]}, {"range": "F3", "values": [["ACTIVE"]]}]
+    assert second == [{"range": "F2", "values": [["ACTIVE"]]}]
+    users_sheet.add_cols.assert_not_called()
+    users_sheet.row_values.assert_called_once_with(1)
+
+
+HOLDINGS_ROWS = [
+    ["user_id", "asset", "asset_type", "quantity", "total_thb", "updated_at"],
+    ["U1", "GOLD", "GOLD", 2.0, 20000.0, "2026-01-01"],
+    ["U1", "BTC", "CRYPTO", 0.0, 0.0, "2026-01-01"],
+    ["U2", "AAPL", "STOCK", 3.0, 15000.0, "2026-01-01"],
+]
+
+
+def fake_indexed_sheet(rows):
+    """Worksheet mock answering key-column and per-row range reads from rows."""
+    sheet = MagicMock()
+    sheet.get_all_values.side_effect = lambda **kwargs: [list(r) for r in rows]
+    sheet.get.side_effect = lambda range_name, **kwargs: [list(r[:2]) for r in rows]
+
+    def batch_get(ranges, **kwargs):
+        row_nums = [int(re.match(r"A(\d+):", r).group(1)) for r in ranges]
+        return [[list(rows[n - 1])] if n <= len(rows) else [] for n in row_nums]
+
+    sheet.batch_get.side_effect = batch_get
+    return sheet
+
+
+@pytest.fixture
+def holdings_service(service):
+    """SheetsService with fake Transactions and Holdings worksheets."""
+    service._worksheets["Transactions"] = MagicMock()
+    service._worksheets["Holdings"] = fake_indexed_sheet([list(r) for r in HOLDINGS_ROWS])
+    return service
+
+
+def test_get_holdings_value_reads_materialized_rows(holdings_service):
+    """Portfolio reads come from the user's Holdings rows, not from replaying Transactions."""
+    holdings_sheet = holdings_service._worksheets["Holdings"]
+
+    holdings = holdings_service.get_holdings_value("U1")
+
+    assert holdings == {"GOLD": {"quantity": 2.0, "total_thb": 20000.0, "asset_type": "GOLD"}}
+    assert holdings_sheet.batch_get.call_args[0][0] == ["A2:F2", "A3:F3"]
+    assert holdings_service.get_holdings("U2") == {"AAPL": 3.0}
+    assert holdings_service.get_holdings_value("U404") == {}
+    # One key-column read builds the index; no full-sheet reads
+    holdings_sheet.get.assert_called_once_with("A:B")
+    holdings_sheet.get_all_values.assert_not_called()
+    holdings_service._worksheets["Transactions"].get_all_records.assert_not_called()
+
+
+def test_moved_holding_row_refreshes_index(holdings_service):
+    """If a row no longer holds its indexed key, the index is re-read and the lookup retried."""
+    holdings_service.get_holdings_value("U1")
+    # Another process rebuilt the sheet and the rows shifted
+    rows = [list(HOLDINGS_ROWS[0]), list(HOLDINGS_ROWS[3]), list(HOLDINGS_ROWS[1]), list(HOLDINGS_ROWS[2])]
+    holdings_service._worksheets["Holdings"] = fake_indexed_sheet(rows)
+
+    assert holdings_service.get_holdings("U2") == {"AAPL": 3.0}
+    assert holdings_service._worksheets["Holdings"].get.call_count == 1
+
+
+def test_append_transaction_updates_existing_holding(holdings_service):
+    """A SELL on an existing position rewrites that position's row in place."""
+    holdings_sheet = holdings_service._worksheets["Holdings"]
+
+    holdings_service.append_transaction({
+        "user_id": "U1", "asset": "GOLD", "asset_type": "GOLD",
+        "side": "SELL", "amount": 0.5, "total_thb": 5000,
+    })
+
+    values, range_name = holdings_sheet.update.call_args[0]
+    assert range_name == "A2:F2"
+    assert values[0][:5] == ["U1", "GOLD", "GOLD", 1.5, 15000.0]
+    holdings_sheet.append_row.assert_not_called()
+
+
+def test_append_transaction_creates_new_holding(holdings_service):
+    """A first BUY of an asset appends a new Holdings row."""
+    holdings_sheet = holdings_service._worksheets["Holdings"]
+
+    holdings_service.append_transaction({
+        "user_id": "U2", "asset": "ETH", "asset_type": "CRYPTO",
+        "side": "BUY", "amount": 1.25, "total_thb": 100000,
+    })
+
+    row = holdings_sheet.append_row.call_args[0][0]
+    assert row[:5] == ["U2", "ETH", "CRYPTO", 1.25, 100000.0]
+    holdings_sheet.update.assert_not_called()
+
+
+def fake_users_sheet(rows):
+    """Users worksheet mock whose batch_update writes are visible to later reads."""
+    sheet = MagicMock()
+    sheet.get_all_values.side_effect = lambda **kwargs: [list(r) for r in rows]
+    sheet.row_values.side_effect = lambda row, **kwargs: list(rows[row - 1])
+    sheet.col_count = 20
+
+    def batch_update(data, **kwargs):
+        for item in data:
+            row, col = a1_to_rowcol(item["range"])
+            for r in rows:
+                r.extend([""] * (col - len(r)))
+            rows[row - 1][col - 1] = item["values"][0][0]
+
+    sheet.batch_update.side_effect = batch_update
+    return sheet
+
+
+def test_failed_holdings_update_serves_ledger_until_rebuild(holdings_service):
+    """A Holdings write error keeps the recorded trade and flags the user for a rebuild."""
+    users_rows = [list(r) for r in USERS_ROWS]
+    holdings_service._worksheets["Users"] = fake_users_sheet(users_rows)
+    holdings_sheet = holdings_service._worksheets["Holdings"]
+    transactions = holdings_service._worksheets["Transactions"]
+    holdings_sheet.update.side_effect = RuntimeError("quota exceeded")
+    transactions.get_all_records.return_value = [
+        {"user_id": "U1", "asset": "GOLD", "asset_type": "GOLD", "side": "BUY", "amount": 2, "total_thb": 20000},
+        {"user_id": "U1", "asset": "GOLD", "asset_type": "GOLD", "side": "SELL", "amount": 0.5, "total_thb": 5000},
+    ]
+
+    tx_id = holdings_service.append_transaction({
+        "user_id": "U1", "asset": "GOLD", "asset_type": "GOLD",
+        "side": "SELL", "amount": 0.5, "total_thb": 5000,
+    })
+
+    assert tx_id.startswith("TX")
+    transactions.append_row.assert_called_once()
+    assert users_rows[0][-1] == "holdings_stale"
+    assert users_rows[1][-1] == "TRUE"
+    assert holdings_service.get_holdings("U1") == {"GOLD": 1.5}
+    assert holdings_service.get_holdings("U2") == {"AAPL": 3.0}
+
+    # The flag is on the sheet, so a restarted instance still uses the ledger
+    restarted = SheetsService()
+    restarted._worksheets.update(holdings_service._worksheets)
+    assert restarted.get_holdings("U1") == {"GOLD": 1.5}
+
+    holdings_sheet.update.side_effect = None
+    holdings_service.rebuild_holdings()
+    assert users_rows[1][-1] == ""
+    transactions.get_all_records.reset_mock()
+    holdings_service.get_holdings("U1")
+    transactions.get_all_records.assert_not_called()
+
+
+def test_missing_holdings_sheet_flags_user(holdings_service):
+    """Every failed holdings update path flags the user, including a missing sheet."""
+    users_rows = [list(r) for r in USERS_ROWS]
+    holdings_service._worksheets["Users"] = fake_users_sheet(users_rows)
+    holdings_service._worksheets["Holdings"].get.side_effect = gspread.WorksheetNotFound("Holdings")
+
+    holdings_service.append_transaction({"user_id": "U2", "asset": "AAPL", "side": "BUY", "amount": 1})
+
+    assert users_rows[2][-1] == "TRUE"
+
+
+def test_rebuild_holdings_verify_reports_drift(holdings_service):
+    """Verification replays the ledger and reports positions that disagree."""
+    holdings_service._worksheets["Transactions"].get_all_records.return_value = [
+        {"user_id": "U1", "asset": "GOLD", "asset_type": "GOLD", "side": "BUY", "amount": 2, "total_thb": 20000},
+        {"user_id": "U1", "asset": "BTC", "asset_type": "CRYPTO", "side": "BUY", "amount": 0.1, "total_thb": 300000},
+        {"user_id": "U1", "asset": "BTC", "asset_type": "CRYPTO", "side": "SELL", "amount": 0.1, "total_thb": 300000},
+        {"user_id": "U2", "asset": "AAPL", "asset_type": "STOCK", "side": "BUY", "amount": 4, "total_thb": 20000},
+    ]
+
+    result = holdings_service.rebuild_holdings(verify_only=True)
+
+    assert result["positions"] == 3
+    assert [(m["user_id"], m["asset"]) for m in result["mismatches"]] == [("U2", "AAPL")]
+    holdings_service._worksheets["Holdings"].update.assert_not_called()
+
+
+def fake_asset_reference_sheet(rows):
+    """Asset_Reference worksheet mock answering header, symbol-column and per-row reads."""
+    sheet = fake_indexed_sheet(rows)
+    sheet.row_values.side_effect = lambda row, **kwargs: list(rows[row - 1])
+    sheet.col_values.side_effect = lambda col, **kwargs: [r[col - 1] for r in rows]
+    sheet.col_count = len(rows[0])
+    return sheet
+
+
+ASSET_REFERENCE_ROWS = [
+    ["asset_symbol", "asset_name", "current_price_thb", "last_updated"],
+    ["GOLD", "Gold", 70000, "2026-01-01T00:00:00+00:00"],
+    ["AAPL", "Apple", 7000, "2026-01-01T00:00:00+00:00"],
+]
+
+
+def test_get_asset_quotes_reads_only_requested_rows(service):
+    sheet = fake_asset_reference_sheet(ASSET_REFERENCE_ROWS)
+    service._worksheets["Asset_Reference"] = sheet
+
+    assert service.get_asset_quotes(["AAPL", "BTC"]) == {
+        "AAPL": dict(zip(ASSET_REFERENCE_ROWS[0], ASSET_REFERENCE_ROWS[2])),
+    }
+    service.get_asset_quotes(["GOLD"])
+
+    assert [c.args[0] for c in sheet.batch_get.call_args_list] == [["A3:D3"], ["A2:D2"]]
+    # The index is built once and the whole tab is never read
+    sheet.row_values.assert_called_once_with(1)
+    sheet.col_values.assert_called_once_with(1)
+    sheet.get_all_values.assert_not_called()
+
+
+def test_upsert_asset_quotes_updates_and_appends(service):
+    sheet = fake_asset_reference_sheet(ASSET_REFERENCE_ROWS)
+    service._worksheets["Asset_Reference"] = sheet
+
+    service.upsert_asset_quotes({
+        "GOLD": {"price_usd": 2100.0, "last_updated": "2026-02-01T00:00:00+00:00"},
+        "BTC": {"price_usd": 90000.0, "last_updated": "2026-02-01T00:00:00+00:00"},
+    })
+
+    sheet.get_all_values.assert_not_called()
+    assert sheet.batch_get.call_args[0][0] == ["A2:D2"]
+    sheet.add_cols.assert_called_once_with(1)
+    data = sheet.batch_update.call_args[0][0]
+    assert {"range": "E1", "values": [["price_usd"]]} in data
+    assert {"range": "E2", "values": [[2100.0]]} in data
+    new_rows = sheet.append_rows.call_args[0][0]
+    assert new_rows == [["BTC", "", "", "2026-02-01T00:00:00+00:00", 90000.0]]
+    # The appended row and new column are picked up by the next lookup
+    assert service._asset_reference_index is None
+
+
+def test_update_user_moves_schedule_bucket(service):
+    """Saving digest settings rewrites the user's row in the schedule index."""
+    schedule_sheet = service._worksheets["Digest_Schedule"]
+
+    service.update_user("U1", {"digest_frequency": "weekly", "digest_time": "08:00", "digest_day": "Friday"})
+
+    values, range_name = schedule_sheet.update.call_args[0]
+    assert range_name == "A2:D2"
+    assert values[0][:3] == ["U1", "08|weekly|friday", '["GOLD"]']
+
+
+def test_update_user_schedule_add_and_remove(service):
+    schedule_sheet = service._worksheets["Digest_Schedule"]
+
+    # U2 enables digests (assets fall back to an allocation)
+    service.update_user("U2", {"digest_enabled": True, "target_allocation": {"BTC": 100}})
+    assert schedule_sheet.append_row.call_args[0][0][:3] == ["U2", "07|daily|", '["BTC"]']
+
+    # U1 disables them
+    service.update_user("U1", {"digest_enabled": False})
+    schedule_sheet.delete_rows.assert_called_once_with(2)
+
+    # Unrelated updates leave the index alone
+    schedule_sheet.reset_mock()
+    service.update_user("U1", {"onboarding_status": "ACTIVE"})
+    schedule_sheet.get.assert_not_called()
+    schedule_sheet.batch_get.assert_not_called()
+
+
+def test_update_user_survives_schedule_write_failure(service):
+    """A schedule index error is logged; the saved profile still reports success."""
+    schedule_sheet = service._worksheets["Digest_Schedule"]
+    schedule_sheet.update.side_effect = RuntimeError("quota exceeded")
+
+    assert service.update_user("U1", {"digest_time": "09:00"}) is True
+    service._worksheets["Users"].batch_update.assert_called_once()
+
+
+def test_get_digest_schedule_reads_only_index(service):
+    users_sheet = service._worksheets["Users"]
+
+    assert service.get_digest_schedule(["07|daily|", "07|weekly|monday"]) == [
+        {"user_id": "U1", "bucket": "07|daily|", "digest_assets": ["GOLD"]}
+    ]
+    assert service.get_digest_schedule(["08|daily|"]) == []
+    users_sheet.get_all_values.assert_not_called()
+    # The key columns are read once; only the due user's row is fetched
+    schedule_sheet = service._worksheets["Digest_Schedule"]
+    schedule_sheet.get.assert_called_once_with("A:B")
+    assert schedule_sheet.batch_get.call_args_list[0][0][0] == ["A2:D2"]
+    schedule_sheet.get_all_values.assert_not_called()
+
+    # No index tab yet: callers fall back to a full scan
+    import gspread
+    del service._worksheets["Digest_Schedule"]
+    with patch.object(SheetsService, "spreadsheet") as spreadsheet:
+        spreadsheet.worksheet.side_effect = gspread.WorksheetNotFound("Digest_Schedule")
+        assert service.get_digest_schedule(["07|daily|"]) is None
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Unit tests for the SQLite storage backend."""
+
+import os
+import sys
+import pytest
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.sqlite_storage import SQLiteStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / "opes.db"))
+
+
+def test_user_round_trip_matches_sheets_shape(storage):
+    """Users parse to the same shape the Sheets backend returns."""
+    storage.create_user("U1", "Alice")
+    assert storage.update_user("U1", {
+        "target_allocation": {"GOLD": 60, "BTC": 40},
+        "monthly_budget": 20000,
+        "digest_enabled": True,
+        "digest_assets": ["GOLD"],
+        "unknown_field": "ignored",
+    }) is True
+    assert storage.update_user("U404", {"monthly_budget": 1}) is False
+
+    user = storage.get_user("U1")
+    assert user["display_name"] == "Alice"
+    assert user["monthly_budget"] == 20000
+    assert user["target_allocation"] == {"GOLD": 60, "BTC": 40}
+    assert user["digest_enabled"] is True
+    assert user["digest_assets"] == ["GOLD"]
+    assert user["digest_frequency"] == "daily"
+    assert storage.get_user("U404") is None
+
+    assert storage.get_or_create_user("U1", "ignored")["display_name"] == "Alice"
+    assert storage.get_or_create_user("U2", "Bob")["display_name"] == "Bob"
+    assert [u["user_id"] for u in storage.get_all_users_with_allocation()] == ["U1"]
+    assert [u["user_id"] for u in storage.get_users_for_digest()] == ["U1"]
+
+
+def test_append_transaction_maintains_holdings(storage):
+    """Holdings are updated incrementally alongside the ledger insert."""
+    storage.append_transaction({"user_id": "U1", "asset": "GOLD", "asset_type": "GOLD",
+                                "side": "BUY", "amount": 2, "total_thb": 20000})
+    storage.append_transaction({"user_id": "U1", "asset": "GOLD", "asset_type": "GOLD",
+                                "side": "SELL", "amount": 0.5, "total_thb": 5000})
+    storage.append_transaction({"user_id": "U1", "asset": "BTC", "asset_type": "CRYPTO",
+                                "side": "BUY", "amount": 0.1, "total_thb": 300000})
+    storage.append_transaction({"user_id": "U1", "asset": "BTC", "asset_type": "CRYPTO",
+                                "side": "SELL", "amount": 0.1, "total_thb": 300000})
+
+    assert storage.get_holdings_value("U1") == {
+        "GOLD": {"quantity": 1.5, "total_thb": 15000.0, "asset_type": "GOLD"},
+    }
+    assert storage.get_holdings("U1") == {"GOLD": 1.5}
+    assert len(storage.get_transactions("U1")) == 4
+    assert storage.rebuild_holdings(verify_only=True)["mismatches"] == []
+
+
+def test_rebuild_holdings_repairs_drift(storage):
+    """A corrupted holding is detected and fixed by replaying the ledger."""
+    storage.append_transaction({"user_id": "U1", "asset": "AAPL", "asset_type": "STOCK",
+                                "side": "BUY", "amount": 3, "total_thb": 15000})
+    storage._connect().execute("UPDATE holdings SET quantity = 99")
+
+    assert len(storage.rebuild_holdings(verify_only=True)["mismatches"]) == 1
+    storage.rebuild_holdings()
+    assert storage.get_holdings("U1") == {"AAPL": 3.0}
+
+
+def test_import_and_export_sheets_rows(storage):
+    """Raw Sheets rows import cleanly and export back in sheet column order."""
+    users = [
+        {"user_id": "U1", "display_name": "Alice", "monthly_budget": 10000,
+         "target_allocation": '{"GOLD": 100}', "digest_enabled": "TRUE"},
+        {"user_id": "", "display_name": "blank row"},
+    ]
+    transactions = [
+        {"tx_id": "TX1", "user_id": "U1", "asset": "GOLD", "asset_type": "GOLD",
+         "side": "BUY", "amount": "1.5", "total_thb": 15000},
+    ]
+
+    storage.import_records(users, transactions)
+
+    assert storage.get_user("U1")["target_allocation"] == {"GOLD": 100}
+    assert storage.get_holdings("U1") == {"GOLD": 1.5}
+
+    headers, rows = storage.export_table("holdings")
+    assert headers == storage.HOLDINGS_COLUMNS
+    assert rows[0][:5] == ["U1", "GOLD", "GOLD", 1.5, 15000.0]
+
+
+def test_digest_schedule_follows_user_settings(storage):
+    storage.create_user("U1", "Alice")
+    storage.create_user("U2", "Bob")
+    storage.update_user("U1", {"digest_enabled": True, "target_allocation": {"GOLD": 100}})
+    storage.update_user("U2", {"digest_enabled": True, "digest_assets": ["BTC"],
+                               "digest_frequency": "weekly", "digest_day": "friday"})
+
+    assert storage.get_digest_schedule(["07|daily|"]) == [
+        {"user_id": "U1", "bucket": "07|daily|", "digest_assets": ["GOLD"]}
+    ]
+    assert [r["user_id"] for r in storage.get_digest_schedule(["07|weekly|friday"])] == ["U2"]
+
+    storage.update_user("U1", {"digest_time": "18:00"})
+    assert storage.get_digest_schedule(["07|daily|"]) == []
+    assert [r["user_id"] for r in storage.get_digest_schedule(["18|daily|"])] == ["U1"]
+
+    storage.update_user("U2", {"digest_enabled": False})
+    assert storage.get_digest_schedule(["07|weekly|friday"]) == []
+
+
+def test_existing_database_gets_schedule_index(tmp_path):
+    """Opening a database that predates the index builds it from Users."""
+    path = str(tmp_path / "opes.db")
+    storage = SQLiteStorage(path)
+    storage.create_user("U1", "Alice")
+    storage.update_user("U1", {"digest_enabled": True, "digest_assets": ["GOLD"]})
+    storage._connect().execute("DROP TABLE digest_schedule")
+
+    reopened = SQLiteStorage(path)
+    assert [r["user_id"] for r in reopened.get_digest_schedule(["07|daily|"])] == ["U1"]
@@ -198,3 +198,81 @@ def test_volume_profile():
     assert pytest.approx(vp["point_of_control_price"], 2.0) == 120.0
     assert vp["immediate_support_hvn"] < price
     assert vp["immediate_resistance_hvn"] > price
+
+
+def test_volume_profile_matches_reference_loop():
+    """Default (uniform) output is identical to the original per-bar loop."""
+    from scripts.benchmark_volume_profile import legacy_volume_profile, synthetic_ohlcv
+
+    service = TechnicalAnalysisService()
+    for bars, seed in [(60, 1), (250, 2), (1000, 3)]:
+        df = synthetic_ohlcv(bars, seed=seed)
+        df.loc[df.index[-5], "High"] = np.nan
+        price = float(df["Close"].iloc[-1])
+
+        assert service._compute_volume_profile(df, price) == legacy_volume_profile(df, price, 60, 50)
+
+
+def test_volume_profile_equal_bins_keep_first_poc():
+    """A single wide bar fills bins exactly equally, so POC stays on the lowest bin."""
+    service = TechnicalAnalysisService()
+    df = pd.DataFrame({"High": [110.0, 200.0], "Low": [100.0, 100.0], "Volume": [0.0, 1000.0]})
+
+    bins = service._volume_by_bin(
+        df["High"].to_numpy(), df["Low"].to_numpy(), df["Volume"].to_numpy(),
+        np.linspace(100.0, 200.0, 11),
+    )
+
+    assert len(set(bins)) == 1
+    assert service._compute_volume_profile(df, 150.0)["point_of_control_price"] == 101.0
+
+
+def test_volume_profile_proportional_distribution():
+    """Proportional mode weights bins by covered range and conserves volume."""
+    service = TechnicalAnalysisService()
+    high = np.array([104.0, 110.0])
+    low = np.array([100.0, 102.0])
+    volume = np.array([400.0, 800.0])
+    edges = np.linspace(100.0, 110.0, 6)  # 2.0-wide bins
+
+    bins = service._volume_by_bin(high, low, volume, edges, distribution="proportional")
+
+    assert bins.sum() == pytest.approx(1200.0)
+    assert bins[0] == pytest.approx(200.0)           # half of bar 1
+    assert bins[1] == pytest.approx(200.0 + 200.0)   # half of bar 1 + quarter of bar 2
+    assert bins[4] == pytest.approx(200.0)
+    with pytest.raises(ValueError):
+        service._volume_by_bin(high, low, volume, edges, distribution="bogus")
+
+
+def test_volume_profile_configurable_window():
+    """Lookback and bin count change the profile window and resolution."""
+    service = TechnicalAnalysisService()
+    dates = pd.date_range(end="2026-06-23", periods=100, freq="D")
+    df = pd.DataFrame({
+        "High": [50.0] * 40 + [110.0] * 60,
+        "Low": [40.0] * 40 + [100.0] * 60,
+        "Volume": [2000.0] * 40 + [1000.0] * 60,
+    }, index=dates)
+
+    short = service._compute_volume_profile(df, 105.0, lookback=60, num_bins=10)
+    full = service._compute_volume_profile(df, 105.0, lookback=100, num_bins=70)
+
+    assert short["point_of_control_price"] == pytest.approx(100.5)
+    # The heavier older range only shows up once the window reaches back to it
+    assert full["point_of_control_price"] < 60.0
+    assert full["immediate_support_hvn"] < 60.0
+
+
+def test_compute_indicators_reads_from_ohlcv_store(sample_ohlcv_data):
+    """With a candle store configured, yfinance is not called directly."""
+    store = MagicMock()
+    store.get_history.return_value = sample_ohlcv_data
+    service = TechnicalAnalysisService(ohlcv_store=store)
+
+    with patch("services.technical_analysis_service.yf.Ticker") as ticker:
+        payload = service.compute_indicators("gold")
+
+    ticker.assert_not_called()
+    store.get_history.assert_called_once_with("GC=F", days=365, min_bars=50)
+    assert payload["metadata"]["current_price"] == float(sample_ohlcv_data["Close"].iloc[-1])
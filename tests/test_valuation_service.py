@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Unit tests for the shared portfolio valuation engine."""
+
+import os
+import sys
+from dataclasses import FrozenInstanceError
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.price_service import PriceError
+from services.valuation_service import PortfolioValuationEngine
+
+HOLDINGS = {
+    "U1": {
+        "AAPL": {"quantity": 2, "total_thb": 10000, "asset_type": "STOCK"},
+        "BTC": {"quantity": 0.01, "total_thb": 20000, "asset_type": ""},
+    },
+    "U2": {"AAPL": {"quantity": 1, "total_thb": 6000, "asset_type": "STOCK"}},
+}
+
+
+def _patched(prices):
+    price_service = MagicMock()
+    price_service.get_prices_thb.side_effect = lambda tickers: {t: prices[t] for t in tickers if t in prices}
+    price_service.get_usd_thb_rate.return_value = 35.0
+    storage = MagicMock()
+    storage.get_holdings_value.side_effect = lambda user_id: HOLDINGS.get(user_id, {})
+    return price_service, storage
+
+
+def test_snapshot_values_holdings_and_is_reused():
+    price_service, storage = _patched({"AAPL": 7000.0, "BTC": 2_500_000.0})
+    engine = PortfolioValuationEngine(ttl=60)
+
+    with patch("services.valuation_service.registry.get", return_value=price_service), \
+            patch("services.valuation_service.sheets_service", storage):
+        snapshot = engine.get_snapshot("U1", require_prices=True)
+        assert engine.get_snapshot("U1") is snapshot
+
+        engine.invalidate("U1")
+        assert engine.get_snapshot("U1") is not snapshot
+
+    assert price_service.get_prices_thb.call_count == 2
+    assert storage.get_holdings_value.call_count == 2
+
+    assert snapshot.total_value == pytest.approx(39000)
+    assert snapshot.total_cost == 30000
+    assert snapshot.total_pl_percent == pytest.approx(30)
+    assert snapshot.type_ratios == pytest.approx({"STOCK": 14000 / 390, "CRYPTO": 25000 / 390})
+    assert snapshot.usd_thb_rate == 35.0
+    assert [h["ticker"] for h in snapshot.holdings_by("value")] == ["BTC", "AAPL"]
+    assert snapshot.holdings_by("value")[1]["pl_amount"] == 4000
+
+    with pytest.raises(FrozenInstanceError):
+        snapshot.usd_thb_rate = 1.0
+    with pytest.raises(TypeError):
+        snapshot.quantities["AAPL"] = 5
+
+
+def test_missing_prices_raise_when_required_and_are_not_memoized():
+    price_service, storage = _patched({"AAPL": 7000.0})
+    engine = PortfolioValuationEngine(ttl=60)
+
+    with patch("services.valuation_service.registry.get", return_value=price_service), \
+            patch("services.valuation_service.sheets_service", storage):
+        with pytest.raises(PriceError, match="BTC"):
+            engine.get_snapshot("U1", require_prices=True)
+
+        snapshot = engine.get_snapshot("U1")
+
+    assert price_service.get_prices_thb.call_count == 2
+    assert snapshot.missing == ("BTC",)
+    assert snapshot.current_values == {"AAPL": 14000.0}
+    assert dict(snapshot.quantities) == {"AAPL": 2, "BTC": 0.01}
+
+
+def test_get_snapshots_fetches_prices_once_for_all_users():
+    price_service, storage = _patched({"AAPL": 7000.0, "BTC": 2_500_000.0})
+    engine = PortfolioValuationEngine(ttl=60)
+
+    with patch("services.valuation_service.registry.get", return_value=price_service), \
+            patch("services.valuation_service.sheets_service", storage):
+        engine.get_snapshot("U2")
+        snapshots, errors = engine.get_snapshots(["U1", "U2", "U3"])
+
+    assert errors == {}
+    assert snapshots["U3"].is_empty
+    assert snapshots["U2"].total_value == 7000
+    # One fetch for U2 alone, then one for U1 and U3 (U2 was memoized)
+    assert price_service.get_prices_thb.call_count == 2
+    price_service.get_prices_thb.assert_called_with(["AAPL", "BTC"])
+
+
+def test_empty_portfolio_skips_price_and_fx_fetch():
+    """Users without holdings still get a snapshot while FX rates are unavailable."""
+    price_service, storage = _patched({})
+    price_service.get_usd_thb_rate.side_effect = PriceError("FX down")
+    engine = PortfolioValuationEngine(ttl=60)
+
+    with patch("services.valuation_service.registry.get", return_value=price_service), \
+            patch("services.valuation_service.sheets_service", storage):
+        snapshot = engine.get_snapshot("U404", require_prices=True)
+
+    assert snapshot.is_empty
+    assert snapshot.usd_thb_rate is None
+    price_service.get_prices_thb.assert_not_called()
+    price_service.get_usd_thb_rate.assert_not_called()
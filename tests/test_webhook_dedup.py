@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Unit tests for webhook event de-duplication."""
+
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Adjust path to import services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.kv_store import MemoryKVStore, SQLiteKVStore
+from services.webhook_dedup import WebhookDeduplicator
+
+
+def _event(event_id, redelivery=False):
+    return SimpleNamespace(
+        webhook_event_id=event_id,
+        delivery_context=SimpleNamespace(is_redelivery=redelivery),
+    )
+
+
+def test_redelivered_event_is_claimed_once(tmp_path):
+    dedup = WebhookDeduplicator(SQLiteKVStore(str(tmp_path / "cache.db"), "webhook_events"), ttl=60)
+
+    assert dedup.claim(_event("E1")) is True
+    assert dedup.claim(_event("E1", redelivery=True)) is False
+    assert dedup.claim(_event("E2")) is True
+
+    # A restarted worker sees the same claims
+    restarted = WebhookDeduplicator(SQLiteKVStore(str(tmp_path / "cache.db"), "webhook_events"), ttl=60)
+    assert restarted.claim(_event("E1")) is False
+
+    assert dedup.get_stats() == {"accepted": 2, "duplicates": 1, "flagged_redeliveries": 1}
+
+
+def test_released_claim_lets_redelivery_through():
+    dedup = WebhookDeduplicator(MemoryKVStore(max_entries=100), ttl=60)
+
+    assert dedup.claim(_event("E1")) is True
+    dedup.release(_event("E1"))
+    assert dedup.claim(_event("E1", redelivery=True)) is True
+    assert dedup.get_stats()["duplicates"] == 0
+
+
+def test_fails_open_without_id_or_store():
+    store = MagicMock()
+    store.add.side_effect = OSError("disk full")
+    dedup = WebhookDeduplicator(store, ttl=60)
+
+    assert dedup.claim(_event("E1")) is True
+    assert dedup.claim(_event(None)) is True
+    assert WebhookDeduplicator(None, ttl=60).claim(_event("E1")) is True
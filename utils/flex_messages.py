@@ -96,6 +96,84 @@ class FlexMessages:
             },
         }
 
+    @staticmethod
+    def duplicate_transaction(tx_data: dict, duplicate_of: str, key: str) -> dict:
+        """Create a likely-duplicate warning with record/discard buttons.
+
+        Args:
+            tx_data: The transaction held back from recording
+            duplicate_of: tx_id of the transaction it likely repeats
+            key: Parse cache key of the held transaction (postback payload)
+        """
+        side = tx_data.get("side", "BUY")
+
+        return {
+            "type": "bubble",
+            "size": "kilo",
+            "header": {
+                "type": "box",
+                "layout": "vertical",
+                "contents": [
+                    {
+                        "type": "text",
+                        "text": "⚠️ รายการนี้อาจบันทึกซ้ำ",
+                        "weight": "bold",
+                        "size": "md",
+                        "color": "#B45309",
+                    }
+                ],
+                "backgroundColor": "#FEF3C7",
+                "paddingAll": "15px",
+            },
+            "body": {
+                "type": "box",
+                "layout": "vertical",
+                "spacing": "sm",
+                "contents": [
+                    {
+                        "type": "text",
+                        "text": f"ตรงกับรายการที่บันทึกไว้แล้ว ({duplicate_of}) ต้องการบันทึกซ้ำหรือไม่?",
+                        "size": "sm",
+                        "color": "#666666",
+                        "wrap": True,
+                    },
+                    {"type": "separator", "margin": "md"},
+                    FlexMessages._info_row("รายการ", f"{side} {tx_data.get('asset', '')}"),
+                    FlexMessages._info_row("จำนวน", f"{tx_data.get('amount', 0):,.4f}"),
+                    FlexMessages._info_row("มูลค่ารวม", f"฿{tx_data.get('total_thb', 0):,.2f}"),
+                    FlexMessages._info_row("วันที่", tx_data.get("date", "")),
+                ],
+                "paddingAll": "15px",
+            },
+            "footer": {
+                "type": "box",
+                "layout": "vertical",
+                "contents": [
+                    {
+                        "type": "button",
+                        "style": "primary",
+                        "action": {
+                            "type": "postback",
+                            "label": "บันทึกซ้ำ",
+                            "data": f"record_duplicate={key}",
+                        },
+                        "color": "#F59E0B",
+                    },
+                    {
+                        "type": "button",
+                        "style": "link",
+                        "action": {
+                            "type": "postback",
+                            "label": "ไม่ต้องบันทึก",
+                            "data": f"discard_duplicate={key}",
+                        },
+                        "margin": "sm",
+                    },
+                ],
+                "paddingAll": "15px",
+            },
+        }
+
     @staticmethod
     def _info_row(label: str, value: str) -> dict:
         """Create an info row for Flex Message."""
@@ -808,21 +886,20 @@ class FlexMessages:
         return result
 
     @staticmethod
-    def service_status(services: dict, total_tests: int, passed: int, failed: int, timestamp) -> dict:
+    def service_status(results: dict, timestamp) -> dict:
         """Create service status Flex Message.
         
         Args:
-            services: Dict of {service_name: is_healthy}
-            total_tests: Total number of tests run
-            passed: Number of passed tests
-            failed: Number of failed tests
-            timestamp: datetime of status check
+            results: Dict of {service_name: probe result} with "healthy" and
+                "latency_ms"; empty until the first background check finishes
+            timestamp: datetime of the latest check, or None if not checked yet
         """
         # Build service status items
         service_items = []
-        all_healthy = all(services.values())
+        all_healthy = all(r["healthy"] for r in results.values())
         
-        for service_name, is_healthy in services.items():
+        for service_name, result in results.items():
+            is_healthy = result["healthy"]
             status_emoji = "✅" if is_healthy else "❌"
             status_color = "#10B981" if is_healthy else "#EF4444"
             
@@ -845,15 +922,27 @@ class FlexMessages:
                             "margin": "md",
                             "flex": 1,
                         },
+                        {
+                            "type": "text",
+                            "text": f"{result['latency_ms']:,.0f} ms",
+                            "size": "xs",
+                            "color": "#888888",
+                            "align": "end",
+                            "flex": 0,
+                        },
                     ],
                     "margin": "md",
                 },
             ])
         
         # Overall status
-        overall_emoji = "🟢" if all_healthy else "🔴"
-        overall_text = "ระบบทำงานปกติ" if all_healthy else "ตรวจพบปัญหา"
-        overall_color = "#10B981" if all_healthy else "#EF4444"
+        if not results:
+            overall_emoji, overall_text, overall_color = "⏳", "กำลังตรวจสอบ...", "#888888"
+        elif all_healthy:
+            overall_emoji, overall_text, overall_color = "🟢", "ระบบทำงานปกติ", "#10B981"
+        else:
+            overall_emoji, overall_text, overall_color = "🔴", "ตรวจพบปัญหา", "#EF4444"
+        checked = timestamp.strftime('%Y-%m-%d %H:%M') if timestamp else "pending"
         
         return {
             "type": "bubble",
@@ -916,18 +1005,10 @@ class FlexMessages:
                 "contents": [
                     {
                         "type": "text",
-                        "text": f"Tests: {passed}/{total_tests} passed",
-                        "size": "xs",
-                        "color": "#888888",
-                        "align": "center",
-                    },
-                    {
-                        "type": "text",
-                        "text": f"Last checked: {timestamp.strftime('%Y-%m-%d %H:%M')}",
+                        "text": f"Last checked: {checked}",
                         "size": "xs",
                         "color": "#888888",
                         "align": "center",
-                        "margin": "xs",
                     },
                 ],
                 "paddingAll": "10px",
@@ -0,0 +1,116 @@
+"""Shrink transaction screenshots before they are sent to Gemini Vision.
+
+Phone screenshots arrive as multi-megabyte PNGs at 3x density. Text stays
+legible well below that resolution, so images are trimmed of uniform
+borders, downscaled and re-encoded as JPEG. Anything that cannot be
+processed is passed through unchanged with its detected MIME type.
+"""
+
+import io
+from typing import Optional
+
+from config import Config
+
+# Magic-byte prefixes of the formats LINE delivers and Gemini accepts
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+# Per-channel difference from the border colour still counted as border
+BORDER_TOLERANCE = 12
+
+# Pixels of border kept around trimmed content
+BORDER_MARGIN = 8
+
+
+def detect_mime_type(data: bytes) -> Optional[str]:
+    """Detect the image format from its leading bytes.
+
+    Returns:
+        MIME type, or None if the format is not recognized
+    """
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1", b"ftypmsf1"):
+        return "image/heic"
+    return None
+
+
+def _trim_borders(image):
+    """Crop rows/columns that match the top-left pixel colour (status-bar gutters, padding)."""
+    from PIL import Image, ImageChops
+
+    # Find the content box on a reduced copy; a few pixels of slack are
+    # covered by the margin
+    factor = max(1, min(image.size) // 400)
+    small = image.reduce(factor) if factor > 1 else image
+    background = Image.new(small.mode, small.size, image.getpixel((0, 0)))
+    diff = ImageChops.difference(small, background).convert("L")
+    mask = diff.point(lambda value: 255 if value > BORDER_TOLERANCE else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return image
+    left, top, right, bottom = (edge * factor for edge in bbox)
+    return image.crop((
+        max(0, left - BORDER_MARGIN),
+        max(0, top - BORDER_MARGIN),
+        min(image.width, right + BORDER_MARGIN),
+        min(image.height, bottom + BORDER_MARGIN),
+    ))
+
+
+def preprocess_image(
+    data: bytes,
+    max_side: Optional[int] = None,
+    quality: Optional[int] = None,
+) -> tuple[bytes, str]:
+    """Trim, downscale and re-encode an image for OCR.
+
+    Args:
+        data: Raw image bytes
+        max_side: Longest side in pixels after scaling (default
+            Config.OCR_IMAGE_MAX_SIDE; 0 disables preprocessing)
+        quality: JPEG quality (default Config.OCR_IMAGE_JPEG_QUALITY)
+
+    Returns:
+        (image bytes, MIME type). The original bytes are returned when
+        re-encoding would not make them smaller or the image cannot be read.
+    """
+    max_side = Config.OCR_IMAGE_MAX_SIDE if max_side is None else max_side
+    quality = quality or Config.OCR_IMAGE_JPEG_QUALITY
+    mime_type = detect_mime_type(data) or "image/jpeg"
+    if not max_side:
+        return data, mime_type
+
+    try:
+        from PIL import Image, ImageOps
+
+        image = Image.open(io.BytesIO(data))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white rather than JPEG's black
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        image = _trim_borders(image)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    except Exception as e:
+        print(f"⚠️ Image preprocessing skipped: {e}")
+        return data, mime_type
+
+    processed = buffer.getvalue()
+    if len(processed) >= len(data):
+        return data, mime_type
+    return processed, "image/jpeg"
@@ -0,0 +1,71 @@
+"""Compact encoding of technical indicator payloads for LLM prompts."""
+
+import json
+from typing import Any, Dict
+
+# Fields the digest prompt templates already spell out in their text (or that
+# do not inform the narrative), per payload section
+PROMPT_TEMPLATE_FIELDS = {
+    "metadata": {"ticker", "yfinance_symbol", "current_price", "timestamp"},
+    "trend": {"macro_condition"},
+    "momentum": {
+        "rsi_value",
+        "rsi_condition",
+        "rsi_3d_velocity",
+        "bearish_divergence_detected",
+        "bullish_divergence_detected",
+    },
+    "volume_profile": {"point_of_control_price", "immediate_support_hvn", "immediate_resistance_hvn"},
+    "fibonacci": {"closest_level_ratio", "closest_level_price", "distance_to_level_pct"},
+}
+
+
+def round_for_display(key: str, value: Any) -> Any:
+    """Round floats to the precision the digest displays.
+
+    Percentages keep 2 decimals, prices keep cents (4 significant digits below
+    $1), and whole numbers drop their trailing ".0".
+    """
+    if isinstance(value, dict):
+        return {k: round_for_display(k, v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [round_for_display(key, v) for v in value]
+    if not isinstance(value, float):
+        return value
+
+    if key.endswith("_pct") or abs(value) >= 1:
+        value = round(value, 2)
+    else:
+        value = float(f"{value:.4g}")
+    return int(value) if value.is_integer() else value
+
+
+def compact_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip a compute_indicators payload down to what the prompt text does not already say.
+
+    Metric sections are lifted to the top level, template fields are dropped,
+    and an undetected liquidity gap loses its placeholder prices.
+    """
+    compact: Dict[str, Any] = {}
+    sections = {"metadata": payload.get("metadata", {}), **payload.get("metrics", {})}
+    for name, section in sections.items():
+        if not isinstance(section, dict):
+            compact[name] = section
+            continue
+
+        dropped = PROMPT_TEMPLATE_FIELDS.get(name, set())
+        kept = {k: v for k, v in section.items() if k not in dropped}
+
+        gap = kept.get("liquidity_gap_below")
+        if isinstance(gap, dict) and not gap.get("detected"):
+            kept["liquidity_gap_below"] = {"detected": False}
+
+        if kept:
+            compact[name] = kept
+
+    return round_for_display("", compact)
+
+
+def encode_prompt_payload(payload: Dict[str, Any]) -> str:
+    """Serialize a payload for a prompt: compacted, rounded and without whitespace."""
+    return json.dumps(compact_payload(payload), ensure_ascii=False, separators=(",", ":"))
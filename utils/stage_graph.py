@@ -0,0 +1,94 @@
+"""Run named stages concurrently as soon as their dependencies finish."""
+
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Optional, Sequence
+
+
+class StageGraph:
+    """A small dependency graph of stages executed on a shared thread pool.
+
+    Each stage is a callable that receives the results of the stages it
+    depends on, in order, and is submitted the moment the last of them
+    completes. If a dependency fails, the stage is skipped and its result
+    raises the same exception. Wall-clock time is recorded per stage.
+
+    Example:
+        graph = StageGraph(executor)
+        graph.add("download", fetch, url)
+        graph.add("parse", parse, after=["download"])
+        parsed = graph.result("parse")
+    """
+
+    def __init__(self, executor: Executor):
+        self.executor = executor
+        self._futures: dict[str, Future] = {}
+        self._timings: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, fn: Callable[..., Any], *args: Any, after: Sequence[str] = ()) -> Future:
+        """Add a stage.
+
+        Args:
+            name: Unique stage name
+            fn: Called as fn(*args, *dependency_results)
+            after: Names of stages (already added) this one depends on
+
+        Returns:
+            Future for the stage result
+        """
+        if name in self._futures:
+            raise ValueError(f"Stage {name!r} already added")
+        deps = [self._futures[dep] for dep in after]
+        stage: Future = Future()
+        self._futures[name] = stage
+
+        remaining = [len(deps)]
+
+        def submit() -> None:
+            failed = next((d for d in deps if d.exception() is not None), None)
+            if failed is not None:
+                stage.set_exception(failed.exception())
+                return
+            dep_results = [d.result() for d in deps]
+            self.executor.submit(self._run, name, stage, fn, *args, *dep_results)
+
+        def on_dep_done(_: Future) -> None:
+            with self._lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                submit()
+
+        if not deps:
+            submit()
+        for dep in deps:
+            dep.add_done_callback(on_dep_done)
+        return stage
+
+    def _run(self, name: str, stage: Future, fn: Callable[..., Any], *args: Any) -> None:
+        started = time.perf_counter()
+        try:
+            result, error = fn(*args), None
+        except BaseException as e:
+            result, error = None, e
+        # Record the timing before waiters are released
+        with self._lock:
+            self._timings[name] = time.perf_counter() - started
+        if error is not None:
+            stage.set_exception(error)
+        else:
+            stage.set_result(result)
+
+    def result(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Wait for a stage and return its result (re-raising its exception)."""
+        return self._futures[name].result(timeout=timeout)
+
+    def timings(self) -> dict[str, float]:
+        """Seconds spent in each stage that has finished running, in completion order."""
+        with self._lock:
+            return dict(self._timings)
+
+    def format_timings(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.timings().items())